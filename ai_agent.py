@@ -1,53 +1,362 @@
-import openai
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import copy
 import json
+import time
+import asyncio
+import numpy as np
 import config
+import clients
+import metrics
 from calendar_manager import CalendarManager
+from classifier import KeywordClassifier, get_classifier
+from columnar import SlotTable
+from llm_cache import AnalysisCache, get_shared_cache, make_cache_key
+from llm_guard import CircuitOpenError, Deadline, DeadlineExceeded, GuardedCompletions
+from prompt_builder import PromptBuilder, count_tokens
+from router import RequestRouter, RouteDecision
+from scoring import ScoringRules, get_scoring_rules
+from single_flight import SingleFlight
+from snapshot import CalendarSnapshot
+from stream_parser import RecommendationStreamParser
 
 class ScheduleAIAgent:
-    def __init__(self):
-        if config.OPENAI_API_KEY:
-            self.client = openai.OpenAI(api_key=config.OPENAI_API_KEY)
-        else:
-            self.client = None
-        self.calendar_manager = CalendarManager()
-        
-    def analyze_schedule_request(self, user_request: str, duration_hours: float = 2.0) -> Dict:
+    search_days = 14  # Analysis horizon
+    
+    def __init__(self, calendar_manager: Optional[CalendarManager] = None,
+                 analysis_cache: Optional[AnalysisCache] = None,
+                 scoring_rules: Optional[ScoringRules] = None,
+                 classifier: Optional[KeywordClassifier] = None):
+        # The OpenAI client is shared process-wide so its connection pool stays warm
+        self.client = clients.get_openai_client()
+        self.calendar_manager = calendar_manager or CalendarManager()
+        self.analysis_cache = analysis_cache or get_shared_cache()
+        self.scoring_rules = scoring_rules or get_scoring_rules()
+        self.classifier = classifier or get_classifier()
+        self.prompt_builder = PromptBuilder()
+        self.router = RequestRouter()
+        self.llm = GuardedCompletions()  # deadlines, hedging, retries and the shared circuit breaker
+        self.prefetcher = None  # SnapshotPrefetcher keeping the horizon warm, set by the web server
+        self.single_flight = SingleFlight()  # identical concurrent analyses share one computation
+        
+    def analyze_schedule_request(self, user_request: str, duration_hours: float = 2.0,
+                                 snapshot: Optional[CalendarSnapshot] = None) -> Dict:
         """Analyze user's schedule request and recommend optimal time"""
+        if snapshot is not None:
+            # The caller's own snapshot may differ from the current calendar: not shared
+            return self._analyze(user_request, duration_hours, snapshot)
+        
+        # Identical requests arriving together fetch the calendar and ask the model once
+        result = self.single_flight.do(
+            self._flight_key(user_request, duration_hours),
+            lambda: self._analyze(user_request, duration_hours)
+        )
+        return self._own_copy(result, user_request, duration_hours)
+    
+    async def analyze_schedule_request_async(self, user_request: str, duration_hours: float = 2.0,
+                                             snapshot: Optional[CalendarSnapshot] = None) -> Dict:
+        """Asyncio version of analyze_schedule_request for the ASGI server"""
+        if snapshot is not None:
+            return await self._analyze_async(user_request, duration_hours, snapshot)
+        result = await self.single_flight.do_async(
+            self._flight_key(user_request, duration_hours),
+            lambda: self._analyze_async(user_request, duration_hours)
+        )
+        return self._own_copy(result, user_request, duration_hours)
+    
+    def _own_copy(self, result: Dict, user_request: str, duration_hours: float) -> Dict:
+        """A caller's private copy of a shared flight result, echoing its own wording"""
+        # Deep, so one caller changing its analysis or slots leaves the others' intact
+        return dict(copy.deepcopy(result), user_request=user_request, duration_hours=duration_hours)
+    
+    def _flight_key(self, user_request: str, duration_hours: float) -> Tuple:
+        """Requests equal up to case and spacing, against the same calendar version, share a flight"""
+        return (
+            ' '.join(user_request.lower().split()), round(float(duration_hours), 2),
+            self.search_days, self.calendar_manager.calendar_version
+        )
+    
+    def _analyze(self, user_request: str, duration_hours: float,
+                 snapshot: Optional[CalendarSnapshot] = None) -> Dict:
+        # One calendar fetch per request, shared by every stage below
+        with metrics.stage('calendar'):
+            snapshot = snapshot or self.get_snapshot()
+        with metrics.stage('slots'):
+            snapshot.free_slots(int(duration_hours * 60))
         
-        # Get calendar data (next 2 weeks)
-        start_date = datetime.now()
-        end_date = start_date + timedelta(days=14)
+        # Request analysis from AI
+        analysis = self._get_ai_analysis(user_request, snapshot, duration_hours)
         
-        events = self.calendar_manager.get_events(start_date, end_date)
-        free_slots = self.calendar_manager.get_free_time_slots(
-            start_date, end_date, int(duration_hours * 60)
-        )
+        return self._build_result(user_request, duration_hours, analysis, snapshot)
+    
+    async def _analyze_async(self, user_request: str, duration_hours: float,
+                             snapshot: Optional[CalendarSnapshot] = None) -> Dict:
+        # The calendar client is blocking, so the fetch runs in a worker thread
+        with metrics.stage('calendar'):
+            if snapshot is None:
+                snapshot = await asyncio.to_thread(self.get_snapshot)
+        with metrics.stage('slots'):
+            snapshot.free_slots(int(duration_hours * 60))
         
         # Request analysis from AI
-        analysis = self._get_ai_analysis(user_request, events, free_slots, duration_hours)
+        analysis = await self._get_ai_analysis_async(user_request, snapshot, duration_hours)
         
+        return self._build_result(user_request, duration_hours, analysis, snapshot)
+    
+    def get_snapshot(self, search_days: Optional[int] = None) -> CalendarSnapshot:
+        """Calendar snapshot of the analysis horizon (next 2 weeks by default)"""
+        if self.prefetcher is not None:
+            return self.prefetcher.get(search_days or self.search_days)
+        start_date = datetime.now()
+        end_date = start_date + timedelta(days=search_days or self.search_days)
+        return self.calendar_manager.get_snapshot(start_date, end_date)
+    
+    def _build_result(self, user_request: str, duration_hours: float, analysis: Dict,
+                      snapshot: CalendarSnapshot) -> Dict:
         return {
             'user_request': user_request,
             'duration_hours': duration_hours,
             'analysis': analysis,
-            'available_slots': free_slots,
-            'current_events': events
+            'available_slots': snapshot.free_slots(int(duration_hours * 60)).to_dicts(),
+            'current_events': snapshot.events.to_dicts()
         }
     
-    def _get_ai_analysis(self, user_request: str, events: List[Dict], 
-                        free_slots: List[Dict], duration_hours: float) -> Dict:
-        """Schedule analysis and recommendation using OpenAI API"""
+    def stream_schedule_analysis(self, user_request: str, duration_hours: float = 2.0,
+                                 snapshot: Optional[CalendarSnapshot] = None) -> Iterator[Tuple[str, Dict]]:
+        """Yield (event, data) pairs: free slots first, then recommendations as the model streams them"""
+        
+        snapshot = snapshot or self.get_snapshot()
+        free_slots = snapshot.free_slots(int(duration_hours * 60))
+        
+        # Deterministic part, available before any model output
+        yield 'slots', {
+            'available_slots': [
+                {
+                    'datetime': slot['start'].strftime("%Y-%m-%d %H:%M"),
+                    'duration_minutes': slot['duration_minutes']
+                }
+                for slot in free_slots
+            ]
+        }
         
-        if not self.client:
-            return self._create_fallback_analysis(user_request, free_slots)
+        decision = self._route(user_request, snapshot, duration_hours)
+        if decision.tier == 'local':
+            yield 'analysis', self._answer_locally(user_request, snapshot, duration_hours)
+            return
+        
+        analysis = None
+        if self.client:
+            prompt = self._build_prompt(user_request, snapshot, duration_hours)
+            cache_key = self._cache_key(user_request, duration_hours, snapshot, prompt)
+            analysis = self.analysis_cache.get(cache_key)
+            if analysis is not None:
+                self._record_tier('cache')
+            else:
+                # The entry rung streams; a failure escalates to the rest of the ladder without streaming
+                model = self.router.model_ladder[decision.rung]
+                deadline = Deadline(config.LLM_REQUEST_BUDGET)
+                parser = RecommendationStreamParser()
+                started = time.perf_counter()
+                escalate = True
+                try:
+                    for chunk in self.llm.stream(self.client, self._completion_params(prompt, model), deadline):
+                        if not chunk.choices:
+                            continue
+                        for recommendation in parser.feed(chunk.choices[0].delta.content or ''):
+                            yield 'recommendation', recommendation
+                    analysis = self._parse_ai_response(parser.text)
+                except (CircuitOpenError, DeadlineExceeded) as e:
+                    # Other models would wait on the same provider: fall back now
+                    metrics.annotate(llm_skipped=type(e).__name__)
+                    escalate = False
+                except Exception as e:
+                    print(f"OpenAI API error ({model}): {e}")
+                self.router.record(model, time.perf_counter() - started, answered=analysis is not None)
+                
+                if analysis is not None:
+                    metrics.annotate(tier=model)
+                elif escalate:
+                    analysis = self._call_ladder(prompt, decision.rung + 1, deadline)
+                
+                if analysis is not None:
+                    self.analysis_cache.put(cache_key, analysis)
+        
+        if analysis is None:
+            self._record_tier('fallback')
+            analysis = self._create_fallback_analysis(user_request, free_slots)
         
-        # Convert event information to string
-        events_summary = self._format_events_for_ai(events)
-        slots_summary = self._format_slots_for_ai(free_slots)
+        # The complete analysis replaces whatever was rendered progressively
+        yield 'analysis', analysis
+    
+    def _get_ai_analysis(self, user_request: str, snapshot: CalendarSnapshot,
+                         duration_hours: float) -> Dict:
+        """Schedule analysis and recommendation using OpenAI API"""
         
-        prompt = f"""
+        # Clear requests are answered by the local scorer without an LLM round trip
+        decision = self._route(user_request, snapshot, duration_hours)
+        if decision.tier == 'local':
+            return self._answer_locally(user_request, snapshot, duration_hours)
+        
+        if not self.client:
+            return self._finish_analysis(None, None, user_request, snapshot, duration_hours)
+        
+        with metrics.stage('prompt'):
+            prompt = self._build_prompt(user_request, snapshot, duration_hours)
+            cache_key = self._cache_key(user_request, duration_hours, snapshot, prompt)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            self._record_tier('cache')
+            return cached
+        
+        analysis = self._call_ladder(prompt, decision.rung)
+        return self._finish_analysis(analysis, cache_key, user_request, snapshot, duration_hours)
+    
+    async def _get_ai_analysis_async(self, user_request: str, snapshot: CalendarSnapshot,
+                                     duration_hours: float) -> Dict:
+        """Schedule analysis using the async OpenAI client, without holding a thread"""
+        decision = self._route(user_request, snapshot, duration_hours)
+        if decision.tier == 'local':
+            return self._answer_locally(user_request, snapshot, duration_hours)
+        
+        async_client = clients.get_async_openai_client()
+        if not async_client:
+            return self._finish_analysis(None, None, user_request, snapshot, duration_hours)
+        
+        with metrics.stage('prompt'):
+            prompt = self._build_prompt(user_request, snapshot, duration_hours)
+            cache_key = self._cache_key(user_request, duration_hours, snapshot, prompt)
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            self._record_tier('cache')
+            return cached
+        
+        analysis = await self._call_ladder_async(async_client, prompt, decision.rung)
+        return self._finish_analysis(analysis, cache_key, user_request, snapshot, duration_hours)
+    
+    def _route(self, user_request: str, snapshot: CalendarSnapshot, duration_hours: float) -> RouteDecision:
+        """Router decision from classification confidence and the free slots that suit the request type"""
+        with metrics.stage('route'):
+            request_type, confidence = self._classify_with_confidence(user_request)
+            duration_minutes = int(duration_hours * 60)
+            fits = self.scoring_rules.fits(snapshot.free_slots(duration_minutes), request_type, duration_minutes)
+            return self.router.decide(user_request, confidence, fits)
+    
+    def _answer_locally(self, user_request: str, snapshot: CalendarSnapshot,
+                        duration_hours: float) -> Dict:
+        """Analysis in the LLM's format built from the deterministic slot scores"""
+        started = time.perf_counter()
+        with metrics.stage('route'):
+            smart = self._enhance_with_smart_analysis(user_request, snapshot, duration_hours)
+            analysis = {
+                "request_analysis": f"{smart['request_type'].capitalize()} schedule request: '{user_request}'",
+                "recommendations": [
+                    {
+                        "datetime": slot['start'].strftime("%Y-%m-%d %H:%M"),
+                        "reason": slot['reason'],
+                        "priority": i + 1
+                    }
+                    for i, slot in enumerate(smart['scored_slots'][:3])
+                ],
+                "general_advice": smart['best_time_pattern'],
+                "notes": "Recommended from the best-scoring free time slots in your calendar."
+            }
+        self._record_tier('local', time.perf_counter() - started)
+        return analysis
+    
+    def _call_ladder(self, prompt: str, rung: int = 0, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Ask each model from the given rung up until one returns valid JSON, within the request's budget"""
+        deadline = deadline or Deadline(config.LLM_REQUEST_BUDGET)
+        for model in self.router.model_ladder[rung:]:
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                with metrics.stage('llm'):
+                    response = self.llm.create(self.client, self._completion_params(prompt, model), deadline)
+            except Exception as e:
+                error = e
+            stop, analysis = self._finish_rung(model, started, response, error)
+            if stop:
+                return analysis
+        return None
+    
+    async def _call_ladder_async(self, async_client, prompt: str, rung: int = 0,
+                                 deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Asyncio version of _call_ladder"""
+        deadline = deadline or Deadline(config.LLM_REQUEST_BUDGET)
+        for model in self.router.model_ladder[rung:]:
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                with metrics.stage('llm'):
+                    response = await self.llm.create_async(async_client, self._completion_params(prompt, model), deadline)
+            except Exception as e:
+                error = e
+            stop, analysis = self._finish_rung(model, started, response, error)
+            if stop:
+                return analysis
+        return None
+    
+    def _finish_rung(self, model: str, started: float, response, error: Optional[Exception]) -> Tuple[bool, Optional[Dict]]:
+        """(stop climbing, analysis) after one ladder call, recording its outcome"""
+        if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+            # Other models would wait on the same provider: fall back now
+            metrics.annotate(llm_skipped=type(error).__name__)
+            return True, None
+        
+        analysis = None
+        if error is None:
+            try:
+                analysis = self._parse_ai_response(response.choices[0].message.content)
+            except Exception as e:
+                error = e
+        if error is not None:
+            print(f"OpenAI API error ({model}): {error}")
+        
+        self.router.record(model, time.perf_counter() - started, answered=analysis is not None)
+        if analysis is not None:
+            metrics.annotate(tier=model)
+            return True, analysis
+        return False, None
+    
+    def _record_tier(self, tier: str, seconds: Optional[float] = None):
+        self.router.record(tier, seconds)
+        metrics.annotate(tier=tier)
+    
+    def _cache_key(self, user_request: str, duration_hours: float,
+                   snapshot: CalendarSnapshot, prompt: str) -> str:
+        """Cache key for the LLM answer; cached answers are dropped once the calendar changes"""
+        self.analysis_cache.check_calendar_version(snapshot.version)
+        search_days = (snapshot.end_date - snapshot.start_date).days
+        return make_cache_key(
+            user_request, self._classify_request_type(user_request), duration_hours,
+            snapshot.start_date.date(), search_days, prompt
+        )
+    
+    def _finish_analysis(self, analysis: Optional[Dict], cache_key: Optional[str], user_request: str,
+                         snapshot: CalendarSnapshot, duration_hours: float) -> Dict:
+        """Cache a successful answer, or fall back to the basic analysis"""
+        if analysis is None:
+            self._record_tier('fallback')
+            return self._create_fallback_analysis(user_request, snapshot.free_slots(int(duration_hours * 60)))
+        self.analysis_cache.put(cache_key, analysis)
+        return analysis
+    
+    def _build_prompt(self, user_request: str, snapshot: CalendarSnapshot,
+                      duration_hours: float) -> str:
+        """Prompt asking the model for recommendations in JSON"""
+        # Pack events and the best-scoring slots into the prompt's token budget
+        slots = snapshot.free_slots(int(duration_hours * 60))
+        scores = self._score_slots(slots, self._classify_request_type(user_request))
+        events_summary, slots_summary, stats = self.prompt_builder.pack(snapshot.events, slots, scores)
+        
+        prompt = self._prompt_template(user_request, duration_hours, events_summary, slots_summary)
+        stats.update(prompt_chars=len(prompt), prompt_tokens=count_tokens(prompt))
+        metrics.annotate(**stats)
+        return prompt
+    
+    def _prompt_template(self, user_request: str, duration_hours: float,
+                         events_summary: str, slots_summary: str) -> str:
+        return f"""
 You are a professional schedule management AI assistant. Please analyze the user's request and recommend the optimal time.
 
 User request: "{user_request}"
@@ -79,57 +388,26 @@ JSON format:
     "notes": "Precautions"
 }}
 """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a professional schedule management AI assistant. Always respond in JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            ai_response = response.choices[0].message.content
-            
-            # Try JSON parsing
-            try:
-                return json.loads(ai_response)
-            except json.JSONDecodeError:
-                # Default response when JSON parsing fails
-                return self._create_fallback_analysis(user_request, free_slots)
-                
-        except Exception as e:
-            print(f"OpenAI API error: {e}")
-            return self._create_fallback_analysis(user_request, free_slots)
     
-    def _format_events_for_ai(self, events: List[Dict]) -> str:
-        """Convert event information to AI-friendly format"""
-        if not events:
-            return "No scheduled events currently."
-        
-        formatted = []
-        for event in events[:10]:  # Only recent 10 events
-            start_time = event['start'].strftime("%m/%d %H:%M")
-            title = event['title']
-            duration = int((event['end'] - event['start']).total_seconds() / 60)
-            formatted.append(f"- {start_time}: {title} ({duration} min)")
-        
-        return "\n".join(formatted)
+    def _completion_params(self, prompt: str, model: Optional[str] = None) -> Dict:
+        """Chat completion arguments shared by the sync and async clients"""
+        return {
+            'model': model or self.router.model_ladder[0],
+            'messages': [
+                {"role": "system", "content": "You are a professional schedule management AI assistant. Always respond in JSON format."},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 1000
+        }
     
-    def _format_slots_for_ai(self, slots: List[Dict]) -> str:
-        """Convert available time slots to AI-friendly format"""
-        if not slots:
-            return "No available time slots."
-        
-        formatted = []
-        for slot in slots[:15]:  # Only top 15 slots
-            start_time = slot['start'].strftime("%m/%d %H:%M")
-            duration = slot['duration_minutes']
-            formatted.append(f"- {start_time}: {duration} min available")
-        
-        return "\n".join(formatted)
+    def _parse_ai_response(self, ai_response: str) -> Optional[Dict]:
+        """Parse the model's JSON answer, None when it is not valid JSON"""
+        # Try JSON parsing
+        try:
+            return json.loads(ai_response)
+        except json.JSONDecodeError:
+            return None
     
     def _create_fallback_analysis(self, user_request: str, free_slots: List[Dict]) -> Dict:
         """Provide basic analysis when AI API fails"""
@@ -149,133 +427,57 @@ JSON format:
             "notes": "AI analysis is temporarily unavailable, providing basic recommendations."
         }
     
-    def get_smart_suggestions(self, user_request: str, duration_hours: float = 2.0) -> Dict:
+    def get_smart_suggestions(self, user_request: str, duration_hours: float = 2.0,
+                              snapshot: Optional[CalendarSnapshot] = None) -> Dict:
         """More intelligent schedule suggestions (considering time slots, days, patterns)"""
         
-        analysis = self.analyze_schedule_request(user_request, duration_hours)
+        snapshot = snapshot or self.get_snapshot()
+        analysis = self.analyze_schedule_request(user_request, duration_hours, snapshot)
         
-        # Additional smart analysis
+        # Additional smart analysis on the same snapshot, so slots are not recomputed
         smart_analysis = self._enhance_with_smart_analysis(
-            user_request, analysis['available_slots']
+            user_request, snapshot, duration_hours
         )
         
         analysis['smart_analysis'] = smart_analysis
         
         return analysis
     
-    def _enhance_with_smart_analysis(self, user_request: str, slots: List[Dict]) -> Dict:
+    def _enhance_with_smart_analysis(self, user_request: str, snapshot: CalendarSnapshot,
+                                     duration_hours: float) -> Dict:
         """Enhance recommendations with smart analysis"""
+        slots = snapshot.free_slots(int(duration_hours * 60))
         
         # Analyze optimal time slots by request type
         request_type = self._classify_request_type(user_request)
         
-        # Calculate scores by time slot
-        scored_slots = []
-        for slot in slots:
-            score = self._calculate_time_score(slot, request_type)
-            scored_slots.append({
-                **slot,
-                'score': score,
-                'reason': self._get_time_reason(slot, request_type)
-            })
-        
-        # Sort by score
-        scored_slots.sort(key=lambda x: x['score'], reverse=True)
+        # Score every start time inside the free windows, keeping only the best 5
+        candidates, scores, reason_codes = self.scoring_rules.top_candidates(
+            slots, request_type, int(duration_hours * 60), k=5
+        )
+        scored_slots = [
+            {
+                **candidates[index],
+                'score': int(scores[index]),
+                'reason': self.scoring_rules.reason(reason_codes[index])
+            }
+            for index in range(len(candidates))
+        ]
         
         return {
             'request_type': request_type,
-            'scored_slots': scored_slots[:5],
-            'best_time_pattern': self._get_best_time_pattern(request_type)
+            'scored_slots': scored_slots,
+            'best_time_pattern': self.scoring_rules.best_time_pattern(request_type)
         }
     
+    def _score_slots(self, slots: SlotTable, request_type: str) -> np.ndarray:
+        """Scores of all slots at once, gathered from the compiled scoring tables"""
+        return self.scoring_rules.score(slots, request_type)[0]
+    
     def _classify_request_type(self, request: str) -> str:
         """Classify request type"""
-        request_lower = request.lower()
-        
-        if any(word in request_lower for word in ['hospital', 'doctor', 'checkup', 'dental', 'appointment']):
-            return 'medical'
-        elif any(word in request_lower for word in ['meeting', 'conference', 'presentation', 'present']):
-            return 'business'
-        elif any(word in request_lower for word in ['exercise', 'gym', 'yoga', 'fitness']):
-            return 'fitness'
-        elif any(word in request_lower for word in ['meal', 'lunch', 'dinner', 'cafe']):
-            return 'social'
-        elif any(word in request_lower for word in ['shopping', 'purchase', 'market']):
-            return 'shopping'
-        else:
-            return 'general'
-    
-    def _calculate_time_score(self, slot: Dict, request_type: str) -> int:
-        """Calculate scores by time slot"""
-        hour = slot['start'].hour
-        weekday = slot['start'].weekday()
-        score = 50  # Base score
-        
-        # Optimal time slots by request type
-        if request_type == 'medical':
-            if 9 <= hour <= 11:  # Morning time slot
-                score += 30
-            elif 14 <= hour <= 16:  # Afternoon time slot
-                score += 20
-        elif request_type == 'business':
-            if 9 <= hour <= 17:  # Business hours
-                score += 25
-        elif request_type == 'fitness':
-            if 6 <= hour <= 8 or 18 <= hour <= 20:  # Exercise time slot
-                score += 30
-        elif request_type == 'social':
-            if 12 <= hour <= 13 or 18 <= hour <= 20:  # Meal time slot
-                score += 25
-        elif request_type == 'shopping':
-            if 10 <= hour <= 12 or 14 <= hour <= 16:  # Shopping time slot
-                score += 20
-        
-        # Score by day of week
-        if weekday < 5:  # Weekday
-            score += 10
-        elif weekday == 5:  # Saturday
-            score += 5
-        
-        # Score by time length
-        if slot['duration_minutes'] >= 120:  # 2 hours or more
-            score += 15
-        elif slot['duration_minutes'] >= 90:  # 1.5 hours or more
-            score += 10
-        
-        return min(score, 100)  # Maximum 100 points
+        return self.classifier.classify(request)[0]
     
-    def _get_time_reason(self, slot: Dict, request_type: str) -> str:
-        """Reason for time slot selection"""
-        hour = slot['start'].hour
-        weekday = slot['start'].weekday()
-        
-        reasons = []
-        
-        if request_type == 'medical':
-            if 9 <= hour <= 11:
-                reasons.append("Morning time slots are less crowded at hospitals with shorter wait times")
-            elif 14 <= hour <= 16:
-                reasons.append("Afternoon time slots are convenient after lunch time")
-        
-        if weekday < 5:
-            reasons.append("Weekdays have minimal impact on work")
-        elif weekday == 5:
-            reasons.append("Saturday allows for weekend utilization")
-        
-        if slot['duration_minutes'] >= 120:
-            reasons.append("Sufficient time is secured to proceed comfortably")
-        
-        return "; ".join(reasons) if reasons else "Appropriate time slot"
-    
-    def _get_best_time_pattern(self, request_type: str) -> str:
-        """Optimal time pattern by request type"""
-        patterns = {
-            'medical': "9-11 AM or 2-4 PM are most suitable",
-            'business': "Weekday business hours 9 AM-5 PM are good",
-            'fitness': "6-8 AM or 6-8 PM exercise time is suitable",
-            'social': "Lunch time (12-1 PM) or evening time (6-8 PM) are good",
-            'shopping': "10 AM-12 PM or 2-4 PM are suitable",
-            'general': "Choose a time that fits your personal schedule"
-        }
-        
-        return patterns.get(request_type, "Choose a time that fits your personal schedule")
\ No newline at end of file
+    def _classify_with_confidence(self, request: str) -> Tuple[str, float]:
+        """Request type and the share of matched keyword weight behind it"""
+        return self.classifier.classify(request)
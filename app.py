@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
 import plotly.express as px
 import plotly.graph_objects as go
 from ai_agent import ScheduleAIAgent
 from calendar_manager import CalendarManager
+from snapshot import CalendarSnapshot
 import config
 
 # 페이지 설정
@@ -48,6 +50,72 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# 캐시된 리소스: 위젯 조작으로 다시 실행되어도 프로세스당 한 번만 생성
+@st.cache_resource(show_spinner=False)
+def get_calendar_manager() -> CalendarManager:
+    return CalendarManager()
+
+@st.cache_resource(show_spinner=False)
+def get_agent() -> ScheduleAIAgent:
+    return ScheduleAIAgent(get_calendar_manager())
+
+# 캐시된 데이터: 조회 기간으로 키를 잡고 STREAMLIT_CACHE_TTL 초 동안 재사용
+@st.cache_data(ttl=config.STREAMLIT_CACHE_TTL, show_spinner=False)
+def load_week_events(week_start: date) -> List[Dict]:
+    start = datetime.combine(week_start, time.min)
+    return get_calendar_manager().get_events(start, start + timedelta(days=7))
+
+@st.cache_data(ttl=config.STREAMLIT_CACHE_TTL, show_spinner=False)
+def week_events_frame(week_start: date) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            'Date': event['start'].strftime('%m/%d'),
+            'Time': event['start'].strftime('%H:%M'),
+            'Title': event['title'],
+            'Duration': f"{int((event['end'] - event['start']).total_seconds() / 60)} min"
+        }
+        for event in load_week_events(week_start)
+    ])
+
+# 스냅샷은 잠금을 가진 객체라 피클링 없이 리소스로 공유 (기간별 빈 시간은 스냅샷 안에서 캐시)
+@st.cache_resource(ttl=config.STREAMLIT_CACHE_TTL, max_entries=32, show_spinner=False)
+def load_snapshot(day: date, search_days: int) -> CalendarSnapshot:
+    return get_agent().get_snapshot(search_days)
+
+def invalidate_calendar_data():
+    """Drop cached events and snapshots so the next run refetches the calendar"""
+    load_week_events.clear()
+    week_events_frame.clear()
+    load_snapshot.clear()
+
+def invalidate_all():
+    """Settings changed: rebuild the agent (its OpenAI client) and refetch data"""
+    invalidate_calendar_data()
+    get_agent.clear()
+    for key in ['analysis', 'user_request', 'duration', 'slot_frame', 'scored_frame']:
+        st.session_state.pop(key, None)
+
+def slot_frame(available_slots: List[Dict]) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            'Date': slot['start'].strftime('%m/%d'),
+            'Time': slot['start'].strftime('%H:%M'),
+            'Available Time (min)': slot['duration_minutes'],
+            'Day': slot['start'].strftime('%A')
+        }
+        for slot in available_slots[:10]  # Top 10 only
+    ])
+
+def scored_frame(scored_slots: List[Dict]) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            'Time': slot['start'].strftime('%m/%d %H:%M'),
+            'Score': slot['score'],
+            'Reason': slot['reason']
+        }
+        for slot in scored_slots
+    ])
+
 def main():
     # 헤더
     st.markdown('<h1 class="main-header">🤖 AI Schedule Assistant</h1>', unsafe_allow_html=True)
@@ -72,6 +140,15 @@ def main():
         # Demo mode toggle
         demo_mode = st.checkbox("Demo mode (use virtual data)", value=True)
         
+        # 설정이 바뀌면 에이전트와 캘린더 캐시를 무효화
+        settings = (openai_key, demo_mode)
+        if st.session_state.get('settings', settings) != settings:
+            invalidate_all()
+        st.session_state['settings'] = settings
+        
+        if st.button("🔄 Refresh Calendar", use_container_width=True):
+            invalidate_calendar_data()
+        
         st.markdown("---")
         
         # Display current time
@@ -83,12 +160,9 @@ def main():
         
         # Calendar information
         st.subheader("📊 Calendar Information")
-        calendar_manager = CalendarManager()
-        
         # This week's event count
-        week_start = current_time - timedelta(days=current_time.weekday())
-        week_end = week_start + timedelta(days=6)
-        events = calendar_manager.get_events(week_start, week_end)
+        week_start = current_time.date() - timedelta(days=current_time.weekday())
+        events = load_week_events(week_start)
         
         st.metric("This Week's Schedule", len(events))
         st.metric("Today's Schedule", len([e for e in events if e['start'].date() == current_time.date()]))
@@ -131,21 +205,28 @@ def main():
             if user_request:
                 with st.spinner("AI is analyzing optimal time..."):
                     try:
-                        # Initialize AI agent
-                        ai_agent = ScheduleAIAgent()
+                        ai_agent = get_agent()
+                        
+                        # One calendar fetch for the whole search period, reused by every stage and rerun
+                        snapshot = load_snapshot(current_time.date(), search_days)
                         
                         # Schedule analysis
                         if demo_mode or not openai_key:
                             # Demo mode - basic analysis only
-                            analysis = ai_agent.analyze_schedule_request(user_request, duration_hours)
+                            analysis = ai_agent.analyze_schedule_request(user_request, duration_hours, snapshot)
                         else:
                             # Real AI analysis
-                            analysis = ai_agent.get_smart_suggestions(user_request, duration_hours)
+                            analysis = ai_agent.get_smart_suggestions(user_request, duration_hours, snapshot)
                         
                         # Save results
                         st.session_state['analysis'] = analysis
                         st.session_state['user_request'] = user_request
                         st.session_state['duration'] = duration_hours
+                        # Result tables are built once, not on every rerun
+                        st.session_state['slot_frame'] = slot_frame(analysis['available_slots'])
+                        st.session_state['scored_frame'] = scored_frame(
+                            analysis.get('smart_analysis', {}).get('scored_slots', [])
+                        )
                         
                     except Exception as e:
                         st.error(f"An error occurred during analysis: {str(e)}")
@@ -174,16 +255,7 @@ def main():
         # This week's schedule summary
         st.subheader("This Week's Schedule Summary")
         if events:
-            df_events = pd.DataFrame([
-                {
-                    'Date': event['start'].strftime('%m/%d'),
-                    'Time': event['start'].strftime('%H:%M'),
-                    'Title': event['title'],
-                    'Duration': f"{int((event['end'] - event['start']).total_seconds() / 60)} min"
-                }
-                for event in events
-            ])
-            st.dataframe(df_events, use_container_width=True)
+            st.dataframe(week_events_frame(week_start), use_container_width=True)
         else:
             st.info("No scheduled events for this week.")
     
@@ -229,18 +301,9 @@ def main():
         if analysis['available_slots']:
             st.subheader("📊 Available Time Slots")
             
-            # Prepare chart data
-            chart_data = []
-            for slot in analysis['available_slots'][:10]:  # Top 10 only
-                chart_data.append({
-                    'Date': slot['start'].strftime('%m/%d'),
-                    'Time': slot['start'].strftime('%H:%M'),
-                    'Available Time (min)': slot['duration_minutes'],
-                    'Day': slot['start'].strftime('%A')
-                })
+            df_chart = st.session_state['slot_frame']
             
-            if chart_data:
-                df_chart = pd.DataFrame(chart_data)
+            if not df_chart.empty:
                 
                 # Bar chart
                 fig = px.bar(
@@ -277,16 +340,9 @@ def main():
             if 'scored_slots' in smart:
                 st.subheader("🎯 Score-based Recommendations")
                 
-                scored_data = []
-                for slot in smart['scored_slots']:
-                    scored_data.append({
-                        'Time': slot['start'].strftime('%m/%d %H:%M'),
-                        'Score': slot['score'],
-                        'Reason': slot['reason']
-                    })
+                df_scored = st.session_state['scored_frame']
                 
-                if scored_data:
-                    df_scored = pd.DataFrame(scored_data)
+                if not df_scored.empty:
                     
                     # Score chart
                     fig_score = px.bar(
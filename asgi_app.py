@@ -0,0 +1,162 @@
+"""
+ASGI entry point serving the web UI with the asyncio analysis pipeline.
+
+Run with: uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import json
+import threading
+from typing import AsyncIterator
+from urllib.parse import parse_qs
+from web_app import HTML_TEMPLATE, app as flask_app, get_agent, get_push_channels, get_today_events
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send(send, status: int, body: bytes, content_type: str):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(body)).encode())
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, data, status: int = 200):
+    # Same JSON encoding as the Flask app (datetimes included)
+    await _send(send, status, flask_app.json.dumps(data).encode(), 'application/json')
+
+
+async def _send_events(send, frames: AsyncIterator[str]):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]
+    })
+    async for frame in frames:
+        await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _analysis_events(user_request: str, duration_hours: float) -> AsyncIterator[str]:
+    """Server-sent events of the streamed analysis, framed like the Flask route's"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def produce():
+        # The agent streams synchronously: drive it in a worker thread, handing each event to the loop
+        events = get_agent().stream_schedule_analysis(user_request, duration_hours)
+        try:
+            for item in events:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ('failure', {'error': str(e)}))
+        finally:
+            events.close()  # closed in its own thread; a client that left abandons the model stream
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield f"event: {event}\ndata: {flask_app.json.dumps(data)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    finally:
+        stopped.set()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.to_thread(get_agent)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            prefetcher = get_agent().prefetcher
+            if prefetcher is not None:
+                await asyncio.to_thread(prefetcher.stop)
+            push_channels = get_push_channels()
+            if push_channels is not None:
+                await asyncio.to_thread(push_channels.stop)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    path = scope['path']
+    method = scope['method']
+
+    if path == '/' and method == 'GET':
+        await _send(send, 200, HTML_TEMPLATE.encode(), 'text/html; charset=utf-8')
+
+    elif path == '/api/current-schedule' and method == 'GET':
+        try:
+            agent = get_agent()
+            today_events = await asyncio.to_thread(get_today_events, agent.calendar_manager, agent.prefetcher)
+            await _send_json(send, {'events': today_events})
+        except Exception as e:
+            await _send_json(send, {'error': str(e)})
+
+    elif path == '/api/analyze' and method == 'POST':
+        try:
+            data = json.loads(await _read_body(receive) or b'{}')
+            user_request = data.get('request', '')
+            duration_hours = data.get('duration', 2.0)
+
+            if not user_request:
+                await _send_json(send, {'error': '스케줄 요청이 필요합니다.'})
+                return
+
+            analysis = await get_agent().analyze_schedule_request_async(user_request, duration_hours)
+            await _send_json(send, analysis)
+        except Exception as e:
+            await _send_json(send, {'error': str(e)})
+
+    elif path == '/api/analyze/stream' and method == 'GET':
+        query = parse_qs(scope.get('query_string', b'').decode())
+        user_request = query.get('request', [''])[0]
+        try:
+            duration_hours = float(query.get('duration', [2.0])[0])
+        except ValueError:
+            duration_hours = 2.0
+
+        if not user_request:
+            await _send_json(send, {'error': '스케줄 요청이 필요합니다.'})
+            return
+
+        await _send_events(send, _analysis_events(user_request, duration_hours))
+
+    elif path == '/api/calendar/notifications' and method == 'POST':
+        await _read_body(receive)
+        push_channels = get_push_channels()
+        headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+        accepted = push_channels is not None and push_channels.handle(headers)
+        await _send(send, 200 if accepted else 404, b'', 'text/plain')
+
+    else:
+        await _send_json(send, {'error': 'Not found'}, status=404)
@@ -0,0 +1,206 @@
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import config
+from columnar import SlotTable, to_epoch
+from interval_engine import Interval
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _parse_minutes(hhmm: str) -> int:
+    """Convert 'HH:MM' to minutes since midnight"""
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def compile_weekday_templates(working_hours_by_weekday: Dict[int, List[Dict]],
+                              granularity: int) -> np.ndarray:
+    """Compile per-weekday working hours into a (7, cells per day) availability mask"""
+    templates = np.zeros((7, MINUTES_PER_DAY // granularity), dtype=bool)
+
+    for weekday, ranges in working_hours_by_weekday.items():
+        for hours in ranges or []:
+            # Round inwards so a cell is available only if fully inside working hours
+            start = -(-_parse_minutes(hours['start']) // granularity)
+            end = _parse_minutes(hours['end']) // granularity
+            templates[weekday, start:end] = True
+
+    return templates
+
+
+def dilate(mask: np.ndarray, cells: int) -> np.ndarray:
+    """Extend every set run forward by the given number of cells (along the last axis)"""
+    if cells <= 0 or not mask.any():
+        return mask
+    counts = np.cumsum(mask, axis=-1, dtype=np.int64)
+    counts = np.concatenate((np.zeros(mask.shape[:-1] + (1,), dtype=np.int64), counts), axis=-1)
+    index = np.arange(mask.shape[-1])
+    return (counts[..., index + 1] - counts[..., np.maximum(index - cells, 0)]) > 0
+
+
+def runs(mask: np.ndarray):
+    """Start and end cell of every run of set cells"""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return edges[0::2], edges[1::2]
+
+
+class AvailabilityGrid:
+    """Occupancy bitmap over whole days at a fixed minute granularity"""
+
+    def __init__(self, start_day: date, end_day: date, granularity: Optional[int] = None,
+                 working_hours_by_weekday: Optional[Dict[int, List[Dict]]] = None):
+        self.granularity = granularity or config.SLOT_GRANULARITY_MINUTES
+        if MINUTES_PER_DAY % self.granularity:
+            raise ValueError(f"Granularity must divide a day evenly: {self.granularity}")
+
+        self.start = datetime.combine(start_day, datetime.min.time())
+        self.days = max((end_day - start_day).days + 1, 0)
+        self.cells_per_day = MINUTES_PER_DAY // self.granularity
+
+        templates = compile_weekday_templates(
+            working_hours_by_weekday if working_hours_by_weekday is not None
+            else config.WORKING_HOURS_BY_WEEKDAY,
+            self.granularity
+        )
+        weekdays = (start_day.weekday() + np.arange(self.days)) % 7
+        self.available = templates[weekdays].reshape(-1)
+        self.busy = np.zeros(self.available.size, dtype=bool)
+
+    def add_busy(self, intervals: Iterable[Interval]):
+        """Mark local-time busy intervals"""
+        self.busy |= self.paint(intervals)
+
+    def add_busy_epochs(self, starts: np.ndarray, ends: np.ndarray):
+        """Mark busy intervals given as local epoch second arrays (see columnar.py)"""
+        origin = to_epoch(self.start)
+        self.busy |= self.paint_offsets(starts - origin, ends - origin)
+
+    def paint(self, intervals: Iterable[Interval]) -> np.ndarray:
+        """Bitmap of the intervals on this grid, rounding outwards to whole cells"""
+        starts, ends = [], []
+        for start, end in intervals:
+            starts.append(start)
+            ends.append(end)
+
+        # Plain timedelta arithmetic is far cheaper than numpy's datetime object conversion
+        origin = self.start
+        return self.paint_offsets(
+            np.array([(start - origin).total_seconds() for start in starts]),
+            np.array([(end - origin).total_seconds() for end in ends])
+        )
+
+    def paint_offsets(self, start_offsets: np.ndarray, end_offsets: np.ndarray) -> np.ndarray:
+        """Bitmap of intervals given as seconds from the grid start"""
+        size = self.available.size
+        if not len(start_offsets):
+            return np.zeros(size, dtype=bool)
+
+        cell_seconds = self.granularity * 60
+        start_cells = np.clip(np.floor(start_offsets / cell_seconds), 0, size).astype(np.int64)
+        end_cells = np.clip(np.ceil(end_offsets / cell_seconds), 0, size).astype(np.int64)
+
+        # Difference array: +1 where an interval opens, -1 where it closes
+        delta = np.zeros(size + 1, dtype=np.int32)
+        np.add.at(delta, start_cells, 1)
+        np.add.at(delta, end_cells, -1)
+        return np.cumsum(delta[:-1]) > 0
+
+    def free_mask(self, buffer_minutes: int = 0) -> np.ndarray:
+        """Available cells not covered by busy time plus the trailing buffer"""
+        buffer_cells = -(-buffer_minutes // self.granularity)
+        return self.available & ~dilate(self.busy, buffer_cells)
+
+    def free_slots(self, duration_minutes: int, buffer_minutes: int = 0) -> List[Dict]:
+        """Free runs long enough for duration_minutes, as slot dicts"""
+        return self.slots_from_mask(self.free_mask(buffer_minutes), duration_minutes)
+
+    def free_slot_table(self, duration_minutes: int, buffer_minutes: int = 0) -> SlotTable:
+        """Free runs long enough for duration_minutes, as a columnar slot table"""
+        return self.slot_table_from_mask(self.free_mask(buffer_minutes), duration_minutes)
+
+    def slots_from_mask(self, mask: np.ndarray, duration_minutes: int) -> List[Dict]:
+        """Runs of the mask long enough for duration_minutes, as slot dicts"""
+        return self.slot_table_from_mask(mask, duration_minutes).to_dicts()
+
+    def slot_table_from_mask(self, mask: np.ndarray, duration_minutes: int) -> SlotTable:
+        """Runs of the mask long enough for duration_minutes, without per-slot objects"""
+        starts, ends = runs(mask)
+        needed = -(-duration_minutes // self.granularity)
+        keep = (ends - starts) >= needed
+
+        origin = to_epoch(self.start)
+        cell_seconds = self.granularity * 60
+        return SlotTable(origin + starts[keep] * cell_seconds, origin + ends[keep] * cell_seconds)
+
+
+class GroupAvailability:
+    """Busy bitmaps of several attendees stacked into one matrix and intersected per cell"""
+
+    def __init__(self, start_day: date, end_day: date, calendar_ids: List[str],
+                 granularity: Optional[int] = None):
+        self.grid = AvailabilityGrid(start_day, end_day, granularity)
+        self.calendar_ids = list(calendar_ids)
+        self._rows = {calendar_id: row for row, calendar_id in enumerate(self.calendar_ids)}
+        self.busy = np.zeros((len(self.calendar_ids), self.grid.available.size), dtype=bool)
+
+    def add_busy(self, calendar_id: str, intervals: Iterable[Interval]):
+        """Mark busy intervals for one attendee"""
+        self.busy[self._rows[calendar_id]] |= self.grid.paint(intervals)
+
+    def common_slots(self, duration_minutes: int, buffer_minutes: int = 0) -> List[Dict]:
+        """Slots where every attendee is free"""
+        busy = self._dilated(buffer_minutes)
+        return self.grid.slots_from_mask(self.grid.available & ~busy.any(axis=0), duration_minutes)
+
+    def partial_slots(self, duration_minutes: int, buffer_minutes: int = 0) -> List[Dict]:
+        """Slots blocked by a single attendee's busy time, fewest conflicting minutes first
+
+        Windows of the requested length step across each block where only
+        that attendee is busy, reaching into time everyone already has free
+        only as far as needed to fit. A lone attendee has nobody to miss.
+        """
+        if len(self.calendar_ids) < 2:
+            return []
+
+        busy = self._dilated(buffer_minutes)
+        busy_count = busy.sum(axis=0)
+        needed = -(-duration_minutes // self.grid.granularity)
+        origin = to_epoch(self.grid.start)
+        cell_seconds = self.grid.granularity * 60
+
+        partial = []
+        for row, calendar_id in enumerate(self.calendar_ids):
+            others_free = self.grid.available & ((busy_count - busy[row]) == 0)
+            blocked = others_free & busy[row]  # everyone else is free here
+            if not blocked.any():
+                continue
+
+            starts = set()
+            run_starts, run_ends = runs(others_free)
+            for run_start, run_end in zip(run_starts, run_ends):
+                if run_end - run_start < needed:
+                    continue
+                block_starts, block_ends = runs(blocked[run_start:run_end])
+                for block_start, block_end in zip(block_starts + run_start, block_ends + run_start):
+                    starts.update(min(start, run_end - needed) for start in range(block_start, block_end, needed))
+            if not starts:
+                continue
+
+            starts = np.array(sorted(starts), dtype=np.int64)
+            conflicts = np.concatenate(([0], np.cumsum(busy[row], dtype=np.int64)))
+            conflict_cells = conflicts[starts + needed] - conflicts[starts]
+            slots = SlotTable(origin + starts * cell_seconds, origin + (starts + needed) * cell_seconds).to_dicts()
+            for slot, cells in zip(slots, conflict_cells):
+                partial.append({
+                    **slot,
+                    'missing_attendee': calendar_id,
+                    'conflict_minutes': int(cells) * self.grid.granularity
+                })
+
+        partial.sort(key=lambda slot: (slot['conflict_minutes'], slot['start']))
+        return partial
+
+    def _dilated(self, buffer_minutes: int) -> np.ndarray:
+        return dilate(self.busy, -(-buffer_minutes // self.grid.granularity))
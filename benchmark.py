@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the calendar and analysis hot paths on synthetic calendars.
+
+    python benchmark.py --sizes 1000 10000 100000 --output benchmark_results.json
+    python benchmark.py --baseline benchmark_results.json   # exit 1 on regressions
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+import config
+from ai_agent import ScheduleAIAgent
+from calendar_manager import CalendarManager
+from snapshot import CalendarSnapshot
+from synthetic_calendar import SyntheticCalendar
+
+
+class _Request:
+    def __init__(self, response: Dict):
+        self._response = response
+
+    def execute(self) -> Dict:
+        return self._response
+
+
+class StaticCalendarService:
+    """Calendar service stand-in answering events().list from a fixed item list, page by page"""
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+
+    def events(self):
+        return self
+
+    def list(self, maxResults: int = 250, pageToken: str = None, **params):
+        offset = int(pageToken or 0)
+        page = {'items': self.items[offset:offset + maxResults]}
+        if offset + maxResults < len(self.items):
+            page['nextPageToken'] = str(offset + maxResults)
+        else:
+            page['nextSyncToken'] = 'static'
+        return _Request(page)
+
+
+def _time(function: Callable, repeat: int, setup: Callable = None) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_benchmarks(sizes: List[int], repeat: int, seed: int) -> List[Dict]:
+    """Time each stage for every calendar size"""
+    agent = ScheduleAIAgent()
+    request = "Client meeting 1 hour"
+    results = []
+
+    for size in sizes:
+        generator = SyntheticCalendar(seed=seed)
+        events = generator.generate_count(size)
+        items = generator.to_api_items(events)
+        start_date = datetime.combine(events[0]['start'].date(), datetime.min.time())
+        end_date = datetime.combine(events[-1]['start'].date(), datetime.min.time()) + timedelta(days=1)
+        print(f"📦 {len(events)} events over {(end_date - start_date).days} days")
+
+        def fresh_manager(_=None):
+            calendar_manager = CalendarManager()
+            calendar_manager.service = StaticCalendarService(items)
+            return calendar_manager
+
+        def fresh_snapshot(_=None):
+            return CalendarSnapshot(start_date, end_date, events, agent.calendar_manager.timezone)
+
+        scored_snapshot = fresh_snapshot()
+        scored_snapshot.free_slots(60)
+
+        stages = {
+            'get_events': (lambda manager: manager.get_events(start_date, end_date), fresh_manager),
+            'free_slots_bitmap': (lambda snapshot: _with_engine('bitmap', snapshot), fresh_snapshot),
+            'free_slots_sweep': (lambda snapshot: _with_engine('sweep', snapshot), fresh_snapshot),
+            'smart_scoring': (lambda _: agent._enhance_with_smart_analysis(request, scored_snapshot, 1.0), None),
+            'prompt_formatting': (lambda _: agent._build_prompt(request, scored_snapshot, 1.0), None),
+        }
+
+        for name, (function, setup) in stages.items():
+            timings = _time(function, repeat, setup)
+            results.append({
+                'benchmark': name,
+                'events': len(events),
+                'repeat': repeat,
+                'min_seconds': min(timings),
+                'mean_seconds': statistics.mean(timings)
+            })
+            print(f"  - {name:<18} min {min(timings) * 1000:9.2f} ms   mean {statistics.mean(timings) * 1000:9.2f} ms")
+
+    return results
+
+
+def _with_engine(engine: str, snapshot: CalendarSnapshot):
+    default_engine = config.FREE_SLOT_ENGINE
+    config.FREE_SLOT_ENGINE = engine
+    try:
+        return snapshot.free_slots(60)
+    finally:
+        config.FREE_SLOT_ENGINE = default_engine
+
+
+def find_regressions(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """Benchmarks whose best time got slower than baseline by more than tolerance"""
+    previous = {(r['benchmark'], r['events']): r['min_seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['benchmark'], result['events']))
+        if before and result['min_seconds'] > before * (1 + tolerance):
+            regressions.append(
+                f"{result['benchmark']} @ {result['events']} events: "
+                f"{before * 1000:.2f} ms -> {result['min_seconds'] * 1000:.2f} ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown ratio')
+    args = parser.parse_args()
+
+    print("🚀 AI Schedule Assistant benchmarks")
+    results = run_benchmarks(args.sizes, args.repeat, args.seed)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'results': results
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
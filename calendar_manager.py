@@ -1,103 +1,118 @@
-import os
 import json
+import zlib
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 import pytz
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import config
-
-# Google Calendar API scopes
-SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+import clients
+import interval_engine
+from availability import AvailabilityGrid, GroupAvailability
+from columnar import EventTable, SlotTable
+from event_store import EventStore, event_list_request, iter_event_pages, to_local_naive
+from slot_index import FreeSlotIndex
+from snapshot import CalendarSnapshot
 
 class CalendarManager:
     def __init__(self):
         self.service = None
+        self._authenticated = False
         self.timezone = pytz.timezone(config.TIMEZONE)
+        self.event_store = EventStore(config.CALENDAR_ID, self.timezone, self._format_event)
+        self.slot_index = FreeSlotIndex(self)
+    
+    @property
+    def service(self):
+        """Calendar API service for the calling thread (None in demo mode)"""
+        if self._service is not None:
+            return self._service
+        if self._authenticated:
+            return clients.get_calendar_service()
+        return None
+    
+    @service.setter
+    def service(self, service):
+        self._service = service
         
+    @property
+    def calendar_version(self) -> int:
+        """Changes whenever the synced calendar data changes"""
+        return self.event_store.version
+    
     def authenticate(self):
         """Google Calendar API authentication"""
-        creds = None
-        
-        # Check if token file exists
-        if os.path.exists(config.GOOGLE_TOKEN_FILE):
-            creds = Credentials.from_authorized_user_file(config.GOOGLE_TOKEN_FILE, SCOPES)
-        
-        # If there are no valid credentials, run the OAuth flow
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                if os.path.exists(config.GOOGLE_CREDENTIALS_FILE):
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        config.GOOGLE_CREDENTIALS_FILE, SCOPES)
-                    creds = flow.run_local_server(port=0)
-                else:
-                    print("Google credentials file not found. Using mock data for demo.")
-                    return False
-            
-            # Save credentials for next run
-            with open(config.GOOGLE_TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
-        
+        # Credentials are shared process-wide; the service itself is built per thread
         try:
-            self.service = build('calendar', 'v3', credentials=creds)
-            return True
+            self._authenticated = clients.get_calendar_service() is not None
+            return self._authenticated
         except Exception as e:
             print(f"Error building calendar service: {e}")
             return False
     
     def get_events(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         """Retrieve calendar events for specified period"""
+        return list(self.iter_events(start_date, end_date))
+    
+    def iter_events(self, start_date: datetime, end_date: datetime) -> Iterator[Dict]:
+        """Yield calendar events for specified period, page by page as they arrive"""
         if not self.service:
-            return self._get_mock_events(start_date, end_date)
+            yield from self._get_mock_events(start_date, end_date)
+            return
         
+        yielded = False
         try:
-            events_result = self.service.events().list(
-                calendarId=config.CALENDAR_ID,
+            # Serve from the local store, pulling only the changes since the last sync
+            if self.event_store.covers(start_date):
+                self.event_store.sync_if_due(self.service)
+                yield from self.event_store.query(start_date, end_date)
+                return
+            
+            pages = iter_event_pages(
+                self.service,
+                config.CALENDAR_ID,
                 timeMin=start_date.isoformat() + 'Z',
                 timeMax=end_date.isoformat() + 'Z',
-                singleEvents=True,
                 orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            return self._format_events(events)
+            )
+            for page in pages:
+                for event in self._format_events(page.get('items', [])):
+                    yielded = True
+                    yield event
             
         except HttpError as error:
             print(f"Error fetching events: {error}")
-            return self._get_mock_events(start_date, end_date)
+            if yielded:
+                # Part of the period was already handed out, so mock data can't fill the rest
+                raise
+            yield from self._get_mock_events(start_date, end_date)
     
-    def _format_events(self, events: List[Dict]) -> List[Dict]:
+    def _format_events(self, events: Iterable[Dict]) -> Iterator[Dict]:
         """Format event data"""
-        formatted_events = []
-        
         for event in events:
-            start = event['start'].get('dateTime', event['start'].get('date'))
-            end = event['end'].get('dateTime', event['end'].get('date'))
-            
-            # Parse datetime
-            if 'T' in start:
-                start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-                end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
-            else:
-                start_dt = datetime.fromisoformat(start)
-                end_dt = datetime.fromisoformat(end)
-            
-            formatted_events.append({
-                'id': event.get('id', ''),
-                'title': event.get('summary', 'No Title'),
-                'start': start_dt,
-                'end': end_dt,
-                'description': event.get('description', ''),
-                'location': event.get('location', ''),
-                'all_day': 'date' in event['start']
-            })
+            yield self._format_event(event)
+    
+    def _format_event(self, event: Dict) -> Dict:
+        """Format a single API event resource"""
+        start = event['start'].get('dateTime', event['start'].get('date'))
+        end = event['end'].get('dateTime', event['end'].get('date'))
+        
+        # Parse datetime
+        if 'T' in start:
+            start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
+            end_dt = datetime.fromisoformat(end.replace('Z', '+00:00'))
+        else:
+            start_dt = datetime.fromisoformat(start)
+            end_dt = datetime.fromisoformat(end)
         
-        return formatted_events
+        return {
+            'id': event.get('id', ''),
+            'title': event.get('summary', 'No Title'),
+            'start': start_dt,
+            'end': end_dt,
+            'description': event.get('description', ''),
+            'location': event.get('location', ''),
+            'all_day': 'date' in event['start']
+        }
     
     def _get_mock_events(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         """Generate mock calendar events for demo"""
@@ -190,71 +205,178 @@ class CalendarManager:
         
         return mock_events
     
+    def get_event_table(self, start_date: datetime, end_date: datetime) -> EventTable:
+        """Events of the period as a columnar table, sliced straight from the store when it covers them"""
+        return self._fetch_event_table(start_date, end_date)[0]
+    
+    def _fetch_event_table(self, start_date: datetime, end_date: datetime) -> Tuple[EventTable, Optional[int]]:
+        """Events of the period and the store version they reflect (None when not read from the store)"""
+        if self.service and self.event_store.covers(start_date):
+            try:
+                self.event_store.sync_if_due(self.service)
+                return self.event_store.query_table_at(start_date, end_date)
+            except HttpError as error:
+                print(f"Error fetching events: {error}")
+                return EventTable.from_events(self._get_mock_events(start_date, end_date), self.timezone), None
+        return EventTable.from_events(self.iter_events(start_date, end_date), self.timezone), None
+    
+    def get_snapshot(self, start_date: datetime, end_date: datetime) -> CalendarSnapshot:
+        """Fetch the period once into an immutable snapshot for a whole analysis"""
+        events, version = self._fetch_event_table(start_date, end_date)
+        if version is None:
+            # Not from the store, so the slot index may hold other data: slots come from these events
+            return CalendarSnapshot(start_date, end_date, events, self.timezone, self.calendar_version)
+        
+        def lookup(duration: int) -> Optional[SlotTable]:
+            slots = self.slot_index.free_slots(start_date, end_date, duration)
+            # Synced since the fetch: the index no longer matches these events
+            return slots if self.calendar_version == version else None
+        
+        return CalendarSnapshot(start_date, end_date, events, self.timezone, version, slot_lookup=lookup)
+    
     def get_free_time_slots(self, start_date: datetime, end_date: datetime, 
                            duration_minutes: int = 60) -> List[Dict]:
         """Find available time slots within specified period"""
-        events = self.get_events(start_date, end_date)
-        
-        # Group by day
-        daily_events = {}
-        for event in events:
-            date_key = event['start'].date()
-            if date_key not in daily_events:
-                daily_events[date_key] = []
-            daily_events[date_key].append(event)
+        return list(self.iter_free_time_slots(start_date, end_date, duration_minutes))
+    
+    def iter_free_time_slots(self, start_date: datetime, end_date: datetime, 
+                             duration_minutes: int = 60) -> Iterator[Dict]:
+        """Yield available time slots while events are still streaming in"""
+        if config.FREE_SLOT_ENGINE == 'bitmap':
+            grid = self.get_availability_grid(start_date, end_date)
+            yield from grid.free_slots(duration_minutes, config.DEFAULT_BREAK_TIME)
+            return
         
-        free_slots = []
-        current_date = start_date.date()
-        end_date_only = end_date.date()
+        # One sweep over the whole horizon: pad and merge busy intervals, then walk the gaps
+        busy = interval_engine.busy_intervals(
+            self.iter_events(start_date, end_date),
+            self.timezone,
+            timedelta(minutes=config.DEFAULT_BREAK_TIME)
+        )
+        merged = interval_engine.merge_intervals(busy, presorted=True)
+        yield from interval_engine.iter_free_slots(
+            merged, start_date.date(), end_date.date(), duration_minutes
+        )
+    
+    def get_availability_grid(self, start_date: datetime, end_date: datetime) -> AvailabilityGrid:
+        """Occupancy bitmap for the period; free slots of any duration are array operations on it"""
+        grid = AvailabilityGrid(start_date.date(), end_date.date())
+        grid.add_busy(interval_engine.busy_intervals(self.iter_events(start_date, end_date), self.timezone))
+        return grid
+    
+    def get_group_free_slots(self, calendar_ids: List[str], start_date: datetime, end_date: datetime,
+                             duration_minutes: int = 60) -> Dict:
+        """Find slots where all attendees, or all but one, are free"""
+        busy_by_calendar, errors = self.get_group_busy(calendar_ids, start_date, end_date)
         
-        while current_date <= end_date_only:
-            if current_date.weekday() < 5:  # Weekdays only
-                day_events = daily_events.get(current_date, [])
-                day_slots = self._find_free_slots_for_day(
-                    current_date, day_events, duration_minutes
-                )
-                free_slots.extend(day_slots)
-            
-            current_date += timedelta(days=1)
+        # Calendars we could not read are left out of the intersection and reported
+        group = GroupAvailability(start_date.date(), end_date.date(), list(busy_by_calendar))
+        for calendar_id, intervals in busy_by_calendar.items():
+            group.add_busy(calendar_id, intervals)
         
-        return free_slots
+        return {
+            'calendars': list(busy_by_calendar),
+            'common_slots': group.common_slots(duration_minutes, config.DEFAULT_BREAK_TIME),
+            'partial_slots': group.partial_slots(duration_minutes, config.DEFAULT_BREAK_TIME),
+            'errors': errors
+        }
     
-    def _find_free_slots_for_day(self, date, events: List[Dict], 
-                                duration_minutes: int) -> List[Dict]:
-        """Find free time slots for specific date"""
-        # Set working hours
-        work_start = datetime.combine(date, datetime.min.time().replace(hour=9, minute=0))
-        work_end = datetime.combine(date, datetime.min.time().replace(hour=18, minute=0))
+    def get_group_busy(self, calendar_ids: List[str], start_date: datetime, end_date: datetime):
+        """Busy intervals per calendar from batched freebusy queries, plus per-calendar errors"""
+        if not self.service:
+            return self._get_mock_busy(calendar_ids, start_date, end_date), {}
         
-        # Sort events by time
-        sorted_events = sorted(events, key=lambda x: x['start'])
+        busy_by_calendar = {}
+        errors = {}
+        time_min = self._localize(start_date).isoformat()
+        time_max = self._localize(end_date).isoformat()
         
-        free_slots = []
-        current_time = work_start
+        # Each query covers up to 50 calendars; the queries themselves share batched round trips
+        chunks = [calendar_ids[offset:offset + config.FREEBUSY_BATCH_SIZE]
+                  for offset in range(0, len(calendar_ids), config.FREEBUSY_BATCH_SIZE)]
+        requests = [
+            self.service.freebusy().query(body={
+                'timeMin': time_min,
+                'timeMax': time_max,
+                'timeZone': config.TIMEZONE,
+                'items': [{'id': calendar_id} for calendar_id in chunk]
+            }, fields='calendars')
+            for chunk in chunks
+        ]
         
-        for event in sorted_events:
-            event_start = event['start']
-            event_end = event['end']
-            
-            # Check if there is sufficient time between current time and event start time
-            if (event_start - current_time).total_seconds() >= duration_minutes * 60:
-                free_slots.append({
-                    'start': current_time,
-                    'end': event_start,
-                    'duration_minutes': int((event_start - current_time).total_seconds() / 60),
-                    'date': date
-                })
+        for chunk, (result, error) in zip(chunks, clients.execute_batch(self.service, requests)):
+            if error is not None:
+                print(f"Error fetching free/busy: {error}")
+                errors.update({calendar_id: str(error) for calendar_id in chunk})
+                continue
             
-            # Update current time to event end time (including buffer time)
-            current_time = event_end + timedelta(minutes=config.DEFAULT_BREAK_TIME)
+            for calendar_id, calendar in result.get('calendars', {}).items():
+                if calendar.get('errors'):
+                    errors[calendar_id] = calendar['errors'][0].get('reason', 'unknown')
+                    continue
+                busy_by_calendar[calendar_id] = [
+                    (self._parse_api_time(block['start']), self._parse_api_time(block['end']))
+                    for block in calendar.get('busy', [])
+                ]
+        
+        return busy_by_calendar, errors
+    
+    def get_events_batch(self, windows: List[Tuple[str, datetime, datetime]]
+                         ) -> Tuple[List[List[Dict]], Dict[int, str]]:
+        """Events of several (calendar_id, start, end) windows from batched round trips, plus per-window errors"""
+        if not self.service:
+            return [self._get_mock_events(start_date, end_date) for _, start_date, end_date in windows], {}
         
-        # Check free time after last event
-        if (work_end - current_time).total_seconds() >= duration_minutes * 60:
-            free_slots.append({
-                'start': current_time,
-                'end': work_end,
-                'duration_minutes': int((work_end - current_time).total_seconds() / 60),
-                'date': date
-            })
+        events: List[List[Dict]] = [[] for _ in windows]
+        errors = {}
+        pending = []  # (window index, page token) still to fetch
+        for index, (calendar_id, start_date, end_date) in enumerate(windows):
+            if calendar_id == config.CALENDAR_ID and self.event_store.covers(start_date):
+                # The event store already keeps the configured calendar current
+                events[index] = self.get_events(start_date, end_date)
+            else:
+                pending.append((index, None))
         
-        return free_slots
\ No newline at end of file
+        # One batch per round: the first pages of every window, then the next pages of the long ones
+        while pending:
+            requests = [
+                event_list_request(
+                    self.service, windows[index][0], page_token,
+                    timeMin=self._localize(windows[index][1]).isoformat(),
+                    timeMax=self._localize(windows[index][2]).isoformat(),
+                    orderBy='startTime'
+                )
+                for index, page_token in pending
+            ]
+            following = []
+            for (index, _), (page, error) in zip(pending, clients.execute_batch(self.service, requests)):
+                if error is not None:
+                    print(f"Error fetching events for {windows[index][0]}: {error}")
+                    # Pages already fetched stay; mock data would mix invented meetings with real ones
+                    errors[index] = str(error)
+                    continue
+                events[index].extend(self._format_events(page.get('items', [])))
+                if page.get('nextPageToken'):
+                    following.append((index, page['nextPageToken']))
+            pending = following
+        
+        return events, errors
+    
+    def _get_mock_busy(self, calendar_ids: List[str], start_date: datetime, end_date: datetime) -> Dict:
+        """Mock busy intervals: the demo week shifted by a per-attendee number of hours"""
+        mock_events = self._get_mock_events(start_date, end_date)
+        busy_by_calendar = {}
+        for calendar_id in calendar_ids:
+            shift = timedelta(hours=zlib.crc32(calendar_id.encode()) % 5)
+            busy_by_calendar[calendar_id] = [
+                (event['start'] + shift, event['end'] + shift) for event in mock_events
+            ]
+        return busy_by_calendar
+    
+    def _localize(self, dt: datetime) -> datetime:
+        """Attach the configured timezone to naive local datetimes"""
+        return self.timezone.localize(dt) if dt.tzinfo is None else dt
+    
+    def _parse_api_time(self, value: str) -> datetime:
+        """Parse an RFC 3339 timestamp into naive local time"""
+        return to_local_naive(datetime.fromisoformat(value.replace('Z', '+00:00')), self.timezone)
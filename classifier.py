@@ -0,0 +1,109 @@
+import json
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import config
+
+# Separates requests joined for a batch pass; no keyword contains it
+_BATCH_SEPARATOR = '\n'
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Regex matching any of the terms, with shared prefixes factored into a trie
+
+    A flat alternation retries every term at every position; the trie tries
+    one branch per distinct next character and prefers the longest term.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end of a term
+
+    def build(node: Dict) -> str:
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not end:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        # Greedy, so longer terms through this node win over the one ending here
+        return body + '?' if end else body
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """Request type classifier over a bilingual keyword dictionary
+
+    Every keyword of every type and language is compiled into one trie-shaped
+    regular expression, so a request is scanned once however large the
+    dictionary grows. Keywords match anywhere in the lowercased
+    text, which also covers Korean words with particles attached ("병원에").
+    Matched weights are summed per type; the best type wins, earlier types
+    in the dictionary break ties, and its share of the matched weight is the
+    confidence.
+    """
+
+    def __init__(self, keywords: Dict[str, Dict[str, Dict[str, float]]]):
+        self.request_types = list(keywords)
+        self._terms: Dict[str, Tuple[int, float]] = {}
+        for type_index, request_type in enumerate(self.request_types):
+            for terms in keywords[request_type].values():
+                for term, weight in terms.items():
+                    if not term:
+                        continue
+                    # A term listed under two types counts for the first one
+                    self._terms.setdefault(term.lower(), (type_index, float(weight)))
+
+        self._pattern = re.compile(_trie_pattern(self._terms)) if self._terms else None
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'KeywordClassifier':
+        with open(path or config.REQUEST_KEYWORDS_FILE, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def classify(self, request: str) -> Tuple[str, float]:
+        """Request type and confidence (0.0 with 'general' when no keyword matches)"""
+        return self.classify_many([request])[0]
+
+    def classify_many(self, requests: Iterable[str]) -> List[Tuple[str, float]]:
+        """classify for many requests in a single regex pass over their joined text"""
+        requests = [request.replace(_BATCH_SEPARATOR, ' ').lower() for request in requests]
+        weights = np.zeros((len(requests), len(self.request_types)))
+        if self._pattern is not None and requests:
+            text = _BATCH_SEPARATOR.join(requests)
+            lengths = np.fromiter((len(request) + 1 for request in requests), dtype=np.int64, count=len(requests))
+            ends = np.cumsum(lengths)
+
+            positions, types, values = [], [], []
+            for match in self._pattern.finditer(text):
+                type_index, weight = self._terms[match.group()]
+                positions.append(match.start())
+                types.append(type_index)
+                values.append(weight)
+            rows = np.searchsorted(ends, np.array(positions, dtype=np.int64), side='right')
+            np.add.at(weights, (rows, np.array(types, dtype=np.int64)), values)
+
+        totals = weights.sum(axis=1)
+        best = weights.argmax(axis=1)  # first maximum, so dictionary order breaks ties
+        return [
+            (self.request_types[type_index], float(weights[row, type_index] / total)) if total else ('general', 0.0)
+            for row, (type_index, total) in enumerate(zip(best.tolist(), totals.tolist()))
+        ]
+
+
+_shared_classifier: Optional[KeywordClassifier] = None
+_shared_lock = threading.Lock()
+
+
+def get_classifier() -> KeywordClassifier:
+    """Classifier from config.REQUEST_KEYWORDS_FILE, compiled once per process"""
+    global _shared_classifier
+    with _shared_lock:
+        if _shared_classifier is None:
+            _shared_classifier = KeywordClassifier.load()
+        return _shared_classifier
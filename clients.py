@@ -0,0 +1,239 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+import openai
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+from googleapiclient.model import JsonModel
+import config
+import metrics
+
+# Google Calendar API scopes
+SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+
+_openai_lock = threading.Lock()
+_openai_client: Optional[openai.OpenAI] = None
+_async_openai_client: Optional[openai.AsyncOpenAI] = None
+
+_credentials_lock = threading.Lock()
+_credentials: Optional[Credentials] = None
+
+# googleapiclient services sit on httplib2, which is not thread-safe
+_thread_local = threading.local()
+
+
+class ResponseStats:
+    """Decoded size and JSON parse time of recent Calendar API responses"""
+
+    def __init__(self, window: int = 1000):
+        self.responses = 0
+        self.total_bytes = 0
+        self.total_parse_ms = 0.0
+        self._recent = deque(maxlen=window)  # (bytes, parse ms)
+        self._lock = threading.Lock()
+
+    def record(self, size: int, parse_ms: float):
+        with self._lock:
+            self.responses += 1
+            self.total_bytes += size
+            self.total_parse_ms += parse_ms
+            self._recent.append((size, parse_ms))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            recent = np.array(self._recent, dtype=float).reshape(-1, 2)
+            sizes, parse_ms = recent[:, 0], recent[:, 1]
+            return {
+                'responses': self.responses,
+                'total_bytes': self.total_bytes,
+                'total_parse_ms': self.total_parse_ms,
+                'bytes_p50': float(np.percentile(sizes, 50)) if sizes.size else 0.0,
+                'bytes_p95': float(np.percentile(sizes, 95)) if sizes.size else 0.0,
+                'parse_p50_ms': float(np.percentile(parse_ms, 50)) if parse_ms.size else 0.0,
+                'parse_p95_ms': float(np.percentile(parse_ms, 95)) if parse_ms.size else 0.0
+            }
+
+
+calendar_response_stats = ResponseStats()
+
+
+class MeasuredJsonModel(JsonModel):
+    """JsonModel that records the size and parse time of every response body
+
+    httplib2 has already undone the gzip transfer encoding when the body gets
+    here, so the size is what the JSON parser had to read. Figures go to
+    calendar_response_stats and are summed into the current request's
+    annotations; the parse time also counts as the 'calendar_parse' stage.
+    """
+
+    def deserialize(self, content):
+        started = time.perf_counter()
+        with metrics.stage('calendar_parse'):
+            body = super().deserialize(content)
+        parse_ms = (time.perf_counter() - started) * 1000
+        calendar_response_stats.record(len(content), parse_ms)
+        metrics.accumulate(calendar_responses=1, calendar_bytes=len(content), calendar_parse_ms=parse_ms)
+        return body
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=config.OPENAI_MAX_CONNECTIONS,
+        keepalive_expiry=config.OPENAI_KEEPALIVE_EXPIRY
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    # Calls pass their own, shorter timeout when the request deadline is closer
+    return httpx.Timeout(config.LLM_ATTEMPT_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT)
+
+
+def get_openai_client() -> Optional[openai.OpenAI]:
+    """Process-wide OpenAI client reusing one keep-alive connection pool"""
+    global _openai_client
+    if not config.OPENAI_API_KEY:
+        return None
+
+    with _openai_lock:
+        # The Streamlit UI can change the key at runtime
+        if _openai_client is None or _openai_client.api_key != config.OPENAI_API_KEY:
+            _openai_client = openai.OpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL,
+                max_retries=0,  # retried within the request's deadline by llm_guard
+                http_client=httpx.Client(
+                    limits=_http_limits(),
+                    timeout=_http_timeout()
+                )
+            )
+        return _openai_client
+
+
+def get_async_openai_client() -> Optional[openai.AsyncOpenAI]:
+    """Process-wide async OpenAI client for the ASGI server"""
+    global _async_openai_client
+    if not config.OPENAI_API_KEY:
+        return None
+
+    with _openai_lock:
+        if _async_openai_client is None or _async_openai_client.api_key != config.OPENAI_API_KEY:
+            _async_openai_client = openai.AsyncOpenAI(
+                api_key=config.OPENAI_API_KEY,
+                base_url=config.OPENAI_BASE_URL,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=_http_limits(),
+                    timeout=_http_timeout()
+                )
+            )
+        return _async_openai_client
+
+
+def get_credentials() -> Optional[Credentials]:
+    """Google credentials loaded once per process and refreshed under a lock"""
+    global _credentials
+    if config.CALENDAR_API_ENDPOINT:
+        # Local stand-ins (see stub_servers.py) need no OAuth
+        return AnonymousCredentials()
+
+    creds = _credentials
+    if creds and creds.valid:
+        return creds
+
+    with _credentials_lock:
+        # Another thread may have refreshed while we waited
+        creds = _credentials
+        if creds and creds.valid:
+            return creds
+
+        if creds is None and os.path.exists(config.GOOGLE_TOKEN_FILE):
+            creds = Credentials.from_authorized_user_file(config.GOOGLE_TOKEN_FILE, SCOPES)
+
+        # If there are no valid credentials, run the OAuth flow
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                if os.path.exists(config.GOOGLE_CREDENTIALS_FILE):
+                    flow = InstalledAppFlow.from_client_secrets_file(
+                        config.GOOGLE_CREDENTIALS_FILE, SCOPES)
+                    creds = flow.run_local_server(port=0)
+                else:
+                    print("Google credentials file not found. Using mock data for demo.")
+                    return None
+
+            # Save credentials for next run
+            with open(config.GOOGLE_TOKEN_FILE, 'w') as token:
+                token.write(creds.to_json())
+
+        _credentials = creds
+        return creds
+
+
+def get_calendar_service():
+    """Calendar API service for the calling thread, built once per thread"""
+    creds = get_credentials()
+    if creds is None:
+        return None
+
+    service = getattr(_thread_local, 'calendar_service', None)
+    if service is None:
+        client_options = {'api_endpoint': config.CALENDAR_API_ENDPOINT} if config.CALENDAR_API_ENDPOINT else None
+        service = build('calendar', 'v3', credentials=creds, cache_discovery=False,
+                        client_options=client_options, model=MeasuredJsonModel())
+        _thread_local.calendar_service = service
+    return service
+
+
+def reset_calendar_service():
+    """Drop this thread's Calendar service so the next call builds one for the current endpoint"""
+    _thread_local.__dict__.pop('calendar_service', None)
+
+
+def _new_batch(service, callback) -> BatchHttpRequest:
+    if config.CALENDAR_API_ENDPOINT:
+        # The discovery document's batch URL points at Google whatever the api_endpoint
+        return BatchHttpRequest(callback=callback,
+                                batch_uri=config.CALENDAR_API_ENDPOINT.rstrip('/') + '/batch/calendar/v3')
+    return service.new_batch_http_request(callback=callback)
+
+
+def execute_batch(service, requests: List) -> List[Tuple[Optional[Dict], Optional[HttpError]]]:
+    """Run independent API requests in multipart batches, returning (response, error) in request order
+
+    Up to GOOGLE_BATCH_SIZE requests share one HTTP round trip. Errors are
+    returned per request rather than raised, so one failing calendar or
+    window does not lose the others; a failed batch fails each of its parts.
+    """
+    if len(requests) == 1:
+        try:
+            return [(requests[0].execute(), None)]
+        except HttpError as error:
+            return [(None, error)]
+
+    results: List[Tuple[Optional[Dict], Optional[HttpError]]] = [(None, None)] * len(requests)
+
+    def store(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for offset in range(0, len(requests), config.GOOGLE_BATCH_SIZE):
+        chunk = requests[offset:offset + config.GOOGLE_BATCH_SIZE]
+        batch = _new_batch(service, store)
+        for index, request in enumerate(chunk, offset):
+            batch.add(request, request_id=str(index))
+        try:
+            batch.execute()
+        except HttpError as error:
+            for index in range(offset, offset + len(chunk)):
+                results[index] = (None, error)
+    return results
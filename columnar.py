@@ -0,0 +1,309 @@
+import sys
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
+
+# Times are stored as seconds since 1970-01-01 on the local wall clock
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Event flag bits
+FLAG_ALL_DAY = 1
+FLAG_AWARE = 2  # the source datetimes carried a UTC offset
+
+# (id, start, end, title, location, description, flags) as stored by EventStore
+EventRecord = Tuple[str, int, int, str, str, str, int]
+
+
+def to_epoch(dt: datetime) -> int:
+    """Local-naive datetime to local epoch seconds"""
+    return (dt - EPOCH) // timedelta(seconds=1)
+
+
+def from_epoch(seconds) -> datetime:
+    """Local epoch seconds back to a local-naive datetime"""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+@lru_cache(maxsize=None)
+def _zone(timezone):
+    # zoneinfo converts several times faster than pytz and gives the same local times
+    name = getattr(timezone, 'zone', None)
+    return ZoneInfo(name) if name else timezone
+
+
+def pack_event(event: Mapping, timezone) -> EventRecord:
+    """Compact record of an event dict, with local times and interned strings"""
+    start, end = event['start'], event['end']
+    flags = FLAG_ALL_DAY if event.get('all_day') else 0
+    if start.tzinfo is not None:
+        flags |= FLAG_AWARE
+        zone = _zone(timezone)
+        start = start.astimezone(zone).replace(tzinfo=None)
+        end = end.astimezone(zone).replace(tzinfo=None)
+    return (
+        event.get('id', ''), to_epoch(start), to_epoch(end),
+        sys.intern(event.get('title') or ''), sys.intern(event.get('location') or ''),
+        event.get('description') or '', flags
+    )
+
+
+def merge_epochs(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge start-ordered intervals into disjoint blocks; touching blocks are joined"""
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not starts.size:
+        return starts, ends
+
+    running_end = np.maximum.accumulate(ends)
+    opens = np.empty(starts.size, dtype=bool)
+    opens[0] = True
+    opens[1:] = starts[1:] > running_end[:-1]
+    first = np.flatnonzero(opens)
+    last = np.append(first[1:] - 1, starts.size - 1)
+    return starts[first], running_end[last]
+
+
+class StringPool:
+    """Interned strings addressed by int32 codes, shared by every slice of a table"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def codes(self, values: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.code(value) for value in values), dtype=np.int32)
+
+
+class EventRow(Mapping):
+    """Read-only dict-like view of one event in an EventTable"""
+    __slots__ = ('_table', '_index')
+    KEYS = ('id', 'title', 'start', 'end', 'description', 'location', 'all_day')
+
+    def __init__(self, table: 'EventTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return self._table.value(self._index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f'EventRow({dict(self)!r})'
+
+
+class EventTable(Sequence):
+    """Events as parallel numpy columns, ordered by start
+
+    Start and end are int64 local epoch seconds, titles, locations and
+    descriptions are codes into a StringPool and the all-day/aware bits live
+    in a flags column. Indexing yields EventRow views, so code written
+    against event dicts keeps working.
+    """
+    __slots__ = ('timezone', 'pool', 'ids', 'starts', 'ends', 'titles', 'locations',
+                 'descriptions', 'flags', '_max_duration')
+
+    def __init__(self, timezone, pool: StringPool, ids: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 titles: np.ndarray, locations: np.ndarray, descriptions: np.ndarray, flags: np.ndarray):
+        self.timezone = timezone
+        self.pool = pool
+        self.ids = ids
+        self.starts = starts
+        self.ends = ends
+        self.titles = titles
+        self.locations = locations
+        self.descriptions = descriptions
+        self.flags = flags
+        self._max_duration = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[EventRecord], timezone,
+                     pool: Optional[StringPool] = None) -> 'EventTable':
+        """Build from packed records, sorting by start (stable)"""
+        pool = pool or StringPool()
+        records = list(records)
+        ids = np.empty(len(records), dtype=object)
+        ids[:] = [record[0] for record in records]
+        table = cls(
+            timezone, pool, ids,
+            np.fromiter((record[1] for record in records), dtype=np.int64, count=len(records)),
+            np.fromiter((record[2] for record in records), dtype=np.int64, count=len(records)),
+            pool.codes(record[3] for record in records),
+            pool.codes(record[4] for record in records),
+            pool.codes(record[5] for record in records),
+            np.fromiter((record[6] for record in records), dtype=np.uint8, count=len(records))
+        )
+        order = np.argsort(table.starts, kind='stable')
+        return table.take(order)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Mapping], timezone) -> 'EventTable':
+        """Build from event dicts in CalendarManager's format"""
+        return cls.from_records((pack_event(event, timezone) for event in events), timezone)
+
+    def __len__(self) -> int:
+        return self.starts.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('event index out of range')
+        return EventRow(self, index)
+
+    def __iter__(self) -> Iterator[EventRow]:
+        return (EventRow(self, index) for index in range(len(self)))
+
+    def take(self, indices: np.ndarray) -> 'EventTable':
+        """Rows at the given positions, sharing the string pool"""
+        return EventTable(
+            self.timezone, self.pool, self.ids[indices], self.starts[indices], self.ends[indices],
+            self.titles[indices], self.locations[indices], self.descriptions[indices], self.flags[indices]
+        )
+
+    def value(self, index: int, key: str):
+        """Field of one row, decoded the way CalendarManager formats events"""
+        if key == 'start':
+            return self._datetime(self.starts[index], self.flags[index])
+        if key == 'end':
+            return self._datetime(self.ends[index], self.flags[index])
+        if key == 'all_day':
+            return bool(self.flags[index] & FLAG_ALL_DAY)
+        if key == 'id':
+            return self.ids[index]
+        column = {'title': self.titles, 'location': self.locations, 'description': self.descriptions}[key]
+        return self.pool.strings[column[index]]
+
+    def _datetime(self, seconds, flags) -> datetime:
+        dt = from_epoch(seconds)
+        return dt.replace(tzinfo=_zone(self.timezone)) if flags & FLAG_AWARE else dt
+
+    def window(self, start_date: datetime, end_date: datetime) -> 'EventTable':
+        """Events overlapping [start_date, end_date) given as local-naive datetimes"""
+        if self._max_duration is None:
+            self._max_duration = int((self.ends - self.starts).max(initial=0))
+        range_start, range_end = to_epoch(start_date), to_epoch(end_date)
+
+        # No event is longer than the longest one, so nothing before this can overlap
+        lo = np.searchsorted(self.starts, range_start - self._max_duration, side='left')
+        hi = np.searchsorted(self.starts, range_end, side='left')
+        candidates = np.arange(lo, hi)
+        return self.take(candidates[self.ends[lo:hi] > range_start])
+
+    def busy_epochs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Disjoint busy blocks as local epoch start and end arrays"""
+        return merge_epochs(self.starts, self.ends)
+
+    def to_dicts(self) -> List[Dict]:
+        return [dict(row) for row in self]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns (string pool excluded)"""
+        columns = (self.starts, self.ends, self.titles, self.locations, self.descriptions, self.flags)
+        return sum(column.nbytes for column in columns) + self.ids.nbytes
+
+
+class SlotRow(Mapping):
+    """Read-only dict-like view of one free slot in a SlotTable"""
+    __slots__ = ('_table', '_index')
+    KEYS = ('start', 'end', 'duration_minutes', 'date')
+
+    def __init__(self, table: 'SlotTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return self._table.value(self._index, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __repr__(self) -> str:
+        return f'SlotRow({dict(self)!r})'
+
+
+class SlotTable(Sequence):
+    """Free slots as local epoch start/end columns with vectorized calendar fields"""
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    @classmethod
+    def from_slots(cls, slots: Iterable[Mapping]) -> 'SlotTable':
+        """Build from slot dicts ({'start', 'end', ...})"""
+        starts, ends = [], []
+        for slot in slots:
+            starts.append(to_epoch(slot['start']))
+            ends.append(to_epoch(slot['end']))
+        return cls(np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return self.starts.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SlotTable(self.starts[index], self.ends[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('slot index out of range')
+        return SlotRow(self, index)
+
+    def __iter__(self) -> Iterator[SlotRow]:
+        return (SlotRow(self, index) for index in range(len(self)))
+
+    def take(self, indices: np.ndarray) -> 'SlotTable':
+        return SlotTable(self.starts[indices], self.ends[indices])
+
+    def value(self, index: int, key: str):
+        if key == 'start':
+            return from_epoch(self.starts[index])
+        if key == 'end':
+            return from_epoch(self.ends[index])
+        if key == 'duration_minutes':
+            return int(self.ends[index] - self.starts[index]) // 60
+        return (EPOCH + timedelta(days=int(self.starts[index] // SECONDS_PER_DAY))).date()
+
+    @property
+    def duration_minutes(self) -> np.ndarray:
+        return (self.ends - self.starts) // 60
+
+    @property
+    def hours(self) -> np.ndarray:
+        """Local start hour of every slot"""
+        return (self.starts % SECONDS_PER_DAY) // 3600
+
+    @property
+    def weekdays(self) -> np.ndarray:
+        """Start weekday of every slot (0 = Monday; 1970-01-01 was a Thursday)"""
+        return (self.starts // SECONDS_PER_DAY + 3) % 7
+
+    def to_dicts(self) -> List[Dict]:
+        return [dict(row) for row in self]
@@ -6,11 +6,46 @@ load_dotenv()
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+OPENAI_KEEPALIVE_EXPIRY = 60  # seconds an idle connection stays in the pool
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # e.g. a local stand-in for load tests
+
+# Time slot scoring rules and request type keywords, compiled at startup
+SCORING_RULES_FILE = os.getenv('SCORING_RULES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoring_rules.json'))
+REQUEST_KEYWORDS_FILE = os.getenv('REQUEST_KEYWORDS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'request_keywords.json'))
+CANDIDATE_GRANULARITY_MINUTES = int(os.getenv('CANDIDATE_GRANULARITY_MINUTES', '30'))  # start times tried inside a free window
+
+# Request routing: the local scorer answers clear requests, the rest climb the model ladder
+LLM_MODEL_LADDER = [model.strip() for model in os.getenv('LLM_MODEL_LADDER', 'gpt-3.5-turbo,gpt-4').split(',') if model.strip()]
+ROUTER_MIN_CONFIDENCE = float(os.getenv('ROUTER_MIN_CONFIDENCE', '0.8'))  # request type classification
+ROUTER_MIN_SLOTS = 3  # slots in the request type's preferred hours needed for a local answer
+ROUTER_HEAVY_CONSTRAINTS = 2  # time constraints that skip the first ladder rung
+
+# Deadline-aware LLM calls: past the budget, or while the circuit is open, the fallback answers
+LLM_REQUEST_BUDGET = float(os.getenv('LLM_REQUEST_BUDGET', '10'))  # seconds for all LLM attempts of one request
+LLM_ATTEMPT_TIMEOUT = float(os.getenv('LLM_ATTEMPT_TIMEOUT', '6'))  # seconds for a single call
+LLM_CONNECT_TIMEOUT = 3.0
+LLM_MAX_RETRIES = 2  # retries per model after timeouts, connection errors, 429 and 5xx
+LLM_RETRY_BASE_DELAY = 0.2  # seconds; full-jitter exponential backoff
+LLM_RETRY_MAX_DELAY = 2.0
+LLM_HEDGE_PERCENTILE = 95  # a duplicate call is sent once the first runs past this latency percentile
+LLM_HEDGE_MIN_SAMPLES = 20  # latencies of a model needed before hedging it
+LLM_BREAKER_FAILURES = 5  # consecutive failed calls that open the circuit
+LLM_BREAKER_COOLDOWN = 30.0  # seconds the circuit stays open before a trial call
+
+# Tokens of schedule context (events and free slots) packed into each LLM prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', '800'))
+
+# LLM response cache
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '256'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', '600'))  # seconds
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH')  # SQLite file for an on-disk cache, memory only when unset
 
 # Google Calendar Configuration
 GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE', 'credentials.json')
 GOOGLE_TOKEN_FILE = os.getenv('GOOGLE_TOKEN_FILE', 'token.json')
 CALENDAR_ID = os.getenv('CALENDAR_ID', 'primary')
+CALENDAR_API_ENDPOINT = os.getenv('CALENDAR_API_ENDPOINT')  # local stand-in, used without credentials
 
 # Application Configuration
 TIMEZONE = 'Asia/Seoul'
@@ -18,4 +53,40 @@ DEFAULT_WORKING_HOURS = {
     'start': '09:00',
     'end': '18:00'
 }
-DEFAULT_BREAK_TIME = 30  # minutes between appointments
\ No newline at end of file
+DEFAULT_BREAK_TIME = 30  # minutes between appointments
+
+# Working hours per weekday (0 = Monday); weekdays left out are unavailable
+WORKING_HOURS_BY_WEEKDAY = {
+    weekday: [DEFAULT_WORKING_HOURS] for weekday in range(5)
+}
+
+# Free slot computation
+FREE_SLOT_ENGINE = os.getenv('FREE_SLOT_ENGINE', 'bitmap')  # 'bitmap' or 'sweep'
+SLOT_GRANULARITY_MINUTES = int(os.getenv('SLOT_GRANULARITY_MINUTES', '15'))  # must divide 24 hours
+SLOT_INDEX_DURATIONS = [30, 60, 90, 120, 180, 240]  # minutes; free slots indexed per day for these buckets
+
+# Streamlit UI: seconds cached calendar data (events, snapshots, tables) is reused
+STREAMLIT_CACHE_TTL = int(os.getenv('STREAMLIT_CACHE_TTL', '300'))
+
+# Calendar sync configuration
+CALENDAR_SYNC_INTERVAL = int(os.getenv('CALENDAR_SYNC_INTERVAL', '30'))  # seconds between incremental syncs
+CALENDAR_SYNC_LOOKBACK_DAYS = 7  # how far back the local event store reaches
+
+# Push notifications (events().watch); polling only when unset
+PUSH_WEBHOOK_URL = os.getenv('PUSH_WEBHOOK_URL')  # public HTTPS address of /api/calendar/notifications
+PUSH_CHANNEL_TOKEN = os.getenv('PUSH_CHANNEL_TOKEN')  # echoed back with every notification; random when unset
+PUSH_CHANNEL_TTL = int(os.getenv('PUSH_CHANNEL_TTL', '86400'))  # requested channel lifetime in seconds
+PUSH_RENEW_BEFORE = 600  # seconds before expiry that the replacement channel is opened
+PUSH_FALLBACK_SYNC_INTERVAL = 900  # seconds between syncs while a channel is open, in case a notification is lost
+
+# Background prefetch of the next horizon in the web server
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+PREFETCH_HORIZON_DAYS = int(os.getenv('PREFETCH_HORIZON_DAYS', '14'))
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '30'))  # seconds between refreshes
+PREFETCH_JITTER = 0.2  # +/- fraction of the interval
+PREFETCH_MAX_STALENESS = float(os.getenv('PREFETCH_MAX_STALENESS', '120'))  # seconds before requests fetch themselves
+PREFETCH_DURATIONS = SLOT_INDEX_DURATIONS  # free slot durations the web UI offers
+
+# Group scheduling
+FREEBUSY_BATCH_SIZE = 50  # calendars per freebusy().query call (API limit is 50)
+GOOGLE_BATCH_SIZE = 50  # requests per Calendar API batch round trip (Google advises at most 50)
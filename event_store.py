@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+from googleapiclient.errors import HttpError
+import config
+from columnar import EPOCH, SECONDS_PER_DAY, EventRecord, EventRow, EventTable, StringPool, pack_event
+
+
+def to_local_naive(dt: datetime, timezone) -> datetime:
+    """Convert a datetime to naive local time so aware and naive values compare"""
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone).replace(tzinfo=None)
+
+
+def record_days(record: EventRecord) -> Set[date]:
+    """Local days whose free time an event affects, including the break after it"""
+    first = record[1] // SECONDS_PER_DAY
+    last = (record[2] + config.DEFAULT_BREAK_TIME * 60 - 1) // SECONDS_PER_DAY
+    return {(EPOCH + timedelta(days=day)).date() for day in range(first, max(last, first) + 1)}
+
+
+# Partial response: only the parts of an event resource that _format_event reads
+EVENT_LIST_FIELDS = 'nextPageToken,nextSyncToken,items(id,status,summary,description,location,start,end)'
+
+
+def event_list_request(service, calendar_id: str, page_token: Optional[str] = None, **params):
+    """events().list request for one page, asking only for EVENT_LIST_FIELDS"""
+    return service.events().list(
+        calendarId=calendar_id,
+        singleEvents=True,
+        maxResults=2500,
+        pageToken=page_token,
+        fields=EVENT_LIST_FIELDS,
+        **params
+    )
+
+
+def iter_event_pages(service, calendar_id: str, **params) -> Iterator[Dict]:
+    """Yield raw events().list responses, following nextPageToken until the last page"""
+    page_token = None
+    while True:
+        page = event_list_request(service, calendar_id, page_token, **params).execute()
+        yield page
+
+        page_token = page.get('nextPageToken')
+        if not page_token:
+            return
+
+
+class EventStore:
+    """In-memory copy of one calendar kept current with incremental sync tokens"""
+
+    def __init__(self, calendar_id: str, timezone, format_event: Callable[[Dict], Dict]):
+        self.calendar_id = calendar_id
+        self.timezone = timezone
+        self._format_event = format_event
+        # Compact records rather than dicts; the columnar table is rebuilt lazily after changes
+        self._events: Dict[str, EventRecord] = {}
+        self._table: Optional[EventTable] = None
+        self._pool = StringPool()
+        self._lock = threading.RLock()
+
+        self.sync_token: Optional[str] = None
+        self.time_min: Optional[datetime] = None
+        self.last_sync: Optional[float] = None
+        self.sync_interval = config.CALENDAR_SYNC_INTERVAL  # lengthened while push notifications arrive
+        self.version = 0
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        # Called with the days touched by a sync, or None after a full rebuild
+        self._listeners: List[Callable[[Optional[Set[date]]], None]] = []
+
+    def add_listener(self, listener: Callable[[Optional[Set[date]]], None]):
+        """Register a callback for event changes, e.g. to invalidate derived data per day"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def covers(self, start_date: datetime) -> bool:
+        """Whether a range starting at start_date can be answered from the store"""
+        if self.time_min is None:
+            return True  # The first sync will set the horizon from now
+        return to_local_naive(start_date, self.timezone) >= self.time_min
+
+    def sync_if_due(self, service) -> int:
+        """Sync unless the last sync is more recent than sync_interval"""
+        with self._lock:
+            if self.last_sync is not None and \
+                    time.monotonic() - self.last_sync < self.sync_interval:
+                return 0
+            return self.sync(service)
+
+    def sync(self, service) -> int:
+        """Apply changes since the last sync, returning the number of changed events"""
+        with self._lock:
+            if self.sync_token:
+                try:
+                    return self._incremental_sync(service)
+                except HttpError as error:
+                    # 410 Gone: the sync token expired, local state must be rebuilt
+                    if error.resp.status != 410:
+                        raise
+                    print("Calendar sync token expired, running full resync.")
+            return self._full_sync(service)
+
+    def _full_sync(self, service) -> int:
+        """Rebuild the store from a full listing"""
+        time_min = datetime.now(self.timezone) - timedelta(days=config.CALENDAR_SYNC_LOOKBACK_DAYS)
+        events = {}
+        sync_token = None
+        for page in iter_event_pages(service, self.calendar_id, timeMin=time_min.isoformat()):
+            for item in page.get('items', []):
+                if item.get('status') != 'cancelled':
+                    events[item['id']] = self._pack(item)
+            sync_token = page.get('nextSyncToken')
+
+        self._events = events
+        self._pool = StringPool()  # Drop strings only the replaced events used
+        self.sync_token = sync_token
+        self.time_min = time_min.replace(tzinfo=None)
+        self.full_syncs += 1
+        self._mark_changed()
+        return len(events)
+
+    def _incremental_sync(self, service) -> int:
+        """Fetch only the events changed since the stored sync token"""
+        changed = 0
+        days: Set[date] = set()
+        sync_token = None
+        for page in iter_event_pages(service, self.calendar_id, syncToken=self.sync_token):
+            for item in page.get('items', []):
+                # Both the old and the new times of a moved event are affected
+                if item.get('status') == 'cancelled':
+                    previous = self._events.pop(item['id'], None)
+                    if previous is not None:
+                        days |= record_days(previous)
+                        changed += 1
+                else:
+                    record = self._pack(item)
+                    previous = self._events.get(item['id'])
+                    if previous is not None:
+                        days |= record_days(previous)
+                    days |= record_days(record)
+                    self._events[item['id']] = record
+                    changed += 1
+            sync_token = page.get('nextSyncToken')
+
+        self.sync_token = sync_token
+        self.incremental_syncs += 1
+        if changed:
+            self._mark_changed(days)
+        else:
+            self.last_sync = time.monotonic()
+        return changed
+
+    def _mark_changed(self, days: Optional[Set[date]] = None):
+        self._table = None
+        self.version += 1
+        self.last_sync = time.monotonic()
+        for listener in self._listeners:
+            listener(days)
+
+    def _pack(self, item: Dict) -> EventRecord:
+        return pack_event(self._format_event(item), self.timezone)
+
+    def table(self) -> EventTable:
+        """All stored events as a start-ordered columnar table"""
+        with self._lock:
+            if self._table is None:
+                self._table = EventTable.from_records(self._events.values(), self.timezone, self._pool)
+            return self._table
+
+    def query_table(self, start_date: datetime, end_date: datetime) -> EventTable:
+        """Events overlapping [start_date, end_date) as a columnar table"""
+        return self.table().window(
+            to_local_naive(start_date, self.timezone), to_local_naive(end_date, self.timezone)
+        )
+
+    def query_table_at(self, start_date: datetime, end_date: datetime) -> Tuple[EventTable, int]:
+        """query_table together with the version it reflects, read atomically"""
+        with self._lock:
+            return self.query_table(start_date, end_date), self.version
+
+    def query(self, start_date: datetime, end_date: datetime) -> List[EventRow]:
+        """Events overlapping [start_date, end_date), ordered by start time"""
+        return list(self.query_table(start_date, end_date))
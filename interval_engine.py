@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import config
+from event_store import to_local_naive
+
+Interval = Tuple[datetime, datetime]
+
+
+def busy_intervals(events: Iterable[Dict], timezone,
+                   buffer: timedelta = timedelta(0)) -> Iterator[Interval]:
+    """Turn events into local-time busy intervals, padding each end with a buffer"""
+    for event in events:
+        start = to_local_naive(event['start'], timezone)
+        end = to_local_naive(event['end'], timezone)
+        if end > start:
+            yield start, end + buffer
+
+
+def merge_intervals(intervals: Iterable[Interval], presorted: bool = False) -> Iterator[Interval]:
+    """Sweep over intervals by start time and yield disjoint merged blocks
+
+    With presorted=True the input is consumed lazily and must already be ordered
+    by start, as CalendarManager.iter_events yields it.
+    """
+    if not presorted:
+        intervals = sorted(intervals)
+
+    current: Optional[list] = None
+    for start, end in intervals:
+        if current is None:
+            current = [start, end]
+        elif start <= current[1]:
+            # Overlapping or touching: extend the open block
+            current[0] = min(current[0], start)
+            current[1] = max(current[1], end)
+        else:
+            yield current[0], current[1]
+            current = [start, end]
+
+    if current is not None:
+        yield current[0], current[1]
+
+
+def free_gaps(busy: Iterable[Interval], windows: Iterable[Interval],
+              min_duration: timedelta) -> Iterator[Interval]:
+    """Yield gaps of at least min_duration inside windows not covered by busy blocks
+
+    Both inputs must be ordered and disjoint; busy blocks may span several windows.
+    """
+    busy = iter(busy)
+    block = next(busy, None)
+
+    for window_start, window_end in windows:
+        cursor = window_start
+
+        while block is not None and block[0] < window_end:
+            if block[1] <= cursor:
+                block = next(busy, None)
+                continue
+
+            if block[0] - cursor >= min_duration:
+                yield cursor, block[0]
+            cursor = max(cursor, block[1])
+
+            if block[1] >= window_end:
+                break  # The block runs into the next window, keep it
+            block = next(busy, None)
+
+        if window_end - cursor >= min_duration:
+            yield cursor, window_end
+
+
+def working_windows(start_day, end_day,
+                    hours_by_weekday: Optional[Dict[int, List[Dict]]] = None) -> Iterator[Interval]:
+    """Working-hour windows of each day in the period, from WORKING_HOURS_BY_WEEKDAY"""
+    if hours_by_weekday is None:
+        hours_by_weekday = config.WORKING_HOURS_BY_WEEKDAY
+
+    current_date = start_day
+    while current_date <= end_day:
+        day_start = datetime.combine(current_date, datetime.min.time())
+        for window in sorted(hours_by_weekday.get(current_date.weekday()) or [], key=lambda h: h['start']):
+            start_hour, start_minute = map(int, window['start'].split(':'))
+            end_hour, end_minute = map(int, window['end'].split(':'))
+            yield (day_start + timedelta(hours=start_hour, minutes=start_minute),
+                   day_start + timedelta(hours=end_hour, minutes=end_minute))
+        current_date += timedelta(days=1)
+
+
+def iter_free_slots(merged_busy: Iterable[Interval], start_day, end_day,
+                    duration_minutes: int) -> Iterator[Dict]:
+    """Free slot dicts in the working hours between start_day and end_day"""
+    windows = working_windows(start_day, end_day)
+    for slot_start, slot_end in free_gaps(merged_busy, windows, timedelta(minutes=duration_minutes)):
+        yield {
+            'start': slot_start,
+            'end': slot_end,
+            'duration_minutes': int((slot_end - slot_start).total_seconds() / 60),
+            'date': slot_start.date()
+        }
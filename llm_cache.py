@@ -0,0 +1,147 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import config
+
+
+def make_cache_key(user_request: str, request_type: str, duration_hours: float,
+                   window_start, search_days: int, *prompt_parts: str) -> str:
+    """Key from the normalized request plus a content hash of the prompt's calendar data"""
+    normalized = {
+        'request': ' '.join(user_request.lower().split()),
+        'type': request_type,
+        'duration': round(float(duration_hours), 2),
+        'window': [str(window_start), search_days]
+    }
+    content = hashlib.sha256('\n'.join(prompt_parts).encode()).hexdigest()
+    return hashlib.sha256((json.dumps(normalized, sort_keys=True) + content).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """LRU + TTL cache for LLM analyses, optionally backed by SQLite on disk"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries or config.LLM_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.LLM_CACHE_TTL
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._calendar_version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM analysis_cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached analysis for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, value FROM analysis_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = (row[0], json.loads(row[1]))
+                    self._store(key, entry)
+
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, value: Dict):
+        """Store an analysis until the TTL runs out or it is evicted"""
+        entry = (time.time() + self.ttl_seconds, copy.deepcopy(value))
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), entry[0])
+                )
+                self._db.commit()
+
+    def check_calendar_version(self, version):
+        """Drop everything once the calendar behind the cached prompts has changed
+
+        Only a newer version clears: requests still holding an older snapshot
+        must not wipe entries made from the newer one.
+        """
+        with self._lock:
+            if self._calendar_version is None or version > self._calendar_version:
+                if self._calendar_version is not None:
+                    self._clear()
+                self._calendar_version = version
+
+    def invalidate(self):
+        """Drop all cached analyses"""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def _store(self, key: str, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _delete(self, key: str):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _clear(self):
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM analysis_cache")
+            self._db.commit()
+        self.invalidations += 1
+
+
+_shared_cache: Optional[AnalysisCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> AnalysisCache:
+    """Process-wide cache used by every ScheduleAIAgent by default"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = AnalysisCache(path=config.LLM_CACHE_PATH)
+        return _shared_cache
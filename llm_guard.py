@@ -0,0 +1,336 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Iterator, Optional
+import numpy as np
+import openai
+import config
+import metrics
+
+# Hedged sync calls run here; each attempt is bounded by its own timeout
+_executor = ThreadPoolExecutor(max_workers=config.OPENAI_MAX_CONNECTIONS * 2, thread_name_prefix='llm-call')
+
+
+class CircuitOpenError(Exception):
+    """The provider is considered down; calls are skipped until the cooldown ends"""
+
+
+class DeadlineExceeded(Exception):
+    """The request's LLM budget ran out before an answer arrived"""
+
+
+class Deadline:
+    """Point in time by which a request's LLM work must be done"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by every call to the provider
+
+    Closed, it lets calls through and counts consecutive failures; at
+    failure_threshold it opens and rejects calls for cooldown seconds. Then
+    one trial call is let through (half-open): success closes the circuit,
+    failure opens it for another cooldown. A trial that never reports back
+    stops blocking after a cooldown of its own, when the next caller gets one.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.failure_threshold = failure_threshold or config.LLM_BREAKER_FAILURES
+        self.cooldown = cooldown if cooldown is not None else config.LLM_BREAKER_COOLDOWN
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if (self.state == 'open' and now - self._opened_at >= self.cooldown
+                    or self.state == 'half_open' and now - self._trial_at >= self.cooldown):
+                self.state = 'half_open'
+                self._trial_at = now
+                return True  # this caller makes the trial call
+            if self.state == 'closed':
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.failure_threshold):
+                self._open()
+
+    def record_abandoned(self):
+        """A call given up before the provider answered; it counts as a failure only as the trial call"""
+        with self._lock:
+            if self.state == 'half_open':
+                self._failures += 1
+                self._open()
+
+    def _open(self):
+        self.state = 'open'
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying and counting against the provider's health"""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def backoff_delay(retry: int) -> float:
+    """Full-jitter exponential backoff before the given retry (0-based)"""
+    return random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * 2 ** retry))
+
+
+class GuardedCompletions:
+    """Chat completions bounded by a request deadline, hedged, retried and behind a circuit breaker
+
+    Every call gets the smaller of LLM_ATTEMPT_TIMEOUT and the time left in
+    the deadline. When a call outlives the model's recent p95 latency a
+    duplicate is sent and the first answer wins. Transient failures are
+    retried with jittered backoff while the budget allows; they also feed
+    the breaker, which rejects calls outright while the provider is
+    degraded so the caller can fall back at once.
+    """
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None, window: int = 200):
+        self.breaker = breaker or get_circuit_breaker()
+        self._window = window
+        self._latencies: Dict[str, Deque[float]] = {}  # seconds of recent successful calls per model
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def create(self, client, params: Dict, deadline: Deadline):
+        """Response of client.chat.completions.create(**params), or raise once the options run out"""
+        for retry in range(config.LLM_MAX_RETRIES + 1):
+            timeout = self._attempt_timeout(deadline)
+            started = time.monotonic()
+            try:
+                response = self._hedged(client, params, timeout, self._hedge_after(params['model'], timeout))
+            except Exception as error:
+                delay = self._after_failure(error, retry, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._succeeded(params['model'], time.monotonic() - started)
+            return response
+
+    async def create_async(self, async_client, params: Dict, deadline: Deadline):
+        """Asyncio version of create"""
+        for retry in range(config.LLM_MAX_RETRIES + 1):
+            timeout = self._attempt_timeout(deadline)
+            started = time.monotonic()
+            try:
+                response = await self._hedged_async(
+                    async_client, params, timeout, self._hedge_after(params['model'], timeout)
+                )
+            except asyncio.CancelledError:
+                self.breaker.record_abandoned()
+                raise
+            except Exception as error:
+                delay = self._after_failure(error, retry, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._succeeded(params['model'], time.monotonic() - started)
+            return response
+
+    def stream(self, client, params: Dict, deadline: Deadline) -> Iterator:
+        """Chunks of a streamed completion, stopped at the deadline
+
+        Not hedged or retried: chunks may already have been shown, so the
+        caller escalates instead.
+        """
+        timeout = self._attempt_timeout(deadline)
+        try:
+            for chunk in client.chat.completions.create(**params, stream=True, timeout=timeout):
+                if not deadline.remaining():
+                    raise DeadlineExceeded('LLM budget spent while streaming')
+                yield chunk
+        except GeneratorExit:
+            self.breaker.record_abandoned()  # the reader left before the answer was complete
+            raise
+        except Exception as error:
+            self._after_failure(error, config.LLM_MAX_RETRIES, deadline)  # breaker bookkeeping only
+            raise
+        self.breaker.record_success()
+
+    def _attempt_timeout(self, deadline: Deadline) -> float:
+        timeout = min(config.LLM_ATTEMPT_TIMEOUT, deadline.remaining())
+        if timeout <= 0:
+            raise DeadlineExceeded('LLM budget spent')
+        # Checked last: in the half-open state allow() hands out the single trial call
+        if not self.breaker.allow():
+            raise CircuitOpenError('OpenAI circuit open')
+        with self._lock:
+            self.calls += 1
+        return timeout
+
+    def _hedge_after(self, model: str, timeout: float) -> Optional[float]:
+        """Seconds to wait before hedging, or None when there is no basis or no time for it"""
+        with self._lock:
+            latencies = self._latencies.get(model)
+            if latencies is None or len(latencies) < config.LLM_HEDGE_MIN_SAMPLES:
+                return None
+            threshold = float(np.percentile(latencies, config.LLM_HEDGE_PERCENTILE))
+        return threshold if threshold < timeout else None
+
+    def _succeeded(self, model: str, seconds: float):
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self._window)).append(seconds)
+
+    def _after_failure(self, error: Exception, retry: int, deadline: Deadline) -> Optional[float]:
+        """Backoff before retrying, or None when the error should be raised"""
+        if isinstance(error, CircuitOpenError):
+            return None
+        if isinstance(error, DeadlineExceeded):
+            # Raised while the call was under way, so the provider never finished answering
+            self.breaker.record_abandoned()
+            return None
+        if not is_transient(error):
+            # The provider answered (e.g. 400 or 401), so it is not degraded
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        with self._lock:
+            self.timeouts += isinstance(error, (openai.APITimeoutError, TimeoutError, asyncio.TimeoutError))
+        delay = backoff_delay(retry)
+        if retry == config.LLM_MAX_RETRIES or delay >= deadline.remaining():
+            return None
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def _hedged(self, client, params: Dict, timeout: float, hedge_after: Optional[float]):
+        if hedge_after is None:
+            return client.chat.completions.create(**params, timeout=timeout)
+
+        started = time.monotonic()
+        first = _executor.submit(client.chat.completions.create, **params, timeout=timeout)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        self._count_hedge()
+        hedge = _executor.submit(client.chat.completions.create, **params, timeout=timeout - hedge_after)
+        pending = {first, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            # The slower call is left to finish on its own; its timeout bounds it
+            done, pending = wait(pending, timeout=max(timeout - (time.monotonic() - started), 0),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError('hedged LLM call timed out')
+            for future in done:
+                if future.exception() is None:
+                    self._count_hedge_win(future is hedge)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _hedged_async(self, async_client, params: Dict, timeout: float, hedge_after: Optional[float]):
+        if hedge_after is None:
+            return await asyncio.wait_for(async_client.chat.completions.create(**params, timeout=timeout), timeout)
+
+        expires = time.monotonic() + timeout
+        tasks = [asyncio.ensure_future(async_client.chat.completions.create(**params, timeout=timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return tasks[0].result()
+
+            self._count_hedge()
+            tasks.append(asyncio.ensure_future(
+                async_client.chat.completions.create(**params, timeout=timeout - hedge_after)
+            ))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(expires - time.monotonic(), 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError('hedged LLM call timed out')
+                for task in done:
+                    if task.exception() is None:
+                        self._count_hedge_win(task is tasks[1])
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Unlike threads, the slower request can be cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _count_hedge(self):
+        with self._lock:
+            self.hedges += 1
+        metrics.annotate(hedged=1)
+
+    def _count_hedge_win(self, hedge_won: bool):
+        if hedge_won:
+            with self._lock:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {
+                'calls': self.calls,
+                'retries': self.retries,
+                'timeouts': self.timeouts,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins
+            }
+        counts['breaker'] = self.breaker.stats()
+        return counts
+
+
+_shared_breaker: Optional[CircuitBreaker] = None
+_shared_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Breaker shared by every agent in the process, since they call the same provider"""
+    global _shared_breaker
+    with _shared_lock:
+        if _shared_breaker is None:
+            _shared_breaker = CircuitBreaker()
+        return _shared_breaker
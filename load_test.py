@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of web_app.py against local OpenAI and Calendar stand-ins.
+
+Starts the stub servers, launches the Flask app pointed at them and fires
+concurrent /api/analyze and /api/current-schedule traffic. Reports throughput
+and p50/p95/p99 latency per endpoint and per pipeline stage (from the
+Server-Timing header).
+
+    python load_test.py --requests 500 --concurrency 16
+    python load_test.py --openai-latency 800:2500 --openai-error-rate 0.02 --events-per-day 12
+    python load_test.py --target http://localhost:5000   # an already running server
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import metrics
+from stub_servers import LatencyModel, StubCalendarServer, StubOpenAIServer
+
+REQUESTS = [
+    'Client meeting 1 hour', 'Hospital appointment 2 hours', 'Gym workout 1.5 hours',
+    'Team lunch', 'Code review session', 'Coffee chat with a friend', 'Weekly planning'
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Rank ceil(fraction * n); rounded first so float noise (0.07 * 100) does not bump it up a rank
+    rank = math.ceil(round(fraction * len(ordered), 9))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def _distribution(values: List[float]) -> Dict:
+    return {
+        'p50_ms': percentile(values, 0.50),
+        'p95_ms': percentile(values, 0.95),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': max(values) if values else 0.0
+    }
+
+
+class LoadDriver:
+    """Closed-loop driver: each worker sends its next request when the previous one returns"""
+
+    def __init__(self, target: str, concurrency: int, analyze_ratio: float,
+                 distinct_requests: int = 0, seed: int = 0):
+        self.target = target.rstrip('/')
+        self.concurrency = concurrency
+        self.analyze_ratio = analyze_ratio
+        self.distinct_requests = distinct_requests
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._issued = 0
+        self.samples: List[Dict] = []
+
+    def run(self, total_requests: int) -> float:
+        """Send total_requests requests and return the elapsed wall time in seconds"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._worker, total_requests)
+        return time.perf_counter() - started
+
+    def _worker(self, total_requests: int):
+        while True:
+            with self._lock:
+                if self._issued >= total_requests:
+                    return
+                self._issued += 1
+                number = self._issued
+                analyze = self._random.random() < self.analyze_ratio
+            sample = self._analyze(number) if analyze else self._current_schedule()
+            with self._lock:
+                self.samples.append(sample)
+
+    def _analyze(self, number: int) -> Dict:
+        text = REQUESTS[number % len(REQUESTS)]
+        # Distinct texts miss the LLM cache, so every request reaches the model
+        variant = number if not self.distinct_requests else number % self.distinct_requests
+        body = json.dumps({'request': f'{text} #{variant}', 'duration': 1.0}).encode()
+        http_request = urllib.request.Request(
+            self.target + '/api/analyze', data=body, headers={'Content-Type': 'application/json'}
+        )
+        return self._send('/api/analyze', http_request)
+
+    def _current_schedule(self) -> Dict:
+        return self._send('/api/current-schedule', urllib.request.Request(self.target + '/api/current-schedule'))
+
+    def _send(self, endpoint: str, http_request) -> Dict:
+        started = time.perf_counter()
+        status, timings, annotations, ok = 0, {}, {}, False
+        try:
+            with urllib.request.urlopen(http_request, timeout=120) as response:
+                status = response.status
+                payload = json.loads(response.read())
+                timings = metrics.parse_server_timing(response.headers.get('Server-Timing'))
+                annotations = metrics.parse_annotations(response.headers.get('X-Request-Stats'))
+                # Handlers report failures as {'error': ...} with a 200 status
+                ok = 'error' not in payload
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            pass
+        return {
+            'endpoint': endpoint,
+            'status': status,
+            'ok': ok,
+            'latency_ms': (time.perf_counter() - started) * 1000,
+            'stages': timings,
+            'prompt_tokens': int(annotations['prompt_tokens']) if 'prompt_tokens' in annotations else None,
+            'tier': annotations.get('tier'),
+            'hedged': 'hedged' in annotations,
+            'llm_skipped': annotations.get('llm_skipped'),
+            'coalesced': 'coalesced' in annotations
+        }
+
+
+def _stage_order(name: str):
+    order = ['calendar', 'slots', 'route', 'prompt', 'llm']
+    return (name == 'total', order.index(name) if name in order else len(order), name)
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    """Throughput and latency percentiles per endpoint and stage"""
+    report = {
+        'requests': len(samples),
+        'elapsed_seconds': elapsed,
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'endpoints': {}
+    }
+    for endpoint in sorted({sample['endpoint'] for sample in samples}):
+        group = [sample for sample in samples if sample['endpoint'] == endpoint]
+        stages = {}
+        for sample in group:
+            for name, duration in sample['stages'].items():
+                stages.setdefault(name, []).append(duration)
+        prompt_tokens = [sample['prompt_tokens'] for sample in group if sample['prompt_tokens'] is not None]
+        tiers = {}
+        for sample in group:
+            if sample['tier']:
+                tiers[sample['tier']] = tiers.get(sample['tier'], 0) + 1
+        report['endpoints'][endpoint] = {
+            'requests': len(group),
+            'errors': sum(1 for sample in group if not sample['ok']),
+            'throughput_rps': len(group) / elapsed if elapsed else 0.0,
+            'latency': _distribution([sample['latency_ms'] for sample in group]),
+            # Pipeline stages in request order, end-to-end server time last
+            'stages': {name: _distribution(stages[name]) for name in sorted(stages, key=_stage_order)},
+            'prompt_tokens': {
+                'p50': percentile(prompt_tokens, 0.50),
+                'p95': percentile(prompt_tokens, 0.95),
+                'max': max(prompt_tokens, default=0)
+            } if prompt_tokens else None,
+            # Which router tier answered: local, cache, a ladder model or fallback
+            'tiers': tiers,
+            'hedged': sum(1 for sample in group if sample['hedged']),
+            # Fallbacks without waiting on the model: open circuit or spent budget
+            'llm_skipped': sum(1 for sample in group if sample['llm_skipped']),
+            # Answered by an identical request already in flight
+            'coalesced': sum(1 for sample in group if sample['coalesced'])
+        }
+    return report
+
+
+def print_report(report: Dict):
+    print(f"\n📈 {report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s)")
+    for endpoint, result in report['endpoints'].items():
+        print(f"\n{endpoint}: {result['requests']} requests, {result['errors']} errors, "
+              f"{result['throughput_rps']:.1f} req/s")
+        rows = [('client', result['latency'])] + list(result['stages'].items())
+        print(f"  {'stage':<10} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+        for name, distribution in rows:
+            print(f"  {name:<10} {distribution['p50_ms']:9.1f} {distribution['p95_ms']:9.1f} "
+                  f"{distribution['p99_ms']:9.1f} {distribution['max_ms']:9.1f}")
+        if result['prompt_tokens']:
+            tokens = result['prompt_tokens']
+            print(f"  prompt tokens: p50 {tokens['p50']:.0f}, p95 {tokens['p95']:.0f}, max {tokens['max']}")
+        if result['tiers']:
+            print("  answered by: " + ", ".join(
+                f"{tier} {count / result['requests']:.0%}" for tier, count in sorted(result['tiers'].items())
+            ))
+        if result['hedged'] or result['llm_skipped']:
+            print(f"  hedged LLM calls: {result['hedged']}, LLM skipped (circuit open / budget spent): "
+                  f"{result['llm_skipped']}")
+        if result['coalesced']:
+            print(f"  coalesced with an identical request in flight: {result['coalesced']} "
+                  f"({result['coalesced'] / result['requests']:.0%})")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_web_app(openai_url: str, calendar_url: str, port: int) -> subprocess.Popen:
+    """Run web_app.py in a child process configured to use the stub servers"""
+    env = dict(os.environ)
+    env.update({
+        'OPENAI_API_KEY': 'stub-key',
+        'OPENAI_BASE_URL': openai_url + '/v1',
+        'CALENDAR_API_ENDPOINT': calendar_url
+    })
+    code = f"import web_app; web_app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+    return subprocess.Popen([sys.executable, '-c', code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(target: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(target + '/', timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {target} did not come up within {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10, help='requests sent before measuring')
+    parser.add_argument('--analyze-ratio', type=float, default=0.5, help='share of /api/analyze requests')
+    parser.add_argument('--distinct-requests', type=int, default=0,
+                        help='number of distinct analyze texts (0 = every request distinct)')
+    parser.add_argument('--openai-latency', default='600:2000', help='median[:p99[:distribution]] in ms')
+    parser.add_argument('--openai-error-rate', type=float, default=0.0)
+    parser.add_argument('--recommendations', type=int, default=3, help='recommendations per stub answer')
+    parser.add_argument('--completion-padding', type=int, default=0, help='extra characters per stub answer')
+    parser.add_argument('--calendar-latency', default='40:200', help='median[:p99[:distribution]] in ms')
+    parser.add_argument('--calendar-error-rate', type=float, default=0.0)
+    parser.add_argument('--events-per-day', type=float, default=6.0)
+    parser.add_argument('--description-chars', type=int, default=0, help='description size per stub event')
+    parser.add_argument('--attendees', type=int, default=0, help='attendees per stub event (unused by the client)')
+    parser.add_argument('--target', help='load an already running server instead of starting one')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    print("🚀 AI Schedule Assistant load test")
+    stubs: List = []
+    web_process: Optional[subprocess.Popen] = None
+    target = args.target
+
+    try:
+        if not target:
+            openai_stub = StubOpenAIServer(
+                LatencyModel.parse(args.openai_latency, args.openai_error_rate, args.seed),
+                args.recommendations, args.completion_padding
+            ).start()
+            calendar_stub = StubCalendarServer(
+                LatencyModel.parse(args.calendar_latency, args.calendar_error_rate, args.seed),
+                args.events_per_day, args.description_chars, seed=args.seed, attendees=args.attendees
+            ).start()
+            stubs = [('openai', openai_stub), ('calendar', calendar_stub)]
+            print(f"🧪 Stub OpenAI at {openai_stub.url}, stub Calendar at {calendar_stub.url} "
+                  f"({len(calendar_stub.items)} events)")
+
+            port = _free_port()
+            target = f'http://127.0.0.1:{port}'
+            web_process = start_web_app(openai_stub.url, calendar_stub.url, port)
+
+        wait_until_ready(target)
+        if args.warmup:
+            LoadDriver(target, args.concurrency, args.analyze_ratio, seed=args.seed + 1).run(args.warmup)
+
+        driver = LoadDriver(target, args.concurrency, args.analyze_ratio, args.distinct_requests, args.seed)
+        elapsed = driver.run(args.requests)
+        report = summarize(driver.samples, elapsed)
+        report['stubs'] = {name: stub.stats() for name, stub in stubs}
+        print_report(report)
+        for name, stats in report['stubs'].items():
+            print(f"\n🧪 {name} stub: {stats['requests']} calls, {stats['errors']} injected errors, "
+                  f"{stats['bytes_sent'] / 1024:.0f} KiB sent")
+
+        if args.output:
+            report.update({'timestamp': datetime.now().isoformat(), 'config': vars(args)})
+            with open(args.output, 'w') as output:
+                json.dump(report, output, indent=2)
+            print(f"✅ Report written to {args.output}")
+    finally:
+        if web_process:
+            web_process.terminate()
+            web_process.wait()
+        for _, stub in stubs:
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+# Stage durations (ms) of the request being handled; None outside a timed request
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('stage_timings', default=None)
+# Other per-request figures, such as the prompt size
+_annotations: ContextVar[Optional[Dict[str, Any]]] = ContextVar('annotations', default=None)
+
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting stage timings and annotations for the current request"""
+    timings: Dict[str, float] = {}
+    _stage_timings.set(timings)
+    _annotations.set({})
+    return timings
+
+
+def current_timings() -> Optional[Dict[str, float]]:
+    return _stage_timings.get()
+
+
+def current_annotations() -> Optional[Dict[str, Any]]:
+    return _annotations.get()
+
+
+def annotate(**values):
+    """Attach figures to the current request (ignored outside one)"""
+    annotations = _annotations.get()
+    if annotations is not None:
+        annotations.update(values)
+
+
+def accumulate(**values):
+    """Add figures to the current request's running totals (ignored outside one)"""
+    annotations = _annotations.get()
+    if annotations is not None:
+        for key, value in values.items():
+            total = annotations.get(key, 0) + value
+            annotations[key] = round(total, 3) if isinstance(total, float) else total
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's stage total"""
+    timings = _stage_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format timings as a Server-Timing header value"""
+    return ', '.join(f'{name};dur={duration:.1f}' for name, duration in timings.items())
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Stage durations (ms) from a Server-Timing header value"""
+    timings = {}
+    for metric in filter(None, (part.strip() for part in (header or '').split(','))):
+        name, *params = (param.strip() for param in metric.split(';'))
+        for param in params:
+            if param.startswith('dur='):
+                timings[name] = float(param[4:])
+    return timings
+
+
+def format_annotations(values: Dict[str, Any]) -> str:
+    """key=value pairs for a response header"""
+    return ', '.join(f'{key}={value}' for key, value in values.items())
+
+
+def parse_annotations(header: str) -> Dict[str, str]:
+    """Inverse of format_annotations"""
+    values = {}
+    for pair in filter(None, (part.strip() for part in (header or '').split(','))):
+        key, _, value = pair.partition('=')
+        values[key] = value
+    return values
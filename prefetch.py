@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import config
+from calendar_manager import CalendarManager
+from snapshot import CalendarSnapshot
+
+
+class SnapshotPrefetcher:
+    """Background thread keeping a calendar snapshot of the next horizon warm
+
+    Every interval (with random jitter, so several workers do not refresh in
+    step) the thread fetches a snapshot from the start of today through the
+    horizon and computes its free slots for the durations the UI offers.
+    Requests are served from that snapshot, cut to their own period when it
+    is shorter; only when it is older than max_staleness, predates a
+    calendar change, is missing, or does not reach far enough, does the
+    caller fetch synchronously.
+    """
+
+    def __init__(self, calendar_manager: CalendarManager, horizon_days: Optional[int] = None,
+                 interval: Optional[float] = None, jitter: Optional[float] = None,
+                 max_staleness: Optional[float] = None, durations: Optional[List[int]] = None):
+        self.calendar_manager = calendar_manager
+        self.horizon_days = horizon_days or config.PREFETCH_HORIZON_DAYS
+        self.interval = interval if interval is not None else config.PREFETCH_INTERVAL
+        self.jitter = jitter if jitter is not None else config.PREFETCH_JITTER  # fraction of the interval
+        self.max_staleness = max_staleness if max_staleness is not None else config.PREFETCH_MAX_STALENESS
+        self.durations = durations if durations is not None else config.PREFETCH_DURATIONS
+
+        self._snapshot: Optional[CalendarSnapshot] = None
+        self._fetched_at: Optional[float] = None  # monotonic time of the warm snapshot
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # one fetch at a time, waiters reuse its result
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.refreshes = 0
+        self.failures = 0
+        self.warm_hits = 0
+        self.sync_fetches = 0
+        self.last_refresh_ms = 0.0
+        self.refresh_lags = deque(maxlen=100)  # seconds recent refreshes started behind schedule
+
+    def start(self) -> 'SnapshotPrefetcher':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-prefetch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        scheduled = time.monotonic()
+        while not self._stop.is_set():
+            self._record_lag(time.monotonic() - scheduled)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Calendar prefetch failed: {e}")
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            scheduled = time.monotonic() + delay
+            self._stop.wait(delay)
+
+    def _record_lag(self, lag: float):
+        with self._lock:
+            self.refresh_lags.append(max(lag, 0.0))
+
+    def refresh(self) -> CalendarSnapshot:
+        """Fetch the horizon and warm its free slots now"""
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> CalendarSnapshot:
+        # Callers hold _refresh_lock
+        started = time.monotonic()
+        try:
+            today = datetime.combine(datetime.now().date(), datetime.min.time())
+            snapshot = self.calendar_manager.get_snapshot(today, today + timedelta(days=self.horizon_days))
+            for duration in self.durations:
+                snapshot.free_slots(duration)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        finished = time.monotonic()
+        with self._lock:
+            self._snapshot = snapshot
+            self._fetched_at = finished
+            self.refreshes += 1
+            self.last_refresh_ms = (finished - started) * 1000
+        return snapshot
+
+    def get(self, search_days: Optional[int] = None) -> CalendarSnapshot:
+        """Warm snapshot of the next search_days when it is fresh enough, otherwise a synchronous fetch"""
+        if search_days is not None and search_days > self.horizon_days:
+            # Past the warm horizon
+            with self._lock:
+                self.sync_fetches += 1
+            start_date = datetime.now()
+            return self.calendar_manager.get_snapshot(start_date, start_date + timedelta(days=search_days))
+
+        snapshot = self._warm()
+        if search_days in (None, self.horizon_days):
+            return snapshot
+        return snapshot.window(snapshot.start_date, snapshot.start_date + timedelta(days=search_days))
+
+    def _warm(self) -> CalendarSnapshot:
+        snapshot = self._fresh()
+        if snapshot is not None:
+            return snapshot
+
+        # A refresh already under way (startup, the worker or another caller) may finish first
+        with self._refresh_lock:
+            snapshot = self._fresh()
+            if snapshot is not None:
+                return snapshot
+            with self._lock:
+                self.sync_fetches += 1
+            # Fetched under the lock, so callers queued behind it reuse this snapshot
+            return self._refresh()
+
+    def _fresh(self) -> Optional[CalendarSnapshot]:
+        with self._lock:
+            if self._snapshot is None or self._snapshot.start_date.date() != datetime.now().date() or \
+                    time.monotonic() - self._fetched_at > self.max_staleness:
+                return None
+            if self._snapshot.version != self.calendar_manager.calendar_version:
+                # A sync (e.g. after a push notification) changed events since the fetch
+                return None
+            self.warm_hits += 1
+            return self._snapshot
+
+    def stats(self) -> Dict:
+        """Refresh counters, current staleness and how far refreshes run behind schedule"""
+        with self._lock:
+            lags = np.array(self.refresh_lags) * 1000
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'horizon_days': self.horizon_days,
+                'interval_seconds': self.interval,
+                'max_staleness_seconds': self.max_staleness,
+                'staleness_seconds': time.monotonic() - self._fetched_at if self._fetched_at is not None else None,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'warm_hits': self.warm_hits,
+                'sync_fetches': self.sync_fetches,
+                'last_refresh_ms': self.last_refresh_ms,
+                'refresh_lag_p50_ms': float(np.percentile(lags, 50)) if lags.size else 0.0,
+                'refresh_lag_max_ms': float(lags.max()) if lags.size else 0.0
+            }
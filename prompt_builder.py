@@ -0,0 +1,215 @@
+import math
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import config
+from columnar import FLAG_ALL_DAY, SECONDS_PER_DAY, EventTable, SlotTable, from_epoch
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact counts when installed, estimates otherwise
+    tiktoken = None
+
+WEEKDAY_NAMES = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text for the chat model (about 4 UTF-8 bytes per token without tiktoken)"""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.encoding_for_model('gpt-3.5-turbo')
+        return len(_encoding.encode(text))
+    return math.ceil(len(text.encode('utf-8')) / 4)
+
+
+def _weekday_label(weekdays: Iterable[int]) -> str:
+    weekdays = sorted(set(weekdays))
+    if weekdays == list(range(7)):
+        return 'Daily'
+    if weekdays == list(range(5)):
+        return 'Weekdays'
+    return '/'.join(WEEKDAY_NAMES[weekday] for weekday in weekdays)
+
+
+class PromptBuilder:
+    """Packs the schedule context of an LLM prompt into a token budget
+
+    Events repeating at the same time with the same title collapse into one
+    line, free slots with the same hours on consecutive working days become
+    one range, and slot ranges are chosen by their deterministic pre-score.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, slot_share: float = 0.6,
+                 working_hours_by_weekday: Optional[Dict[int, List[Dict]]] = None):
+        self.token_budget = token_budget if token_budget is not None else config.PROMPT_TOKEN_BUDGET
+        self.slot_share = slot_share  # of the budget reserved for slots before events are packed
+        self.working_hours_by_weekday = (working_hours_by_weekday if working_hours_by_weekday is not None
+                                         else config.WORKING_HOURS_BY_WEEKDAY)
+
+    def pack(self, events: EventTable, slots: SlotTable,
+             scores: Optional[np.ndarray] = None) -> Tuple[str, str, Dict]:
+        """Events summary, slots summary and packing stats within the token budget"""
+        slot_runs = self.slot_lines(slots, scores)
+        event_groups = self.event_groups(events)
+        group_count = len(event_groups[0])
+
+        # Room for the "(+N more ... not shown)" trailers, which are appended after packing
+        budget = max(self.token_budget - sum(
+            count_tokens(f"(+{total} more {noun} not shown)") + 1
+            for total, noun in ((group_count, 'events'), (len(slot_runs), 'slot ranges')) if total
+        ), 0)
+
+        # Best slots first, events fill what they leave, then slots take any remainder
+        slot_order = sorted(range(len(slot_runs)), key=lambda index: (-slot_runs[index][1], slot_runs[index][0]))
+        chosen_slots, slot_tokens = self._fill(slot_runs, slot_order, int(budget * self.slot_share))
+
+        # Events are packed soonest first, stopping at the first line that no longer fits
+        event_lines, event_tokens = [], 0
+        for line in self.iter_event_lines(events, event_groups):
+            tokens = count_tokens(line) + 1  # newline
+            if slot_tokens + event_tokens + tokens > budget:
+                break
+            event_lines.append(line)
+            event_tokens += tokens
+
+        more_slots, more_tokens = self._fill(
+            slot_runs, [index for index in slot_order if index not in chosen_slots],
+            budget - slot_tokens - event_tokens
+        )
+        chosen_slots |= more_slots
+
+        shown_events = len(event_lines)
+        if not group_count:
+            events_summary = "No scheduled events currently."
+        else:
+            if shown_events < group_count:
+                event_lines.append(f"(+{group_count - shown_events} more events not shown)")
+            events_summary = "\n".join(event_lines)
+        slots_summary = self._render(slot_runs, chosen_slots, "No available time slots.", 'slot ranges')
+        stats = {
+            'token_budget': self.token_budget,
+            'context_tokens': slot_tokens + event_tokens + more_tokens,
+            'events': len(events),
+            'event_lines': shown_events,
+            'event_lines_total': group_count,
+            'slots': len(slots),
+            'slot_lines': len(chosen_slots),
+            'slot_lines_total': len(slot_runs)
+        }
+        return events_summary, slots_summary, stats
+
+    def event_groups(self, events: EventTable) -> Tuple[np.ndarray, ...]:
+        """First row, last row, count and weekday bitmask of every group, in order of first occurrence
+
+        Events group when title, all-day flag, start time of day and duration
+        all match, so a recurring event becomes a single group.
+        """
+        if not len(events):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+
+        # One int64 key per row: title code | all-day bit | start second of day (17 bits) | minutes (22 bits)
+        all_day = (events.flags & FLAG_ALL_DAY).astype(np.int64)
+        minutes = np.minimum((events.ends - events.starts) // 60, (1 << 22) - 1)
+        keys = (((events.titles.astype(np.int64) << 1 | all_day) << 17
+                 | events.starts % SECONDS_PER_DAY) << 22) | minutes
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+
+        rows = np.arange(len(events))
+        last = np.zeros(first.size, dtype=np.int64)
+        np.maximum.at(last, inverse, rows)
+        weekdays = np.zeros(first.size, dtype=np.int64)
+        np.bitwise_or.at(weekdays, inverse, 1 << ((events.starts // SECONDS_PER_DAY + 3) % 7))
+
+        order = np.argsort(first, kind='stable')
+        return first[order], last[order], counts[order], weekdays[order]
+
+    def iter_event_lines(self, events: EventTable, groups: Tuple[np.ndarray, ...]) -> Iterator[str]:
+        """One line per event group, formatted only as far as the caller reads"""
+        for first, last, count, weekday_mask in zip(*(column.tolist() for column in groups)):
+            event = events[first]
+            start = event['start']
+            duration = int((event['end'] - start).total_seconds() / 60)
+            all_day = event['all_day']
+            length = f"all day, {duration // 1440} days" if all_day and duration > 1440 else (
+                "all day" if all_day else f"{duration} min")
+            if count == 1:
+                when = start.strftime('%m/%d') if all_day else start.strftime('%m/%d %H:%M')
+                yield f"- {when}: {event['title']} ({length})"
+            else:
+                days = _weekday_label(weekday for weekday in range(7) if weekday_mask >> weekday & 1)
+                when = days if all_day else f"{days} {start.strftime('%H:%M')}"
+                yield (f"- {when}: {event['title']} ({length}), {count}x "
+                       f"{start.strftime('%m/%d')}-{events[last]['start'].strftime('%m/%d')}")
+
+    def slot_lines(self, slots: SlotTable,
+                   scores: Optional[np.ndarray] = None) -> List[Tuple[datetime, float, str]]:
+        """(first start, best score, line) per range of same-hour slots on consecutive working days"""
+        next_working = self._next_working_offsets()
+        days = (slots.starts // SECONDS_PER_DAY).tolist()
+        start_seconds = (slots.starts % SECONDS_PER_DAY).tolist()
+        end_seconds = (slots.ends - slots.starts // SECONDS_PER_DAY * SECONDS_PER_DAY).tolist()
+        weekdays = slots.weekdays.tolist()
+        slot_scores = scores.tolist() if scores is not None else [0.0] * len(days)
+
+        # A run is [first row, last day, best score, day count]; open runs are keyed by hours
+        runs: List[List] = []
+        open_runs: Dict[Tuple[int, int], List] = {}
+        for index, (day, start, end, weekday) in enumerate(zip(days, start_seconds, end_seconds, weekdays)):
+            run = open_runs.get((start, end))
+            if run is not None and run[1] + next_working[(weekday - (day - run[1])) % 7] == day:
+                run[1] = day
+                run[2] = max(run[2], slot_scores[index])
+                run[3] += 1
+            else:
+                run = [index, day, slot_scores[index], 1]
+                open_runs[(start, end)] = run
+                runs.append(run)
+
+        lines = []
+        for first_row, last_day, score, count in runs:
+            slot = slots[first_row]
+            first, end = slot['start'], slot['end']
+            hours = f"{first.strftime('%H:%M')}-{end.strftime('%H:%M')}"
+            when = f"{first.strftime('%m/%d')} ({WEEKDAY_NAMES[first.weekday()]})"
+            if count == 1:
+                suffix = "available"
+            else:
+                last = from_epoch(last_day * SECONDS_PER_DAY)
+                when += f"-{last.strftime('%m/%d')} ({WEEKDAY_NAMES[last.weekday()]})"
+                suffix = f"available on each of {count} working days"
+            lines.append((first, float(score), f"- {when} {hours}: {slot['duration_minutes']} min {suffix}"))
+        return lines
+
+    def _next_working_offsets(self) -> List[int]:
+        """Days from each weekday to the next weekday with working hours (0 when there is none)"""
+        offsets = []
+        for weekday in range(7):
+            offsets.append(next(
+                (offset for offset in range(1, 8) if self.working_hours_by_weekday.get((weekday + offset) % 7)), 0
+            ))
+        return offsets
+
+    def _fill(self, lines: List[Tuple[datetime, float, str]], order: Iterable[int],
+              budget: int) -> Tuple[set, int]:
+        """Indices taken in the given order while their lines fit the budget, and tokens used"""
+        chosen, used = set(), 0
+        for index in order:
+            tokens = count_tokens(lines[index][2]) + 1  # newline
+            if used + tokens > budget:
+                continue  # A shorter line further down may still fit
+            chosen.add(index)
+            used += tokens
+        return chosen, used
+
+    def _render(self, lines: List[Tuple[datetime, float, str]], chosen: set, empty: str, noun: str) -> str:
+        if not lines:
+            return empty
+        # Chosen lines keep their chronological order for the model
+        rendered = [lines[index][2] for index in sorted(chosen)]
+        if len(chosen) < len(lines):
+            rendered.append(f"(+{len(lines) - len(chosen)} more {noun} not shown)")
+        return "\n".join(rendered)
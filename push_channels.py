@@ -0,0 +1,198 @@
+import secrets
+import threading
+import time
+import uuid
+from typing import Dict, Mapping, Optional, Set
+from googleapiclient.errors import HttpError
+import config
+from calendar_manager import CalendarManager
+
+
+class WatchChannel:
+    """An open events().watch notification channel"""
+
+    def __init__(self, channel_id: str, resource_id: str, calendar_id: str, expiration: float):
+        self.channel_id = channel_id
+        self.resource_id = resource_id
+        self.calendar_id = calendar_id
+        self.expiration = expiration  # epoch seconds
+
+
+class PushChannelManager:
+    """Keeps a push notification channel open per synced calendar and syncs on every ping
+
+    Each calendar's channel is replaced renew_before seconds ahead of its
+    expiry, and the old one stopped once the new one is open, so no change
+    falls into a gap. A notification only marks its calendar pending; a
+    worker thread then runs one incremental sync for everything that
+    arrived meanwhile, and the event store invalidates the free slots of
+    just the days that changed. While a channel is open the store polls at
+    fallback_sync_interval instead of CALENDAR_SYNC_INTERVAL.
+    """
+
+    def __init__(self, calendar_manager: CalendarManager, address: Optional[str] = None,
+                 token: Optional[str] = None, ttl: Optional[int] = None, renew_before: Optional[float] = None,
+                 fallback_sync_interval: Optional[float] = None):
+        self.calendar_manager = calendar_manager
+        self.address = address or config.PUSH_WEBHOOK_URL
+        self.token = token or config.PUSH_CHANNEL_TOKEN or secrets.token_urlsafe(24)
+        self.ttl = ttl or config.PUSH_CHANNEL_TTL
+        self.renew_before = renew_before if renew_before is not None else config.PUSH_RENEW_BEFORE
+        self.fallback_sync_interval = fallback_sync_interval or config.PUSH_FALLBACK_SYNC_INTERVAL
+        store = calendar_manager.event_store
+        self.stores = {store.calendar_id: store}
+
+        self._channels: Dict[str, WatchChannel] = {}  # by calendar id
+        self._pending: Set[str] = set()  # calendars notified since their last sync
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.notifications = 0
+        self.rejected = 0
+        self.syncs = 0
+        self.changed_events = 0
+        self.renewals = 0
+        self.failures = 0
+
+    def start(self) -> 'PushChannelManager':
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='push-channels', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the worker and close every channel"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            channels = list(self._channels.values())
+            self._channels.clear()
+        for channel in channels:
+            self._close(channel)
+            self.stores[channel.calendar_id].sync_interval = config.CALENDAR_SYNC_INTERVAL
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._renew_due()
+            except Exception as e:
+                print(f"Push channel renewal failed: {e}")
+            self._sync_pending()
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+
+    def _next_wait(self) -> float:
+        with self._lock:
+            if len(self._channels) < len(self.stores):
+                return 60.0  # retry opening a channel that failed
+            renew_at = min(channel.expiration for channel in self._channels.values()) - self.renew_before
+        return min(max(renew_at - time.time(), 1.0), 3600.0)
+
+    def _renew_due(self):
+        for calendar_id, store in self.stores.items():
+            with self._lock:
+                current = self._channels.get(calendar_id)
+            if current is not None and current.expiration - time.time() > self.renew_before:
+                continue
+
+            try:
+                channel = self._open(calendar_id)
+            except HttpError:
+                with self._lock:
+                    self.failures += 1
+                    if current is not None and current.expiration <= time.time():
+                        # Expired without a replacement: poll as usual until one opens
+                        del self._channels[calendar_id]
+                        store.sync_interval = config.CALENDAR_SYNC_INTERVAL
+                raise
+
+            with self._lock:
+                self._channels[calendar_id] = channel
+                self.renewals += current is not None
+            store.sync_interval = self.fallback_sync_interval
+            if current is not None:
+                self._close(current)
+            else:
+                # Changes made before the channel opened were never notified
+                self._mark_pending(calendar_id)
+
+    def _open(self, calendar_id: str) -> WatchChannel:
+        response = self.calendar_manager.service.events().watch(calendarId=calendar_id, body={
+            'id': str(uuid.uuid4()),
+            'type': 'web_hook',
+            'address': self.address,
+            'token': self.token,
+            'params': {'ttl': str(self.ttl)}
+        }).execute()
+        # Google may shorten the requested lifetime; expiration is in epoch milliseconds
+        expiration = int(response.get('expiration') or (time.time() + self.ttl) * 1000) / 1000
+        return WatchChannel(response['id'], response['resourceId'], calendar_id, expiration)
+
+    def _close(self, channel: WatchChannel):
+        try:
+            self.calendar_manager.service.channels().stop(body={
+                'id': channel.channel_id, 'resourceId': channel.resource_id
+            }).execute()
+        except HttpError as error:
+            # The channel expires on its own anyway
+            print(f"Error stopping push channel: {error}")
+
+    def handle(self, headers: Mapping[str, str]) -> bool:
+        """Accept a notification by its X-Goog-* headers; False when it is not from one of our channels"""
+        headers = {key.lower(): value for key, value in headers.items()}
+        channel_id = headers.get('x-goog-channel-id')
+        with self._lock:
+            channel = next((c for c in self._channels.values() if c.channel_id == channel_id), None)
+            if channel is None or headers.get('x-goog-channel-token') != self.token or \
+                    headers.get('x-goog-resource-id') != channel.resource_id:
+                self.rejected += 1
+                return False
+            self.notifications += 1
+
+        # 'sync' only confirms a new channel; 'exists' and 'not_exists' report a change
+        if headers.get('x-goog-resource-state') != 'sync':
+            self._mark_pending(channel.calendar_id)
+        return True
+
+    def _mark_pending(self, calendar_id: str):
+        with self._lock:
+            self._pending.add(calendar_id)
+        self._wake.set()
+
+    def _sync_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        for calendar_id in pending:
+            try:
+                # Incremental: only the events changed since the stored sync token
+                changed = self.stores[calendar_id].sync(self.calendar_manager.service)
+            except HttpError as error:
+                print(f"Error syncing after push notification: {error}")
+                with self._lock:
+                    self.failures += 1
+                continue
+            with self._lock:
+                self.syncs += 1
+                self.changed_events += changed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'channels': [
+                    {'calendar_id': channel.calendar_id, 'expires_in_seconds': channel.expiration - time.time()}
+                    for channel in self._channels.values()
+                ],
+                'notifications': self.notifications,
+                'rejected': self.rejected,
+                'syncs': self.syncs,
+                'changed_events': self.changed_events,
+                'renewals': self.renewals,
+                'failures': self.failures
+            }
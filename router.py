@@ -0,0 +1,99 @@
+import re
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+import numpy as np
+import config
+
+# Wording that narrows the time beyond what the local scorer understands
+CONSTRAINT_PATTERN = re.compile(
+    r"\b(?:before|after|between|except|not|only|unless|must|avoid|without|until|by|"
+    r"morning|afternoon|evening|night|weekend|today|tomorrow|next|this|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+    r"|\b\d{1,2}(?::\d{2})?\s*(?:am|pm)\b|\b\d{1,2}:\d{2}\b"
+    r"|전에|이후|후에|사이|제외|말고|빼고|까지|오전|오후|아침|밤|주말|오늘|내일|모레|다음\s*주|이번\s*주"
+    r"|[월화수목금토일]요일|\d{1,2}시(?!간)",
+    re.IGNORECASE
+)
+
+
+class RouteDecision:
+    """Where a request is answered: 'local' or 'llm' starting at a model ladder rung"""
+
+    def __init__(self, tier: str, reason: str, rung: int = 0):
+        self.tier = tier
+        self.reason = reason
+        self.rung = rung
+
+
+class TierStats:
+    """Answer count, attempts, failures and recent latencies of one tier"""
+
+    def __init__(self, window: int = 1000):
+        self.answered = 0
+        self.attempts = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=window)  # seconds
+
+    def summary(self, total: int) -> Dict:
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'answered': self.answered,
+            'hit_rate': self.answered / total if total else 0.0,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'p50_ms': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if latencies.size else 0.0
+        }
+
+
+class RequestRouter:
+    """Decides whether the local scorer can answer a request or the LLM ladder must
+
+    A request stays local when its type is classified with high confidence,
+    it carries no time constraints the scorer cannot honour, and enough
+    free slots fall in the hours its type prefers. Everything else goes to the LLM, starting
+    one rung higher on the model ladder when it is constraint-heavy.
+    """
+
+    def __init__(self, model_ladder: Optional[List[str]] = None):
+        self.model_ladder = list(model_ladder or config.LLM_MODEL_LADDER)
+        self.tiers: Dict[str, TierStats] = {}
+        self._lock = threading.Lock()
+
+    def decide(self, user_request: str, confidence: float, slot_fits: np.ndarray) -> RouteDecision:
+        """slot_fits marks the free slots that suit the request type (ScoringRules.fits)"""
+        constraints = len(CONSTRAINT_PATTERN.findall(user_request))
+        if constraints >= config.ROUTER_HEAVY_CONSTRAINTS:
+            return RouteDecision('llm', f'{constraints} time constraints', rung=min(1, len(self.model_ladder) - 1))
+        if constraints:
+            return RouteDecision('llm', 'time constraint')
+        if confidence < config.ROUTER_MIN_CONFIDENCE:
+            return RouteDecision('llm', f'classification confidence {confidence:.2f}')
+
+        good_slots = int(np.count_nonzero(slot_fits))
+        if good_slots < config.ROUTER_MIN_SLOTS:
+            return RouteDecision('llm', f'{good_slots} slots in the preferred hours')
+        return RouteDecision('local', 'clear request and availability')
+
+    def record(self, tier: str, seconds: Optional[float] = None, answered: bool = True):
+        """Count an attempt at a tier; answered=False marks a failed attempt that escalates"""
+        with self._lock:
+            stats = self.tiers.setdefault(tier, TierStats())
+            stats.attempts += 1
+            if answered:
+                stats.answered += 1
+            else:
+                stats.failures += 1
+            if seconds is not None:
+                stats.latencies.append(seconds)
+
+    def stats(self) -> Dict:
+        """Per-tier hit rates and latencies"""
+        with self._lock:
+            total = sum(stats.answered for stats in self.tiers.values())
+            return {
+                'requests': total,
+                'model_ladder': self.model_ladder,
+                'tiers': {tier: stats.summary(total) for tier, stats in self.tiers.items()}
+            }
@@ -0,0 +1,180 @@
+import heapq
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import config
+from columnar import SECONDS_PER_DAY, SlotTable
+
+
+class ScoringRules:
+    """Time slot scoring rules compiled into lookup tables
+
+    The rules file gives a base score plus bonuses by hour range per request
+    type, by weekday and by slot length. Every request type is compiled once
+    into [weekday, hour, duration bucket] tables of scores and reason codes,
+    so scoring any number of slots is a single gather.
+    """
+
+    def __init__(self, rules: Dict):
+        self.base_score = rules['base_score']
+        self.max_score = rules['max_score']
+        self.weekday_rules = rules.get('weekdays', [])
+        self.duration_rules = sorted(rules.get('durations', []), key=lambda rule: rule['min_minutes'])
+        self.type_rules = rules['request_types']
+
+        # Reason code 0 is the default; others index the joined reason texts of a cell
+        self.reasons: List[str] = [rules.get('default_reason', '')]
+        self._reason_codes: Dict[Tuple[str, ...], int] = {(): 0}
+        self._reason_texts = rules.get('reasons', {})
+        self._bucket_edges = np.array([rule['min_minutes'] for rule in self.duration_rules], dtype=np.int64)
+        self._tables = {request_type: self._compile(request_type) for request_type in self.type_rules}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'ScoringRules':
+        with open(path or config.SCORING_RULES_FILE, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _compile(self, request_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        shape = (7, 24, len(self.duration_rules) + 1)
+        scores = np.empty(shape, dtype=np.int64)
+        codes = np.empty(shape, dtype=np.int32)
+        hour_rules = self.type_rules[request_type].get('hours', [])
+
+        for weekday in range(7):
+            weekday_rule = next((rule for rule in self.weekday_rules if weekday in rule['days']), None)
+            for hour in range(24):
+                # Only the first matching hour range counts
+                hour_rule = next((rule for rule in hour_rules if rule['from'] <= hour <= rule['to']), None)
+                for bucket in range(shape[2]):
+                    # Bucket b holds slots reaching the first b duration thresholds; the highest one counts
+                    duration_rule = self.duration_rules[bucket - 1] if bucket else None
+                    matched = [rule for rule in (hour_rule, weekday_rule, duration_rule) if rule]
+                    scores[weekday, hour, bucket] = min(
+                        self.base_score + sum(rule['bonus'] for rule in matched), self.max_score
+                    )
+                    codes[weekday, hour, bucket] = self._reason_code(
+                        tuple(rule['reason'] for rule in matched if rule.get('reason'))
+                    )
+        return scores, codes
+
+    def _reason_code(self, keys: Tuple[str, ...]) -> int:
+        code = self._reason_codes.get(keys)
+        if code is None:
+            code = self._reason_codes[keys] = len(self.reasons)
+            self.reasons.append("; ".join(self._reason_texts[key] for key in keys))
+        return code
+
+    def tables(self, request_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Score and reason code tables of a request type (general rules for unknown types)"""
+        return self._tables.get(request_type) or self._tables['general']
+
+    def buckets(self, duration_minutes: np.ndarray) -> np.ndarray:
+        """Duration bucket of every slot length"""
+        return np.searchsorted(self._bucket_edges, duration_minutes, side='right')
+
+    def score(self, slots: SlotTable, request_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores and reason codes of all slots at once"""
+        scores, codes = self.tables(request_type)
+        index = (slots.weekdays, slots.hours, self.buckets(slots.duration_minutes))
+        return scores[index], codes[index]
+
+    def fits(self, slots: SlotTable, request_type: str, duration_minutes: int) -> np.ndarray:
+        """Whether each window can hold a start time inside one of the request type's preferred hour ranges
+
+        Types without hour preferences fit any window long enough. The base,
+        weekday and length bonuses are left out on purpose: every weekday
+        window earns them, whatever it is for.
+        """
+        needed = duration_minutes * 60
+        long_enough = slots.ends - slots.starts >= needed
+        hour_rules = (self.type_rules.get(request_type) or self.type_rules['general']).get('hours', [])
+        if not hour_rules:
+            return long_enough
+
+        # Start hours range from the window start to the last start that still fits, on the same day
+        first_hours = slots.hours
+        latest_starts = slots.ends - needed
+        latest_hours = np.where(latest_starts // SECONDS_PER_DAY == slots.starts // SECONDS_PER_DAY,
+                                (latest_starts % SECONDS_PER_DAY) // 3600, 23)
+        fits = np.zeros(len(slots), dtype=bool)
+        for rule in hour_rules:
+            fits |= (first_hours <= rule['to']) & (latest_hours >= rule['from'])
+        return fits & long_enough
+
+    def top_candidates(self, slots: SlotTable, request_type: str, duration_minutes: int, k: int = 5,
+                       granularity_minutes: Optional[int] = None,
+                       chunk_size: int = 1024) -> Tuple[SlotTable, np.ndarray, np.ndarray]:
+        """The k best start times inside the free windows, with their scores and reason codes
+
+        Each window offers its own start and every granularity step after it
+        that still leaves duration_minutes; a candidate runs from its start to
+        the window end. Windows are scored chunk by chunk and only the best
+        candidate of each window competes for a bounded heap, so memory stays
+        flat however long the search and recommendations spread over windows.
+        Ties go to the earlier start.
+        """
+        granularity = (granularity_minutes or config.CANDIDATE_GRANULARITY_MINUTES) * 60
+        needed = duration_minutes * 60
+        score_table, code_table = self.tables(request_type)
+        heap: List[Tuple[int, int, int, int]] = []  # (score, -start, end, reason code), worst on top
+
+        for offset in range(0, len(slots), chunk_size):
+            window_starts = slots.starts[offset:offset + chunk_size]
+            window_ends = slots.ends[offset:offset + chunk_size]
+            keep = window_ends - window_starts >= needed
+            window_starts, window_ends = window_starts[keep], window_ends[keep]
+            if not window_starts.size:
+                continue
+
+            # Window start, then the grid points after it up to the last start that still fits
+            first_step = (window_starts // granularity + 1) * granularity
+            counts = 1 + np.maximum((window_ends - needed - first_step) // granularity + 1, 0)
+            firsts = np.cumsum(counts) - counts
+            windows = np.repeat(np.arange(counts.size), counts)
+            positions = np.arange(windows.size) - firsts[windows]
+            starts = np.where(positions == 0, window_starts[windows], first_step[windows] + (positions - 1) * granularity)
+            ends = window_ends[windows]
+
+            index = ((starts // SECONDS_PER_DAY + 3) % 7, (starts % SECONDS_PER_DAY) // 3600,
+                     self.buckets((ends - starts) // 60))
+            scores, codes = score_table[index], code_table[index]
+
+            # Best candidate per window: highest score, then lowest position
+            keys = scores << 20 | ((1 << 20) - 1 - positions)
+            best = firsts + ((1 << 20) - 1 - (np.maximum.reduceat(keys, firsts) & ((1 << 20) - 1)))
+            best = best[np.lexsort((starts[best], -scores[best]))[:k]]
+
+            for item in zip(scores[best].tolist(), (-starts[best]).tolist(), ends[best].tolist(), codes[best].tolist()):
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        ranked = sorted(heap, reverse=True)
+        return (
+            SlotTable(np.array([-item[1] for item in ranked], dtype=np.int64),
+                      np.array([item[2] for item in ranked], dtype=np.int64)),
+            np.array([item[0] for item in ranked], dtype=np.int64),
+            np.array([item[3] for item in ranked], dtype=np.int32)
+        )
+
+    def reason(self, code: int) -> str:
+        return self.reasons[code]
+
+    def best_time_pattern(self, request_type: str) -> str:
+        rules = self.type_rules.get(request_type) or self.type_rules['general']
+        return rules.get('best_time_pattern', '')
+
+
+_shared_rules: Optional[ScoringRules] = None
+_shared_lock = threading.Lock()
+
+
+def get_scoring_rules() -> ScoringRules:
+    """Rules from config.SCORING_RULES_FILE, compiled once per process"""
+    global _shared_rules
+    with _shared_lock:
+        if _shared_rules is None:
+            _shared_rules = ScoringRules.load()
+        return _shared_rules
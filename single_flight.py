@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import metrics
+
+
+class _Flight:
+    """One in-flight computation and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers with the same key share its result
+
+    The first caller (the leader) computes; callers arriving while it runs
+    wait and receive the same result, or the same exception. Nothing is kept
+    once the flight lands, so a later call computes afresh: this only merges
+    bursts and never serves anything older than the caller's own arrival.
+    Threads and asyncio tasks are tracked separately, each with its own map.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Hashable, Tuple[asyncio.Future, _Flight]] = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.followers = 0
+        self.largest_flight = 0  # callers sharing the busiest flight so far
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """compute() for the first caller with key; concurrent callers wait for its result"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._count(flight, leader)
+
+        if not leader:
+            metrics.annotate(coalesced=1)
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Asyncio version of do; compute is called, and awaited, once per flight"""
+        key = (asyncio.get_running_loop(), key)  # a task can only be awaited on its own loop
+        with self._lock:
+            leader = key not in self._tasks
+            if leader:
+                # A task of its own, so a cancelled caller does not cancel the others' result
+                task = asyncio.ensure_future(compute())
+                self._tasks[key] = (task, _Flight())
+                task.add_done_callback(lambda _: self._land(key, task))
+            task, flight = self._tasks[key]
+            self._count(flight, leader)
+        if not leader:
+            metrics.annotate(coalesced=1)
+        return await asyncio.shield(task)
+
+    def _land(self, key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if key in self._tasks and self._tasks[key][0] is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, so an error nobody awaited is not logged
+
+    def _count(self, flight: _Flight, leader: bool):
+        if leader:
+            self.leaders += 1
+        else:
+            flight.followers += 1
+            self.followers += 1
+        self.largest_flight = max(self.largest_flight, flight.followers + 1)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                'calls': calls,
+                'computations': self.leaders,
+                'coalesced': self.followers,
+                # Share of calls answered by another caller's computation
+                'coalescing_ratio': self.followers / calls if calls else 0.0,
+                'largest_flight': self.largest_flight,
+                'in_flight': len(self._flights) + len(self._tasks)
+            }
@@ -0,0 +1,116 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+import config
+from columnar import SlotTable
+
+
+class FreeSlotIndex:
+    """Free slots per day and duration bucket, kept current one dirty day at a time
+
+    Each day is computed once with CalendarManager.get_free_time_slots at the
+    smallest bucket and filtered down for the larger ones. The event store
+    reports which days a sync touched; only those days are recomputed on the
+    next lookup, and a full resync drops the whole index. A lookup is a
+    concatenation of per-day tables.
+    """
+
+    def __init__(self, calendar_manager, durations: Optional[List[int]] = None):
+        self.calendar_manager = calendar_manager
+        self.durations = sorted(durations or config.SLOT_INDEX_DURATIONS)
+        self._days: Dict[date, Dict[int, SlotTable]] = {}
+        self._dirty: Set[date] = set()
+        self._changes = 0  # invalidations so far
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.day_builds = 0
+        self.invalidated_days = 0
+        calendar_manager.event_store.add_listener(self._invalidate)
+
+    def _invalidate(self, days: Optional[Iterable[date]]):
+        with self._lock:
+            self._changes += 1
+            if days is None:
+                self.invalidated_days += len(self._days)
+                self._days.clear()
+                self._dirty.clear()
+            else:
+                dirty = self._days.keys() & set(days)
+                self.invalidated_days += len(dirty)
+                self._dirty |= dirty
+
+    def free_slots(self, start_date: datetime, end_date: datetime, duration_minutes: int) -> SlotTable:
+        """Slots of at least duration_minutes on the days from start_date to end_date (inclusive)"""
+        buckets = [bucket for bucket in self.durations if bucket <= duration_minutes]
+        if not buckets:
+            # Shorter than every bucket: not indexed
+            return SlotTable.from_slots(
+                self.calendar_manager.get_free_time_slots(start_date, end_date, duration_minutes)
+            )
+        bucket = buckets[-1]
+
+        manager = self.calendar_manager
+        if manager.service:
+            # Pull pending changes first so their days are marked dirty
+            manager.event_store.sync_if_due(manager.service)
+
+        days = [start_date.date() + timedelta(days=offset)
+                for offset in range((end_date.date() - start_date.date()).days + 1)]
+        with self._lock:
+            self.lookups += 1
+            self._prune(datetime.now().date() - timedelta(days=config.CALENDAR_SYNC_LOOKBACK_DAYS))
+            missing = [day for day in days if day not in self._days or day in self._dirty]
+            changes = self._changes
+
+        # Built without the lock: fetching may sync the store, which calls back into _invalidate
+        built = {day: self._build(day) for day in missing}
+
+        with self._lock:
+            self.day_builds += len(built)
+            for day, day_tables in built.items():
+                if self._cacheable(day):
+                    self._days[day] = day_tables
+                    if self._changes == changes:  # otherwise a newer change may have hit the day
+                        self._dirty.discard(day)
+            tables = [(built.get(day) or self._days[day])[bucket] for day in days]
+
+        slots = SlotTable(
+            np.concatenate([table.starts for table in tables]) if tables else np.zeros(0, dtype=np.int64),
+            np.concatenate([table.ends for table in tables]) if tables else np.zeros(0, dtype=np.int64)
+        )
+        if bucket != duration_minutes:
+            slots = slots.take(np.flatnonzero(slots.duration_minutes >= duration_minutes))
+        return slots
+
+    def _build(self, day: date) -> Dict[int, SlotTable]:
+        day_start = datetime.combine(day, datetime.min.time())
+        windows = SlotTable.from_slots(self.calendar_manager.get_free_time_slots(
+            day_start, day_start + timedelta(days=1) - timedelta(microseconds=1), self.durations[0]
+        ))
+        tables = {self.durations[0]: windows}
+        for bucket in self.durations[1:]:
+            tables[bucket] = windows.take(np.flatnonzero(windows.duration_minutes >= bucket))
+        return tables
+
+    def _cacheable(self, day: date) -> bool:
+        # Days the event store does not hold are fetched straight from the API, so changes go unseen
+        manager = self.calendar_manager
+        return not manager.service or manager.event_store.covers(datetime.combine(day, datetime.min.time()))
+
+    def _prune(self, oldest: date):
+        for day in [day for day in self._days if day < oldest]:
+            del self._days[day]
+            self._dirty.discard(day)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'days': len(self._days),
+                'dirty_days': len(self._dirty),
+                'durations': self.durations,
+                'lookups': self.lookups,
+                'day_builds': self.day_builds,
+                'invalidated_days': self.invalidated_days
+            }
@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+import numpy as np
+import config
+import interval_engine
+from availability import AvailabilityGrid
+from columnar import EventTable, SlotTable, from_epoch, to_epoch
+from interval_engine import Interval
+
+
+class CalendarSnapshot:
+    """Immutable result of one calendar fetch, shared by every stage of an analysis
+
+    Holds the events as a columnar table, a merged busy index built by one
+    vectorized sweep, and free slots computed lazily per duration.
+    """
+
+    def __init__(self, start_date: datetime, end_date: datetime,
+                 events: Union[EventTable, Iterable[Dict]], timezone, version: int = 0,
+                 slot_lookup: Optional[Callable[[int], Optional[SlotTable]]] = None):
+        self.start_date = start_date
+        self.end_date = end_date
+        if not isinstance(events, EventTable):
+            events = EventTable.from_events(events, timezone)
+        self.events: EventTable = events
+        self.version = version
+        self._slot_lookup = slot_lookup  # precomputed free slots by duration, None when they no longer match
+        self._timezone = timezone
+        self._busy = None
+        self._grid = None
+        self._free_slots: Dict[int, SlotTable] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def busy(self) -> Tuple[Interval, ...]:
+        """Disjoint busy blocks in local time, without the break buffer"""
+        with self._lock:
+            if self._busy is None:
+                starts, ends = self.events.busy_epochs()
+                self._busy = tuple(
+                    (from_epoch(start), from_epoch(end)) for start, end in zip(starts.tolist(), ends.tolist())
+                )
+            return self._busy
+
+    @property
+    def grid(self) -> AvailabilityGrid:
+        """Occupancy bitmap of the snapshot period"""
+        with self._lock:
+            if self._grid is None:
+                grid = AvailabilityGrid(self.start_date.date(), self.end_date.date())
+                grid.add_busy_epochs(*self.events.busy_epochs())
+                self._grid = grid
+            return self._grid
+
+    def free_slots(self, duration_minutes: int) -> SlotTable:
+        """Free slots of at least duration_minutes, computed once per duration
+
+        The table is immutable and shared; iterate it for dict-like slot rows
+        or call to_dicts() for plain dicts.
+        """
+        with self._lock:
+            slots = self._free_slots.get(duration_minutes)
+            if slots is None:
+                slots = self._compute_free_slots(duration_minutes)
+                self._free_slots[duration_minutes] = slots
+        return slots
+
+    def window(self, start_date: datetime, end_date: datetime) -> 'CalendarSnapshot':
+        """Snapshot of [start_date, end_date) within this one, at the same version
+
+        Free slots are cut from this snapshot's, so they are computed once for
+        both; the period should start and end at midnight to keep whole days.
+        """
+        range_start, range_end = to_epoch(start_date), to_epoch(end_date)
+
+        def lookup(duration: int) -> SlotTable:
+            slots = self.free_slots(duration)
+            return slots.take(np.flatnonzero((slots.starts >= range_start) & (slots.starts < range_end)))
+
+        return CalendarSnapshot(start_date, end_date, self.events.window(start_date, end_date), self._timezone,
+                                self.version, slot_lookup=lookup)
+
+    def _compute_free_slots(self, duration_minutes: int) -> SlotTable:
+        if self._slot_lookup is not None:
+            slots = self._slot_lookup(duration_minutes)
+            if slots is not None:
+                return slots
+        if config.FREE_SLOT_ENGINE == 'bitmap':
+            return self.grid.free_slot_table(duration_minutes, config.DEFAULT_BREAK_TIME)
+
+        # Padding merged blocks then re-merging equals padding every event
+        buffer = timedelta(minutes=config.DEFAULT_BREAK_TIME)
+        padded = interval_engine.merge_intervals(
+            ((start, end + buffer) for start, end in self.busy), presorted=True
+        )
+        return SlotTable.from_slots(interval_engine.iter_free_slots(
+            padded, self.start_date.date(), self.end_date.date(), duration_minutes
+        ))
@@ -0,0 +1,61 @@
+import json
+import re
+from typing import Dict, List
+
+
+class RecommendationStreamParser:
+    """Pull complete objects out of a JSON array while the surrounding document is still streaming"""
+
+    def __init__(self, array_key: str = 'recommendations'):
+        self.text = ''
+        self._array_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(array_key))
+        self._state = 'seek'  # seek -> array -> done
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add streamed text and return the objects completed by it"""
+        self.text += chunk
+        completed = []
+
+        if self._state == 'seek':
+            match = self._array_pattern.search(self.text)
+            if not match:
+                return completed
+            self._pos = match.end()
+            self._state = 'array'
+
+        text = self.text
+        while self._state == 'array' and self._pos < len(text):
+            char = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(text[self._object_start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass  # Malformed element, the final parse decides
+                    self._object_start = None
+            elif char == ']' and self._depth == 0:
+                self._state = 'done'
+
+            self._pos += 1
+
+        return completed
@@ -0,0 +1,548 @@
+import email
+import gzip
+import json
+import math
+import random
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+import pytz
+import config
+from synthetic_calendar import SyntheticCalendar
+
+# 99th percentile of the standard normal distribution
+_Z99 = 2.326
+
+
+class LatencyModel:
+    """Response delay and failure behaviour of a stub endpoint
+
+    'lognormal' draws a long-tailed delay from its median and p99, 'uniform'
+    spreads it evenly between the two and 'constant' always waits the median.
+    """
+
+    def __init__(self, median_ms: float = 0.0, p99_ms: Optional[float] = None,
+                 error_rate: float = 0.0, distribution: str = 'lognormal', seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.p99_ms = max(p99_ms if p99_ms is not None else median_ms, median_ms)
+        self.error_rate = error_rate
+        self.distribution = distribution
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, error_rate: float = 0.0, seed: Optional[int] = None) -> 'LatencyModel':
+        """Build from 'median[:p99[:distribution]]' in milliseconds, e.g. '800:2500'"""
+        parts = spec.split(':')
+        median_ms = float(parts[0])
+        p99_ms = float(parts[1]) if len(parts) > 1 else None
+        distribution = parts[2] if len(parts) > 2 else 'lognormal'
+        return cls(median_ms, p99_ms, error_rate, distribution, seed)
+
+    def sample(self) -> Tuple[float, bool]:
+        """Delay in seconds and whether this call should fail"""
+        with self._lock:
+            fail = self._random.random() < self.error_rate
+            if self.distribution == 'constant' or self.median_ms <= 0:
+                delay = self.median_ms
+            elif self.distribution == 'uniform':
+                delay = self._random.uniform(self.median_ms, self.p99_ms)
+            else:
+                sigma = math.log(self.p99_ms / self.median_ms) / _Z99
+                delay = self._random.lognormvariate(math.log(self.median_ms), sigma)
+        return delay / 1000, fail
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _send_json(self, status: int, body: Dict):
+        self._send(status, json.dumps(body).encode(), 'application/json; charset=UTF-8')
+
+    def _send(self, status: int, payload: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            # Like the real APIs, compress for clients that accept it
+            payload = gzip.compress(payload, compresslevel=6)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        try:
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first (timed out, or a hedged duplicate answered)
+            self.close_connection = True
+            return
+        self.server.count_bytes(len(payload))
+
+    def _delay(self) -> bool:
+        """Sleep for the sampled latency; True when the call should fail instead"""
+        delay, fail = self.server.latency.sample()
+        time.sleep(delay)
+        self.server.count_request(fail)
+        return fail
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded local HTTP server run in the background for a stub API"""
+    daemon_threads = True
+
+    def __init__(self, handler, latency: LatencyModel, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self, failed: bool):
+        with self._stats_lock:
+            self.requests += 1
+            self.errors += failed
+
+    def count_bytes(self, size: int):
+        with self._stats_lock:
+            self.bytes_sent += size
+
+    def start(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {'requests': self.requests, 'errors': self.errors, 'bytes_sent': self.bytes_sent}
+
+
+class _OpenAIHandler(_StubHandler):
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Unknown endpoint', 'type': 'invalid_request_error'}})
+            return
+
+        body = self._read_body()
+        if self._delay():
+            self._send_json(500, {'error': {'message': 'Stub server error', 'type': 'server_error'}})
+            return
+
+        content = json.dumps(self.server.analysis(), ensure_ascii=False)
+        if body.get('stream'):
+            self._send_chunks(body.get('model', 'gpt-3.5-turbo'), content)
+            return
+        self._send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+
+    def _send_chunks(self, model: str, content: str):
+        """The answer as server-sent completion chunks, written and flushed one at a time"""
+        size = self.server.chunk_chars
+        deltas = [{'content': content[start:start + size]} for start in range(0, len(content), size)]
+        frames = [
+            json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': None if delta else 'stop'}]
+            }, ensure_ascii=False)
+            for delta in deltas + [{}]
+        ] + ['[DONE]']
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        try:
+            self.end_headers()
+            for frame in frames:
+                payload = f'data: {frame}\n\n'.encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(payload), payload))
+                self.wfile.flush()
+                self.server.count_bytes(len(payload))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the reader abandoned the stream
+
+
+class StubOpenAIServer(StubServer):
+    """Chat completions stand-in answering with a well-formed analysis JSON
+
+    Point OPENAI_BASE_URL at `url + '/v1'`. recommendations and padding_chars
+    control the answer size. With stream=True the answer arrives as server-sent
+    chunks of chunk_chars characters, so they split strings and objects.
+    """
+
+    def __init__(self, latency: LatencyModel, recommendations: int = 3, padding_chars: int = 0,
+                 chunk_chars: int = 16, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(_OpenAIHandler, latency, host, port)
+        self.recommendations = recommendations
+        self.padding_chars = padding_chars
+        self.chunk_chars = chunk_chars
+
+    def analysis(self) -> Dict:
+        start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        return {
+            'request_analysis': 'Stub analysis of the request',
+            'recommendations': [
+                {
+                    'datetime': (start + timedelta(hours=index)).strftime('%Y-%m-%d %H:%M'),
+                    'reason': 'Stub recommendation',
+                    'priority': index + 1
+                }
+                for index in range(self.recommendations)
+            ],
+            'general_advice': 'x' * self.padding_chars,
+            'notes': 'Generated by the stub OpenAI server'
+        }
+
+
+def _parse_fields(spec: str, position: int = 0) -> Tuple[Dict, int]:
+    """Partial-response selector such as 'nextPageToken,items(id,start)' as a nested dict"""
+    tree: Dict = {}
+    name = ''
+    while position < len(spec):
+        char = spec[position]
+        position += 1
+        if char == '(':
+            tree[name.strip()], position = _parse_fields(spec, position)
+            name = ''
+        elif char == ')':
+            break
+        elif char == ',':
+            if name.strip():
+                tree[name.strip()] = None
+            name = ''
+        else:
+            name += char
+    if name.strip():
+        tree[name.strip()] = None
+    return tree, position
+
+
+def _select_fields(value, tree: Optional[Dict]):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_select_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _select_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+class _CalendarHandler(_StubHandler):
+    def do_GET(self):
+        self._respond('GET', b'')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.path.split('?')[0].rstrip('/').endswith('/batch/calendar/v3'):
+            self._respond_batch(body)
+        else:
+            self._respond('POST', body)
+
+    def _respond(self, method: str, body: bytes):
+        status, result = self.server.answer(method, self.path, body)
+        if status == 200 and self._delay():
+            status, result = 503, {'error': {'code': 503, 'message': 'Backend Error'}}
+        self._send_json(status, result)
+
+    def _respond_batch(self, body: bytes):
+        """multipart/mixed batch: every part is answered, one latency sample for the round trip"""
+        message = email.message_from_bytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body
+        )
+        if self._delay():
+            self._send_json(503, {'error': {'code': 503, 'message': 'Backend Error'}})
+            return
+
+        boundary = 'stub_batch_boundary'
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().replace('\r\n', '\n').partition('\n')
+            method, path = request_line.split()[:2]
+            part_body = rest.partition('\n\n')[2]
+            status, result = self.server.answer(method, path, part_body.encode())
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{part["Content-ID"][1:-1]}>\r\n\r\n'
+                f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n{json.dumps(result)}\r\n'
+            )
+        payload = (''.join(parts) + f'--{boundary}--\r\n').encode()
+        self._send(200, payload, f'multipart/mixed; boundary={boundary}')
+
+
+class StubCalendarServer(StubServer):
+    """Calendar API v3 stand-in serving a synthetic calendar
+
+    Answers events.list (paginated, with sync tokens), events.watch,
+    channels.stop and freebusy.query, alone or in multipart batches, honours
+    `fields` partial responses and gzips for clients that accept it. Point
+    CALENDAR_API_ENDPOINT at `url`; events_per_day, description_chars and
+    attendees control the payload size. Events change only through
+    apply_change (see NotificationSimulator). freebusy shares the one
+    calendar's busy time with every id asked for, except those added to
+    missing_calendars, which answer notFound. page_size caps events.list
+    pages below maxResults, as the real API may, and with fail_later_pages
+    every page after the first answers 503.
+    """
+
+    def __init__(self, latency: LatencyModel, events_per_day: float = 6.0, description_chars: int = 0,
+                 days: int = 60, seed: int = 0, attendees: int = 0, host: str = '127.0.0.1', port: int = 0):
+        super().__init__(_CalendarHandler, latency, host, port)
+        generator = SyntheticCalendar(seed=seed, events_per_day=events_per_day)
+        # Cover the manager's look-back as well as the analysis horizon
+        events = generator.generate(date.today() - timedelta(days=14), days)
+        self.items: List[Dict] = generator.to_api_items(events)
+        for item in self.items:
+            item['description'] = 'x' * description_chars
+            if attendees:
+                # Fields the client never reads, as on large shared calendars
+                item['attendees'] = [
+                    {'email': f'guest{index}@example.com', 'displayName': f'Guest {index}',
+                     'responseStatus': 'accepted'}
+                    for index in range(attendees)
+                ]
+        self._changes: List[Dict] = []  # changed items in order; sync token n means the first n are seen
+        self._sync_epoch = 0  # sync tokens of an earlier epoch answer 410 Gone
+        self.channels: Dict[str, Dict] = {}  # open watch channels by id
+        self.missing_calendars = set()
+        self.page_size: Optional[int] = None
+        self.fail_later_pages = False
+        self.freebusy_queries = 0
+        self._data_lock = threading.RLock()
+        self._index_times()
+
+    def _index_times(self):
+        self._starts = [self._item_time(item['start']) for item in self.items]
+        self._ends = [self._item_time(item['end']) for item in self.items]
+
+    def apply_change(self, item: Dict):
+        """Insert, update or (status 'cancelled') delete an event, as seen by later syncs"""
+        with self._data_lock:
+            self.items = [existing for existing in self.items if existing['id'] != item['id']]
+            if item.get('status') != 'cancelled':
+                self.items.append(item)
+                self.items.sort(key=lambda existing: self._item_time(existing['start']))
+            self._changes.append(item)
+            self._index_times()
+
+    def expire_sync_tokens(self):
+        """Invalidate every sync token issued so far, as Google does now and then"""
+        with self._data_lock:
+            self._sync_epoch += 1
+
+    def item(self, event_id: str) -> Optional[Dict]:
+        with self._data_lock:
+            return next((item for item in self.items if item['id'] == event_id), None)
+
+    def open_channels(self, calendar_id: str) -> List[Dict]:
+        """Watch channels of a calendar that have not expired or been stopped"""
+        now_ms = time.time() * 1000
+        with self._data_lock:
+            return [channel for channel in self.channels.values()
+                    if channel['calendar_id'] == calendar_id and int(channel['expiration']) > now_ms]
+
+    def answer(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        """Status and JSON body for one API call, without the simulated latency"""
+        url = urlparse(path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if method == 'GET' and len(parts) >= 3 and parts[-1] == 'events' and parts[-3] == 'calendars':
+            if 'syncToken' in params and not self._valid_sync_token(params['syncToken']):
+                return 410, {'error': {'code': 410, 'message': 'Sync token is no longer valid, a full sync is required.'}}
+            if 'pageToken' in params and self.fail_later_pages:
+                return 503, {'error': {'code': 503, 'message': 'Backend Error'}}
+            result = self.events_page(params)
+        elif method == 'POST' and len(parts) >= 4 and parts[-2:] == ['events', 'watch'] and parts[-4] == 'calendars':
+            result = self.watch(parts[-3], json.loads(body or b'{}'))
+        elif method == 'POST' and parts[-2:] == ['channels', 'stop']:
+            with self._data_lock:
+                self.channels.pop(json.loads(body or b'{}').get('id'), None)
+            result = {}
+        elif method == 'POST' and parts[-1] == 'freeBusy':
+            result = self.freebusy(json.loads(body or b'{}'))
+        else:
+            return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+
+        if params.get('fields'):
+            result = _select_fields(result, _parse_fields(params['fields'])[0])
+        return 200, result
+
+    def watch(self, calendar_id: str, body: Dict) -> Dict:
+        ttl = int(body.get('params', {}).get('ttl') or 604800)
+        channel = {
+            'kind': 'api#channel',
+            'id': body['id'],
+            'resourceId': f'stub-resource-{calendar_id}',
+            'resourceUri': f'{self.url}/calendar/v3/calendars/{calendar_id}/events',
+            'token': body.get('token'),
+            'expiration': str(int((time.time() + ttl) * 1000))
+        }
+        with self._data_lock:
+            self.channels[channel['id']] = dict(channel, calendar_id=calendar_id, address=body.get('address'))
+        return channel
+
+    def events_page(self, params: Dict) -> Dict:
+        with self._data_lock:
+            if 'syncToken' in params:
+                return self._changes_since(params['syncToken'])
+            time_min = self._param_time(params.get('timeMin'))
+            time_max = self._param_time(params.get('timeMax'))
+            matching = [item for item, _, _ in self._overlapping(time_min, time_max)]
+            sync_token = self._sync_token()
+
+        offset = int(params.get('pageToken') or 0)
+        page_size = min(int(params.get('maxResults') or 250), self.page_size or 2500)
+        page = {'kind': 'calendar#events', 'items': matching[offset:offset + page_size]}
+        if offset + page_size < len(matching):
+            page['nextPageToken'] = str(offset + page_size)
+        else:
+            page['nextSyncToken'] = sync_token
+        return page
+
+    def _sync_token(self) -> str:
+        return f'stub-sync-{self._sync_epoch}-{len(self._changes)}'
+
+    def _valid_sync_token(self, sync_token: str) -> bool:
+        with self._data_lock:
+            return sync_token.startswith(f'stub-sync-{self._sync_epoch}-')
+
+    def _changes_since(self, sync_token: str) -> Dict:
+        seen = sync_token.rpartition('-')[2]
+        seen = int(seen) if seen.isdigit() else len(self._changes)
+        # Latest state of every event changed since, in one page
+        latest = {item['id']: item for item in self._changes[seen:]}
+        return {'kind': 'calendar#events', 'items': list(latest.values()),
+                'nextSyncToken': self._sync_token()}
+
+    def freebusy(self, body: Dict) -> Dict:
+        time_min = self._param_time(body.get('timeMin'))
+        time_max = self._param_time(body.get('timeMax'))
+        with self._data_lock:
+            busy = [
+                {'start': item['start'].get('dateTime', start.isoformat()),
+                 'end': item['end'].get('dateTime', end.isoformat())}
+                for item, start, end in self._overlapping(time_min, time_max)
+            ]
+            self.freebusy_queries += 1
+        missing = {'errors': [{'domain': 'global', 'reason': 'notFound'}], 'busy': []}
+        return {
+            'kind': 'calendar#freeBusy',
+            'calendars': {entry['id']: missing if entry['id'] in self.missing_calendars else {'busy': busy}
+                          for entry in body.get('items', [])}
+        }
+
+    def _overlapping(self, time_min: Optional[datetime], time_max: Optional[datetime]):
+        for item, start, end in zip(self.items, self._starts, self._ends):
+            if (time_min is None or end > time_min) and (time_max is None or start < time_max):
+                yield item, start, end
+
+    def _item_time(self, value: Dict) -> datetime:
+        if 'dateTime' in value:
+            return datetime.fromisoformat(value['dateTime'])
+        # All-day dates are compared at midnight UTC; close enough for a stub
+        return datetime.fromisoformat(value['date'] + 'T00:00:00+00:00')
+
+    def _param_time(self, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class NotificationSimulator:
+    """Changes events on a StubCalendarServer and sends the push notifications Google would
+
+    Every change is announced to each open watch channel of the calendar with
+    the same X-Goog-* headers as the real service, POSTed to the channel
+    address. Pass deliver to hand (address, headers) to a handler in-process
+    instead, e.g. in tests.
+    """
+
+    def __init__(self, server: StubCalendarServer,
+                 deliver: Optional[Callable[[str, Dict[str, str]], None]] = None):
+        self.server = server
+        self.deliver = deliver or self._post
+        self.timezone = pytz.timezone(config.TIMEZONE)
+        self._message_numbers: Dict[str, int] = {}
+
+    def add_event(self, title: str, start: datetime, duration_minutes: int = 60,
+                  calendar_id: str = 'primary') -> Dict:
+        item = {'id': f'sim_{uuid.uuid4().hex[:12]}', 'status': 'confirmed', 'summary': title,
+                'description': '', 'location': ''}
+        item.update(self._times(start, duration_minutes))
+        self.server.apply_change(item)
+        self.notify(calendar_id)
+        return item
+
+    def move_event(self, event_id: str, start: datetime, calendar_id: str = 'primary') -> Dict:
+        item = dict(self.server.item(event_id))
+        duration = self.server._item_time(item['end']) - self.server._item_time(item['start'])
+        item.update(self._times(start, int(duration.total_seconds() // 60)))
+        self.server.apply_change(item)
+        self.notify(calendar_id)
+        return item
+
+    def delete_event(self, event_id: str, calendar_id: str = 'primary'):
+        self.server.apply_change({'id': event_id, 'status': 'cancelled'})
+        self.notify(calendar_id)
+
+    def notify(self, calendar_id: str = 'primary', state: str = 'exists') -> int:
+        """Send one notification per open channel, returning how many were sent"""
+        channels = self.server.open_channels(calendar_id)
+        for channel in channels:
+            number = self._message_numbers[channel['id']] = self._message_numbers.get(channel['id'], 0) + 1
+            self.deliver(channel['address'], {
+                'X-Goog-Channel-ID': channel['id'],
+                'X-Goog-Channel-Token': channel.get('token') or '',
+                'X-Goog-Channel-Expiration': channel['expiration'],
+                'X-Goog-Resource-ID': channel['resourceId'],
+                'X-Goog-Resource-URI': channel['resourceUri'],
+                'X-Goog-Resource-State': state,
+                'X-Goog-Message-Number': str(number)
+            })
+        return len(channels)
+
+    def _times(self, start: datetime, duration_minutes: int) -> Dict:
+        start = self.timezone.localize(start) if start.tzinfo is None else start
+        end = start + timedelta(minutes=duration_minutes)
+        return {'start': {'dateTime': start.isoformat()}, 'end': {'dateTime': end.isoformat()}}
+
+    def _post(self, address: str, headers: Dict[str, str]):
+        request = urllib.request.Request(address, data=b'', headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
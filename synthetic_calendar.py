@@ -0,0 +1,112 @@
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import pytz
+import config
+
+TITLES = [
+    'Team Meeting', 'Client Call', 'Design Review', 'Lunch Appointment', 'Gym',
+    'Dentist', 'Presentation', '1:1', 'Weekly Review', 'Code Review', 'Interview', 'Coffee Chat'
+]
+LOCATIONS = ['Conference Room A', 'Main Conference Room', 'Office', 'Restaurant', 'Fitness Center', 'Hospital', '']
+DURATIONS = [15, 30, 45, 60, 90, 120]
+
+
+class SyntheticCalendar:
+    """Seeded generator of realistic-looking calendars for stress tests and benchmarks"""
+
+    def __init__(self, seed: int = 0, events_per_day: float = 6.0, overlap_ratio: float = 0.15,
+                 all_day_ratio: float = 0.03, multi_day_ratio: float = 0.01, recurring_series: int = 5):
+        self.seed = seed
+        self.events_per_day = events_per_day
+        self.overlap_ratio = overlap_ratio
+        self.all_day_ratio = all_day_ratio
+        self.multi_day_ratio = multi_day_ratio
+        self.recurring_series = recurring_series
+
+    def days_for(self, event_count: int) -> int:
+        """Horizon length that yields roughly event_count events"""
+        per_day = self.events_per_day + self.recurring_series / 7 + self.all_day_ratio + self.multi_day_ratio
+        return max(1, round(event_count / per_day))
+
+    def generate(self, start_day: date, days: int) -> List[Dict]:
+        """Events in CalendarManager's format, ordered by start"""
+        rng = random.Random(self.seed)
+        events = []
+        series = [
+            (rng.randrange(5), rng.randrange(8, 18), rng.choice(DURATIONS), rng.choice(TITLES))
+            for _ in range(self.recurring_series)
+        ]
+
+        for offset in range(days):
+            day = start_day + timedelta(days=offset)
+            midnight = datetime.combine(day, datetime.min.time())
+
+            # Recurring weekly series
+            for index, (weekday, hour, duration, title) in enumerate(series):
+                if day.weekday() == weekday:
+                    start = midnight + timedelta(hours=hour)
+                    events.append(self._event(f'series{index}_{day}', title, start, duration))
+
+            if rng.random() < self.all_day_ratio:
+                events.append(self._event(f'allday_{day}', 'Holiday', midnight, 24 * 60, all_day=True))
+
+            if rng.random() < self.multi_day_ratio:
+                span = rng.randint(2, 4)
+                events.append(self._event(f'trip_{day}', 'Business Trip', midnight, span * 24 * 60, all_day=True))
+
+            # Poisson-like number of one-off events, some deliberately overlapping
+            count = sum(1 for _ in range(int(self.events_per_day * 2)) if rng.random() < 0.5)
+            previous = None
+            for number in range(count):
+                duration = rng.choice(DURATIONS)
+                if previous is not None and rng.random() < self.overlap_ratio:
+                    start = previous['start'] + timedelta(minutes=rng.randrange(0, 60, 15))
+                else:
+                    start = midnight + timedelta(minutes=rng.randrange(7 * 60, 21 * 60, 15))
+                # Late starts run past midnight into the next day
+                previous = self._event(f'evt_{day}_{number}', rng.choice(TITLES), start, duration,
+                                       location=rng.choice(LOCATIONS))
+                events.append(previous)
+
+        events.sort(key=lambda event: event['start'])
+        return events
+
+    def generate_count(self, event_count: int, start_day: Optional[date] = None) -> List[Dict]:
+        """About event_count events starting at start_day (today by default)"""
+        start_day = start_day or date.today()
+        return self.generate(start_day, self.days_for(event_count))
+
+    def to_api_items(self, events: List[Dict]) -> List[Dict]:
+        """The same events as Google Calendar API resources"""
+        timezone = pytz.timezone(config.TIMEZONE)
+        items = []
+        for event in events:
+            if event['all_day']:
+                start = {'date': event['start'].date().isoformat()}
+                end = {'date': event['end'].date().isoformat()}
+            else:
+                start = {'dateTime': timezone.localize(event['start']).isoformat()}
+                end = {'dateTime': timezone.localize(event['end']).isoformat()}
+            items.append({
+                'id': event['id'],
+                'status': 'confirmed',
+                'summary': event['title'],
+                'description': event['description'],
+                'location': event['location'],
+                'start': start,
+                'end': end
+            })
+        return items
+
+    def _event(self, event_id: str, title: str, start: datetime, duration_minutes: int,
+               location: str = '', all_day: bool = False) -> Dict:
+        return {
+            'id': event_id,
+            'title': title,
+            'start': start,
+            'end': start + timedelta(minutes=duration_minutes),
+            'description': '',
+            'location': location,
+            'all_day': all_day
+        }
@@ -4,9 +4,62 @@ AI Schedule Assistant Demo Test Script
 """
 
 from ai_agent import ScheduleAIAgent
+from availability import GroupAvailability
 from calendar_manager import CalendarManager
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import asyncio
 import json
+import re
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+import pytz
+from googleapiclient.errors import HttpError
+from werkzeug.serving import make_server
+import openai
+import asgi_app
+import clients
+import config
+import web_app
+from columnar import EventTable, SlotTable, StringPool, merge_epochs, pack_event, to_epoch
+from event_store import EVENT_LIST_FIELDS, event_list_request, iter_event_pages, record_days
+from llm_cache import AnalysisCache
+from load_test import LoadDriver, percentile, summarize
+from llm_guard import CircuitBreaker, Deadline, GuardedCompletions
+from prefetch import SnapshotPrefetcher
+from prompt_builder import PromptBuilder, count_tokens
+from push_channels import PushChannelManager
+from router import RequestRouter
+from scoring import get_scoring_rules
+from snapshot import CalendarSnapshot
+from stream_parser import RecommendationStreamParser
+from synthetic_calendar import SyntheticCalendar
+from stub_servers import LatencyModel, NotificationSimulator, StubCalendarServer, StubOpenAIServer
+
+@contextmanager
+def stub_calendar(settings=None, **options):
+    """Stub Calendar API and an authenticated CalendarManager using it, with config settings applied meanwhile"""
+    stub = StubCalendarServer(LatencyModel(), **{'events_per_day': 4, 'days': 30, **options}).start()
+    settings = {'CALENDAR_API_ENDPOINT': stub.url, **(settings or {})}
+    defaults = {name: getattr(config, name) for name in settings}
+    for name, value in settings.items():
+        setattr(config, name, value)
+    # The calendar service is cached per thread, possibly for another test's stub
+    clients.reset_calendar_service()
+    try:
+        calendar_manager = CalendarManager()
+        calendar_manager.authenticate()
+        yield stub, calendar_manager
+    finally:
+        for name, value in defaults.items():
+            setattr(config, name, value)
+        clients.reset_calendar_service()
+        stub.stop()
 
 def test_calendar_manager():
     """Calendar manager test"""
@@ -37,6 +90,36 @@ def test_calendar_manager():
     
     return events, free_slots
 
+def test_interval_engine():
+    """Sweep-line free slot test with overlapping, all-day and overnight events"""
+    print("\n🧪 Starting interval engine test...")
+    
+    calendar_manager = CalendarManager()
+    monday = datetime(2025, 1, 6)
+    events = [
+        {'start': monday.replace(hour=9), 'end': monday.replace(hour=15)},
+        {'start': monday.replace(hour=10), 'end': monday.replace(hour=11)},  # Contained in the one above
+        {'start': monday + timedelta(days=1, hours=22), 'end': monday + timedelta(days=2, hours=10)},
+        {'start': monday + timedelta(days=3), 'end': monday + timedelta(days=4)},  # All-day Thursday
+    ]
+    calendar_manager.iter_events = lambda start_date, end_date: iter(events)
+    default_engine = config.FREE_SLOT_ENGINE
+    
+    for engine in ['sweep', 'bitmap']:
+        config.FREE_SLOT_ENGINE = engine
+        free_slots = calendar_manager.get_free_time_slots(monday, monday + timedelta(days=4), 60)
+        found = [(slot['start'].strftime('%a %H:%M'), slot['end'].strftime('%H:%M')) for slot in free_slots]
+        print(f"  - Free slots ({engine}): {found}")
+        
+        assert found == [
+            ('Mon 15:30', '18:00'),
+            ('Tue 09:00', '18:00'),
+            ('Wed 10:30', '18:00'),
+            ('Fri 09:00', '18:00'),
+        ]
+    config.FREE_SLOT_ENGINE = default_engine
+    print("✅ Overlapping, overnight and all-day events handled")
+
 def test_ai_agent():
     """AI agent test"""
     print("\n🤖 Starting AI agent test...")
@@ -87,13 +170,869 @@ def test_smart_analysis():
         ("Gym workout", "fitness"),
         ("Lunch appointment", "social"),
         ("Shopping", "shopping"),
-        ("General work", "general")
+        ("General work", "general"),
+        ("병원 예약", "medical"),
+        ("팀 회의", "business"),
+        ("헬스장에서 운동", "fitness"),
+        ("친구와 점심 식사", "social")
     ]
     
+    mismatches = []
     for request, expected_type in test_cases:
         classified_type = ai_agent._classify_request_type(request)
         status = "✅" if classified_type == expected_type else "❌"
         print(f"  {status} '{request}' -> {classified_type} (expected: {expected_type})")
+        if classified_type != expected_type:
+            mismatches.append(request)
+    assert not mismatches, mismatches
+    
+    # Korean with a duration attached is no longer 'general', and confidently so
+    request_type, confidence = ai_agent._classify_with_confidence("병원 예약 2시간")
+    assert request_type == 'medical' and confidence == 1.0
+    assert confidence >= config.ROUTER_MIN_CONFIDENCE
+    # Mixed keywords: 'lunch' (1.0) outweighs 'appointment' (0.8)
+    request_type, confidence = ai_agent._classify_with_confidence("Lunch appointment")
+    assert request_type == 'social' and abs(confidence - 1.0 / 1.8) < 1e-9
+    assert ai_agent._classify_with_confidence("General work") == ('general', 0.0)
+    
+    # One pass over the batch gives the same answers as one call per request
+    requests = [request for request, _ in test_cases] + ["병원 예약 2시간", "", "Lunch appointment"]
+    assert ai_agent.classifier.classify_many(requests) == [ai_agent.classifier.classify(request) for request in requests]
+
+def test_push_notifications():
+    """Push notification test: a simulated change is synced and only its day is recomputed"""
+    print("\n🔔 Starting push notification test...")
+    
+    with stub_calendar() as (stub, calendar_manager):
+        start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        calendar_manager.slot_index.free_slots(start_date, start_date + timedelta(days=6), 60)
+        
+        push_channels = PushChannelManager(calendar_manager, address='https://example.com/notifications', token='test')
+        simulator = NotificationSimulator(stub, deliver=lambda address, headers: push_channels.handle(headers))
+        push_channels.start()
+        deadline = time.monotonic() + 10
+        while push_channels.stats()['syncs'] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert push_channels.stats()['channels'], "channel not opened"
+        
+        invalidated = calendar_manager.slot_index.stats()['invalidated_days']
+        simulator.add_event('Push test', start_date.replace(hour=10))
+        while push_channels.stats()['syncs'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        
+        titles = [event['title'] for event in calendar_manager.get_events(start_date, start_date + timedelta(days=1))]
+        assert 'Push test' in titles
+        assert calendar_manager.slot_index.stats()['invalidated_days'] == invalidated + 1
+        assert not push_channels.handle({'X-Goog-Channel-ID': 'unknown', 'X-Goog-Resource-State': 'exists'})
+        print(f"✅ Change synced after {push_channels.stats()['notifications']} notification(s), one day recomputed")
+        
+        push_channels.stop()
+        assert not stub.open_channels('primary')
+
+def test_request_coalescing():
+    """Coalescing test: identical concurrent analyses share one calendar fetch"""
+    print("\n🔗 Starting request coalescing test...")
+    
+    ai_agent = ScheduleAIAgent()
+    fetches = []
+    get_snapshot = ai_agent.get_snapshot
+    
+    def slow_snapshot(search_days=None):
+        fetches.append(search_days)
+        time.sleep(0.2)
+        return get_snapshot(search_days)
+    
+    ai_agent.get_snapshot = slow_snapshot
+    requests = ["Weekly Review", "weekly  review", "WEEKLY REVIEW "] * 3
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        results = list(pool.map(lambda request: ai_agent.analyze_schedule_request(request, 1.0), requests))
+    assert len(fetches) == 1, f"{len(fetches)} fetches"
+    assert [result['user_request'] for result in results] == requests
+    assert all(result['analysis'] == results[0]['analysis'] for result in results)
+    
+    # Callers share the computation, not the objects
+    results[1]['analysis']['recommendations'].clear()
+    results[1]['available_slots'].pop()
+    assert results[0]['analysis']['recommendations'] and results[2]['analysis']['recommendations']
+    assert len(results[0]['available_slots']) == len(results[2]['available_slots']) == len(results[1]['available_slots']) + 1
+    
+    async def burst():
+        return await asyncio.gather(*[ai_agent.analyze_schedule_request_async(request, 1.0) for request in requests])
+    async_results = asyncio.run(burst())
+    assert len(fetches) == 2, f"{len(fetches)} fetches"
+    
+    async_results[0]['analysis']['recommendations'].clear()
+    assert all(result['analysis']['recommendations'] for result in async_results[1:])
+    
+    stats = ai_agent.single_flight.stats()
+    assert stats['computations'] == 2 and stats['coalesced'] == 2 * len(requests) - 2
+    assert stats['in_flight'] == 0
+    print(f"✅ {stats['calls']} analyses, {stats['computations']} computed, "
+          f"coalescing ratio {stats['coalescing_ratio']:.0%}")
+
+def test_request_routing():
+    """Routing test: a clear request whose type does not suit the free slots goes to the LLM"""
+    print("\n🧭 Starting request routing test...")
+    
+    rules = get_scoring_rules()
+    monday = datetime(2026, 10, 19)
+    afternoons = SlotTable.from_slots([
+        {'start': monday + timedelta(days=day, hours=13, minutes=30), 'end': monday + timedelta(days=day, hours=16)}
+        for day in range(5)
+    ])
+    # Weekday bonuses alone give every one of these slots a respectable score
+    assert (rules.score(afternoons, 'fitness')[0] >= 60).all()
+    
+    router = RequestRouter()
+    decision = router.decide("Gym workout", 1.0, rules.fits(afternoons, 'fitness', 60))
+    assert decision.tier == 'llm', decision.reason
+    decision = router.decide("Client meeting", 1.0, rules.fits(afternoons, 'business', 60))
+    assert decision.tier == 'local', decision.reason
+    
+    mornings = SlotTable.from_slots([
+        {'start': monday + timedelta(days=day, hours=6), 'end': monday + timedelta(days=day, hours=9)}
+        for day in range(5)
+    ])
+    assert router.decide("Gym workout", 1.0, rules.fits(mornings, 'fitness', 60)).tier == 'local'
+    # A 3-hour window cannot hold a 4-hour workout
+    assert not rules.fits(mornings, 'fitness', 240).any()
+    
+    ai_agent = ScheduleAIAgent()
+    assert ai_agent._route("Gym workout", ai_agent.get_snapshot(), 1.0).tier == 'llm'
+    print("✅ Gym workout inside working hours goes to the LLM, mornings stay local")
+
+def test_snapshot_consistency():
+    """Snapshot test: free slots keep matching the snapshot's events after a sync"""
+    print("\n📸 Starting snapshot consistency test...")
+    
+    with stub_calendar() as (stub, calendar_manager):
+        start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        end_date = start_date + timedelta(days=7)
+        snapshot = calendar_manager.get_snapshot(start_date, end_date)
+        
+        # A change on a working day lands between the fetch and the slot lookup
+        change_day = next(start_date + timedelta(days=offset) for offset in range(7)
+                          if (start_date + timedelta(days=offset)).weekday() < 5)
+        NotificationSimulator(stub, deliver=lambda address, headers: None).add_event(
+            'Late change', change_day.replace(hour=9), duration_minutes=540
+        )
+        calendar_manager.event_store.sync(calendar_manager.service)
+        assert calendar_manager.calendar_version != snapshot.version
+        
+        own = CalendarSnapshot(start_date, end_date, snapshot.events, calendar_manager.timezone).free_slots(60)
+        slots = snapshot.free_slots(60)
+        assert slots.starts.tolist() == own.starts.tolist() and slots.ends.tolist() == own.ends.tolist()
+        
+        # A fresh snapshot sees the change and is served by the index again
+        fresh = calendar_manager.get_snapshot(start_date, end_date)
+        assert 'Late change' in [event['title'] for event in fresh.events]
+        assert fresh.free_slots(60).ends.tolist() != slots.ends.tolist()
+        print(f"✅ Snapshot v{snapshot.version} slots unchanged after sync to v{fresh.version}")
+
+class FakeCompletions:
+    """chat.completions stand-in answering after the given delays, one per call"""
+    
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=self)
+    
+    def create(self, timeout=None, **params):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+            delay = self.delays[min(number, len(self.delays)) - 1] if self.delays else 0
+        time.sleep(delay)
+        content = json.dumps({'call': number})
+        if params.get('stream'):
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+                         for part in (content[:4], content[4:])])
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def test_llm_guard():
+    """LLM guard test: breaker states, deadlines stopping the ladder, hedging past p95"""
+    print("\n🛡️ Starting LLM guard test...")
+    
+    # Opens after N consecutive failures, then lets exactly one trial call through
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.05)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == 'half_open'
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.stats()['opened'] == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+    
+    # A half-open trial stream the reader abandons reopens the circuit instead of wedging it
+    llm = GuardedCompletions(CircuitBreaker(failure_threshold=1, cooldown=0.05))
+    llm.breaker.record_failure()
+    time.sleep(0.06)
+    stream = llm.stream(FakeCompletions(), {'model': 'test', 'messages': []}, Deadline(5))
+    next(stream)
+    assert llm.breaker.state == 'half_open'
+    stream.close()
+    assert llm.breaker.state == 'open'
+    time.sleep(0.06)
+    assert len(list(llm.stream(FakeCompletions(), {'model': 'test', 'messages': []}, Deadline(5)))) == 2
+    assert llm.breaker.state == 'closed'
+    
+    # A trial that never reports back stops blocking after one more cooldown
+    stuck = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    stuck.record_failure()
+    time.sleep(0.06)
+    assert stuck.allow() and not stuck.allow()
+    time.sleep(0.06)
+    assert stuck.allow() and stuck.state == 'half_open'
+    
+    # A spent budget ends the ladder without calling any model
+    ai_agent = ScheduleAIAgent()
+    ai_agent.client = FakeCompletions()
+    ai_agent.llm = GuardedCompletions(CircuitBreaker())
+    assert ai_agent._call_ladder("prompt", 0, Deadline(0)) is None
+    assert asyncio.run(ai_agent._call_ladder_async(ai_agent.client, "prompt", 0, Deadline(0))) is None
+    assert ai_agent.client.calls == 0 and not ai_agent.router.stats()['tiers']
+    assert ai_agent._call_ladder("prompt", 0, Deadline(5)) == {'call': 1}
+    
+    # Hedging starts once the model has enough samples, and only past their p95
+    llm = GuardedCompletions(CircuitBreaker())
+    params = {'model': 'test', 'messages': []}
+    for _ in range(config.LLM_HEDGE_MIN_SAMPLES - 1):
+        llm.create(FakeCompletions(0.01), params, Deadline(5))
+    assert llm._hedge_after('test', 5) is None
+    llm.create(FakeCompletions(0.01), params, Deadline(5))
+    hedge_after = llm._hedge_after('test', 5)
+    assert hedge_after is not None and 0.01 <= hedge_after < 0.1
+    
+    llm.create(FakeCompletions(0.01), params, Deadline(5))
+    assert llm.stats()['hedges'] == 0
+    slow = FakeCompletions(1.0, 0.0)
+    started = time.monotonic()
+    response = llm.create(slow, params, Deadline(5))
+    assert time.monotonic() - started < 0.5
+    assert json.loads(response.choices[0].message.content) == {'call': 2}
+    assert llm.stats()['hedges'] == 1 and llm.stats()['hedge_wins'] == 1
+    print(f"✅ Breaker opened {breaker.stats()['opened']} times, hedged after {hedge_after * 1000:.0f} ms")
+
+def test_prefetch_single_fetch():
+    """Prefetch test: concurrent callers without a warm snapshot share one fetch"""
+    print("\n🔥 Starting prefetch test...")
+    
+    calendar_manager = CalendarManager()
+    fetches = []
+    get_snapshot = calendar_manager.get_snapshot
+    
+    def slow_snapshot(start_date, end_date):
+        fetches.append(start_date)
+        time.sleep(0.1)
+        return get_snapshot(start_date, end_date)
+    
+    calendar_manager.get_snapshot = slow_snapshot
+    prefetcher = SnapshotPrefetcher(calendar_manager, horizon_days=7, durations=[60])
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        snapshots = list(pool.map(lambda _: prefetcher.get(7), range(8)))
+    assert len(fetches) == 1, f"{len(fetches)} fetches"
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    stats = prefetcher.stats()
+    assert stats['sync_fetches'] == 1 and stats['warm_hits'] == 7
+    print(f"✅ 8 concurrent callers, {len(fetches)} fetch")
+
+def test_prefetch_shorter_request():
+    """Prefetch test: a request shorter than the warm horizon is cut from the warm snapshot"""
+    print("\n✂️ Starting prefetch window test...")
+    
+    with stub_calendar(days=45) as (stub, calendar_manager):
+        prefetcher = SnapshotPrefetcher(calendar_manager, horizon_days=30, durations=[60])
+        warm = prefetcher.refresh()
+        snapshot = prefetcher.get(14)
+        assert prefetcher.stats()['warm_hits'] == 1 and prefetcher.stats()['sync_fetches'] == 0
+        assert snapshot.version == warm.version and snapshot.end_date == warm.start_date + timedelta(days=14)
+        
+        # The cut keeps the events and slots of its own two weeks, the same as computing them afresh
+        own = CalendarSnapshot(snapshot.start_date, snapshot.end_date, snapshot.events, calendar_manager.timezone)
+        fresh = [slot for slot in own.free_slots(60) if slot['start'] < snapshot.end_date]
+        slots = snapshot.free_slots(60)
+        assert len(slots) and [(slot['start'], slot['end']) for slot in slots] == \
+            [(slot['start'], slot['end']) for slot in fresh]
+        assert len(snapshot.events) < len(warm.events)
+        assert (snapshot.events.ends > to_epoch(snapshot.start_date)).all()
+        assert (snapshot.events.starts < to_epoch(snapshot.end_date)).all()
+        
+        # Only a request past the horizon is fetched synchronously
+        prefetcher.get(45)
+        assert prefetcher.stats()['sync_fetches'] == 1 and prefetcher.stats()['refreshes'] == 1
+    print(f"✅ 14 of 30 warm days served with {len(slots)} slots, no synchronous fetch")
+
+def test_scoring_rules():
+    """Scoring test: compiled tables keep the old scores and reasons"""
+    print("\n🎯 Starting scoring rules test...")
+    
+    rules = get_scoring_rules()
+    monday = datetime(2026, 10, 19)
+    
+    def cell(request_type, day, hour, minutes):
+        start = monday + timedelta(days=day, hours=hour)
+        slots = SlotTable.from_slots([{'start': start, 'end': start + timedelta(minutes=minutes)}])
+        scores, codes = rules.score(slots, request_type)
+        return int(scores[0]), rules.reason(int(codes[0]))
+    
+    # Scores and reasons worked out by hand from the former if-chains
+    assert cell('medical', 0, 10, 120) == (100, "Morning time slots are less crowded at hospitals with shorter wait times; "
+                                                "Weekdays have minimal impact on work; "
+                                                "Sufficient time is secured to proceed comfortably")  # 105 capped
+    assert cell('medical', 1, 14, 60) == (80, "Afternoon time slots are convenient after lunch time; "
+                                              "Weekdays have minimal impact on work")
+    assert cell('fitness', 5, 7, 60) == (85, "Saturday allows for weekend utilization")
+    assert cell('shopping', 2, 15, 100) == (90, "Weekdays have minimal impact on work")
+    assert cell('business', 6, 20, 90) == (60, "Appropriate time slot")
+    assert cell('social', 6, 13, 30) == (75, "Appropriate time slot")
+    assert cell('unknown', 3, 9, 60) == cell('general', 3, 9, 60) == (60, "Weekdays have minimal impact on work")
+    print("✅ Table cells match the former rules")
+
+def test_top_candidates():
+    """Candidate test: start times inside windows, and the heap keeps the best windows"""
+    print("\n🏆 Starting top candidates test...")
+    
+    rules = get_scoring_rules()
+    monday = datetime(2026, 10, 19)
+    
+    def fitness_score(start, end):
+        return int(rules.score(SlotTable.from_slots([{'start': start, 'end': end}]), 'fitness')[0][0])
+    
+    # Lunch in an open working day: the 12:00 start beats the 09:00 window start
+    working_day = SlotTable.from_slots([{'start': monday.replace(hour=9), 'end': monday.replace(hour=18)}])
+    candidates, _, _ = rules.top_candidates(working_day, 'social', 60)
+    assert candidates[0]['start'] == monday.replace(hour=12), candidates[0]['start']
+    
+    # Heap across chunks equals ranking every window's best start directly
+    windows = SlotTable.from_slots([
+        {'start': monday + timedelta(days=day, hours=hour), 'end': monday + timedelta(days=day, hours=hour + length)}
+        for day, hour, length in [(0, 9, 2), (0, 14, 3), (1, 6, 3), (1, 17, 4), (2, 11, 2),
+                                  (3, 10, 1), (4, 13, 5), (5, 7, 2), (6, 9, 8), (6, 18, 2)]
+    ])
+    candidates, scores, _ = rules.top_candidates(windows, 'fitness', 60, k=4, granularity_minutes=30, chunk_size=3)
+    expected = []
+    for window in windows:
+        starts = [window['start']] + [
+            window['start'].replace(minute=0) + timedelta(minutes=30 * step)
+            for step in range(1, 48)
+        ]
+        options = [start for start in starts if window['start'] <= start and start + timedelta(minutes=60) <= window['end']]
+        best = max(options, key=lambda start: (fitness_score(start, window['end']), -start.timestamp()))
+        expected.append((-fitness_score(best, window['end']), best))
+    expected.sort()
+    assert [row['start'] for row in candidates] == [start for _, start in expected[:4]]
+    assert scores.tolist() == [-score for score, _ in expected[:4]]
+    print("✅ Lunch proposed at 12:00, chunked top-4 matches a full ranking")
+
+def test_analysis_cache():
+    """Cache test: LRU limit, TTL expiry, SQLite round trip and calendar version invalidation"""
+    print("\n🗄️ Starting analysis cache test...")
+    
+    cache = AnalysisCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    assert cache.get('a') == {'n': 1}  # 'a' is now the most recently used
+    cache.put('c', {'n': 3})
+    assert cache.get('b') is None and cache.get('a') == {'n': 1} and cache.get('c') == {'n': 3}
+    assert cache.stats()['evictions'] == 1 and cache.stats()['size'] == 2
+    
+    # Callers get copies: changing one does not change the cached entry
+    cache.get('a')['n'] = 99
+    assert cache.get('a') == {'n': 1}
+    
+    short_lived = AnalysisCache(ttl_seconds=0.05)
+    short_lived.put('a', {'n': 1})
+    assert short_lived.get('a') == {'n': 1}
+    time.sleep(0.06)
+    assert short_lived.get('a') is None and short_lived.stats()['size'] == 0
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.sqlite')
+        AnalysisCache(path=path).put('key', {'recommendations': [{'datetime': '2026-10-19 10:00'}]})
+        reopened = AnalysisCache(path=path)
+        assert reopened.get('key') == {'recommendations': [{'datetime': '2026-10-19 10:00'}]}
+        
+        # A calendar change drops memory and disk entries alike
+        reopened.check_calendar_version(1)
+        reopened.check_calendar_version(1)
+        assert reopened.get('key') is not None
+        reopened.check_calendar_version(2)
+        assert reopened.get('key') is None and reopened.stats()['invalidations'] == 1
+        assert AnalysisCache(path=path).get('key') is None
+        
+        # Requests on older and newer snapshots interleaving do not wipe it again
+        reopened.put('key', {'n': 2})
+        for version in (1, 2, 1, 2):
+            reopened.check_calendar_version(version)
+        assert reopened.get('key') == {'n': 2} and reopened.stats()['invalidations'] == 1
+    print("✅ LRU, TTL, disk round trip and version invalidation behave")
+
+def test_prompt_builder():
+    """Prompt test: packed context stays within the token budget, repeats collapse, trailers count what is left out"""
+    print("\n✂️ Starting prompt builder test...")
+    
+    monday = datetime(2026, 10, 19)
+    events = SyntheticCalendar(seed=3, events_per_day=8).generate(monday.date(), 30)
+    events += [
+        {'id': f'standup_{week}', 'title': 'Standup', 'start': monday + timedelta(weeks=week, hours=8),
+         'end': monday + timedelta(weeks=week, hours=8, minutes=30), 'all_day': False}
+        for week in range(4)
+    ]
+    snapshot = CalendarSnapshot(monday, monday + timedelta(days=30), sorted(events, key=lambda event: event['start']),
+                                CalendarManager().timezone)
+    slots = snapshot.free_slots(60)
+    
+    for budget in [40, 77, 114, 300, 800]:
+        events_summary, slots_summary, stats = PromptBuilder(budget).pack(snapshot.events, slots)
+        used = count_tokens(events_summary) + count_tokens(slots_summary)
+        assert used <= budget, f"{used} tokens for a budget of {budget}"
+        
+        # Trailers report exactly the lines left out
+        for summary, shown, total in [(events_summary, 'event_lines', 'event_lines_total'),
+                                      (slots_summary, 'slot_lines', 'slot_lines_total')]:
+            trailer = re.search(r"\(\+(\d+) more .* not shown\)", summary)
+            hidden = stats[total] - stats[shown]
+            assert (int(trailer.group(1)) if trailer else 0) == hidden, (budget, summary)
+    
+    # The four Monday standups collapse into one line
+    events_summary, _, stats = PromptBuilder(10000).pack(snapshot.events, slots)
+    assert "- Mon 08:00: Standup (30 min), 4x 10/19-11/09" in events_summary.splitlines()
+    assert stats['event_lines_total'] < stats['events']
+    print(f"✅ {stats['events']} events in {stats['event_lines_total']} lines, every budget respected")
+
+def test_event_store_resync():
+    """Store test: an expired sync token (410 Gone) falls back to a full resync"""
+    print("\n🔄 Starting event store resync test...")
+    
+    with stub_calendar() as (stub, calendar_manager):
+        store = calendar_manager.event_store
+        simulator = NotificationSimulator(stub, deliver=lambda address, headers: None)
+        start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        
+        first = simulator.add_event('Before expiry', start_date.replace(hour=10))
+        store.sync(calendar_manager.service)
+        assert store.full_syncs == 1 and first['id'] in store.table().ids
+        
+        simulator.delete_event(first['id'])
+        second = simulator.add_event('After expiry', start_date.replace(hour=14))
+        stub.expire_sync_tokens()
+        assert store.sync(calendar_manager.service) == len(store.table())
+        assert store.full_syncs == 2 and store.incremental_syncs == 0
+        assert first['id'] not in store.table().ids and second['id'] in store.table().ids
+        
+        # The new token works incrementally again
+        simulator.delete_event(second['id'])
+        assert store.sync(calendar_manager.service) == 1 and store.incremental_syncs == 1
+        print(f"✅ Expired token resynced {len(store.table())} events in full")
+
+def test_slot_index_dirty_days():
+    """Index test: moved events dirty their old and new days, only those are rebuilt"""
+    print("\n🗓️ Starting slot index test...")
+    
+    with stub_calendar() as (stub, calendar_manager):
+        store, index = calendar_manager.event_store, calendar_manager.slot_index
+        simulator = NotificationSimulator(stub, deliver=lambda address, headers: None)
+        reported = []
+        store.add_listener(reported.append)
+        
+        start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        end_date = start_date + timedelta(days=7) - timedelta(microseconds=1)
+        index.free_slots(start_date, end_date, 60)
+        assert index.stats()['day_builds'] == 7
+        
+        # Late in the evening, so the break after it spills into the next day
+        late = simulator.add_event('Late call', start_date.replace(hour=23), duration_minutes=45)
+        store.sync(calendar_manager.service)
+        old_days = {start_date.date(), start_date.date() + timedelta(days=1)}
+        assert reported[-1] == old_days
+        stored = next(event for event in store.query(start_date, end_date) if event['id'] == late['id'])
+        assert record_days(pack_event(stored, calendar_manager.timezone)) == old_days
+        
+        # A move dirties the old days, break included, as well as the new one
+        moved_to = start_date + timedelta(days=4, hours=10)
+        simulator.move_event(late['id'], moved_to)
+        store.sync(calendar_manager.service)
+        assert reported[-1] == old_days | {moved_to.date()}
+        
+        simulator.move_event(late['id'], start_date + timedelta(days=2, hours=13))
+        store.sync(calendar_manager.service)
+        assert reported[-1] == {moved_to.date(), start_date.date() + timedelta(days=2)}
+        
+        # Only the days changed since the first lookup are rebuilt, and the result matches a direct computation
+        builds = index.stats()['day_builds']
+        slots = index.free_slots(start_date, end_date, 60)
+        assert index.stats()['day_builds'] - builds == 4  # the evening's two days, then the two days it moved to
+        direct = SlotTable.from_slots(calendar_manager.get_free_time_slots(start_date, end_date, 60))
+        assert slots.starts.tolist() == direct.starts.tolist() and slots.ends.tolist() == direct.ends.tolist()
+        builds = index.stats()['day_builds']
+        index.free_slots(start_date, end_date, 60)
+        assert index.stats()['day_builds'] == builds
+        
+        # A full resync drops the whole index
+        stub.expire_sync_tokens()
+        store.sync(calendar_manager.service)
+        assert reported[-1] is None and index.stats()['days'] == 0
+        print(f"✅ {index.stats()['invalidated_days']} day(s) invalidated, index matches a direct computation")
+
+def test_paginated_events():
+    """Pagination test: listings follow nextPageToken to the last page, events stream page by page"""
+    print("\n📄 Starting paginated events test...")
+    
+    with stub_calendar() as (stub, calendar_manager):
+        # Before the store's look-back, so the manager lists the calendar itself
+        start_date = datetime.combine(datetime.now().date() - timedelta(days=12), datetime.min.time())
+        end_date = start_date + timedelta(days=3)
+        time_range = {'timeMin': start_date.isoformat() + 'Z', 'timeMax': end_date.isoformat() + 'Z'}
+        expected = [item['id'] for item in stub.events_page(dict(time_range))['items']]
+        calendar_manager.event_store.sync(calendar_manager.service)
+        assert not calendar_manager.event_store.covers(start_date)
+        stub.page_size = 3
+        
+        round_trips = stub.stats()['requests']
+        pages = list(iter_event_pages(calendar_manager.service, 'primary', **time_range))
+        assert len(pages) == -(-len(expected) // 3) > 2 and stub.stats()['requests'] == round_trips + len(pages)
+        assert all('nextPageToken' in page for page in pages[:-1]) and 'nextPageToken' not in pages[-1]
+        assert [item['id'] for page in pages for item in page['items']] == expected
+        
+        assert [event['id'] for event in calendar_manager.iter_events(start_date, end_date)] == expected
+        
+        # Once a page has been handed out, a failing later page raises rather than mixing in mock events
+        stub.fail_later_pages = True
+        events = calendar_manager.iter_events(start_date, end_date)
+        received = [next(events)['id'] for _ in range(3)]
+        try:
+            next(events)
+        except HttpError as error:
+            assert error.resp.status == 503
+        else:
+            assert False, "later page failure was not raised"
+        assert received == expected[:3]
+    print(f"✅ {len(expected)} events over {len(pages)} pages, in order")
+
+def test_shared_clients():
+    """Client test: one Calendar service per thread, one pooled OpenAI client per process"""
+    print("\n🔌 Starting shared clients test...")
+    
+    start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    with stub_calendar() as (stub, calendar_manager):
+        assert clients.get_calendar_service() is clients.get_calendar_service()
+        barrier = threading.Barrier(4)
+        
+        def list_events(_):
+            barrier.wait()  # every thread asks at once, none reuses another's finished service
+            service = clients.get_calendar_service()
+            page = event_list_request(service, 'primary', timeMin=start_date.isoformat() + 'Z').execute()
+            assert clients.get_calendar_service() is service
+            return service, len(page['items'])
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(list_events, range(4)))
+        services = {id(service) for service, _ in results}
+        assert len(services) == 4 and id(clients.get_calendar_service()) not in services
+        assert len({count for _, count in results}) == 1
+        
+        # Dropping a thread's service builds a new one for that thread only
+        service = clients.get_calendar_service()
+        clients.reset_calendar_service()
+        assert clients.get_calendar_service() is not service
+    
+    default_key = config.OPENAI_API_KEY
+    try:
+        config.OPENAI_API_KEY = 'stub-key'
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            openai_clients = list(pool.map(lambda _: clients.get_openai_client(), range(8)))
+        assert all(client is openai_clients[0] for client in openai_clients)
+        assert openai_clients[0].max_retries == 0  # retried by llm_guard within the deadline
+        assert clients.get_async_openai_client() is clients.get_async_openai_client()
+        
+        # A new key (the Streamlit UI can set one) replaces the pooled client
+        config.OPENAI_API_KEY = 'other-key'
+        assert clients.get_openai_client() is not openai_clients[0]
+        config.OPENAI_API_KEY = ''
+        assert clients.get_openai_client() is None
+    finally:
+        config.OPENAI_API_KEY = default_key
+    print(f"✅ {len(services)} threads got their own Calendar service, 8 callers shared one OpenAI client")
+
+def test_batched_calendar_requests():
+    """Batch test: per-request errors in order, fields= partial responses, no mock data after real pages"""
+    print("\n📦 Starting batched calendar request test...")
+    
+    start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    end_date = start_date + timedelta(days=7)
+    with stub_calendar({'GOOGLE_BATCH_SIZE': 2}, attendees=2) as (stub, calendar_manager):
+        service = calendar_manager.service
+        
+        # Only the fields the client reads come back, not the attendee lists
+        page = event_list_request(service, 'primary', timeMin=start_date.isoformat() + 'Z',
+                                  timeMax=end_date.isoformat() + 'Z').execute()
+        assert page['items'] and set(page) <= {'nextPageToken', 'nextSyncToken', 'items'}
+        allowed = set(EVENT_LIST_FIELDS.partition('items(')[2].rstrip(')').split(','))
+        assert all(set(item) <= allowed for item in page['items'])
+        assert 'attendees' in stub.item(page['items'][0]['id'])
+        
+        # Results keep request order across batches; a failed part fails only itself
+        requests = [
+            event_list_request(service, 'primary', timeMin=start_date.isoformat() + 'Z'),
+            service.events().get(calendarId='primary', eventId='missing'),
+            event_list_request(service, 'other@example.com', timeMin=start_date.isoformat() + 'Z')
+        ]
+        round_trips = stub.stats()['requests']
+        results = clients.execute_batch(service, requests)
+        assert stub.stats()['requests'] == round_trips + 2
+        assert [error is None for _, error in results] == [True, False, True]
+        assert results[1][0] is None and results[1][1].resp.status == 404
+        assert results[0][0]['items'] == results[2][0]['items']
+        
+        # A failed round trip fails each of its parts
+        stub.latency.error_rate = 1.0
+        results = clients.execute_batch(service, requests)
+        assert all(response is None and error.resp.status == 503 for response, error in results)
+        stub.latency.error_rate = 0.0
+        
+        # A later page failing keeps the real first page and reports the window, with no mock events
+        stub.page_size = 5
+        stub.fail_later_pages = True
+        events, errors = calendar_manager.get_events_batch([
+            ('other@example.com', start_date, end_date),
+            ('team@example.com', start_date, start_date + timedelta(hours=12))
+        ])
+        assert len(events[0]) == 5 and list(errors) == [0]
+        assert all(stub.item(event['id']) for window in events for event in window)
+    print(f"✅ {len(results)} batched requests mapped in order, {len(events[0])} real events kept after a page failed")
+
+def test_load_driver():
+    """Load test harness: nearest-rank percentiles, stub latency models, and a closed-loop run against the app"""
+    print("\n🏋️ Starting load driver test...")
+    
+    assert percentile([], 0.5) == 0.0 and percentile([7.0], 0.99) == 7.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+    values = [float(value) for value in range(100, 0, -1)]
+    assert percentile(values, 0.95) == 95.0 and percentile(values, 0.99) == 99.0 and percentile(values, 1.0) == 100.0
+    assert percentile(values, 0.07) == 7.0  # 0.07 * 100 is a hair over 7 in floating point
+    
+    model = LatencyModel.parse('100:300:uniform', error_rate=0.25, seed=1)
+    samples = [model.sample() for _ in range(400)]
+    assert all(0.1 <= delay <= 0.3 for delay, _ in samples)
+    assert 60 < sum(fail for _, fail in samples) < 140
+    assert LatencyModel.parse('50:500:constant').sample() == (0.05, False)
+    
+    ai_agent = ScheduleAIAgent(analysis_cache=AnalysisCache(max_entries=8))
+    ai_agent.client = None
+    default_agent = web_app._agent
+    web_app._agent = ai_agent
+    server = make_server('127.0.0.1', 0, web_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        driver = LoadDriver(f'http://127.0.0.1:{server.server_port}', concurrency=3, analyze_ratio=0.5, seed=3)
+        report = summarize(driver.samples, driver.run(12))
+    finally:
+        server.shutdown()
+        web_app._agent = default_agent
+    
+    assert report['requests'] == 12 and sum(result['requests'] for result in report['endpoints'].values()) == 12
+    analyze = report['endpoints']['/api/analyze']
+    assert analyze['errors'] == 0 and report['endpoints']['/api/current-schedule']['errors'] == 0
+    # Stage timings and annotations travel in the response headers
+    assert list(analyze['stages'])[-1] == 'total' and 'calendar' in analyze['stages']
+    assert sum(analyze['tiers'].values()) == analyze['requests']
+    assert analyze['latency']['p50_ms'] <= analyze['latency']['p99_ms'] <= analyze['latency']['max_ms']
+    print(f"✅ {report['requests']} requests at {report['throughput_rps']:.0f} req/s, "
+          f"analyze p95 {analyze['latency']['p95_ms']:.0f} ms")
+
+def test_columnar_tables():
+    """Columnar test: rows round-trip, windows treat touching events as outside, strings are pooled"""
+    print("\n🧮 Starting columnar table test...")
+    
+    zone = ZoneInfo(config.TIMEZONE)
+    monday = datetime(2026, 10, 19)
+    events = [
+        {'id': 'late', 'title': 'Review', 'start': monday.replace(hour=14), 'end': monday.replace(hour=15),
+         'description': 'Quarterly numbers', 'location': 'Room 2', 'all_day': False},
+        {'id': 'aware', 'title': 'Standup', 'start': monday.replace(hour=10, tzinfo=zone),
+         'end': monday.replace(hour=11, tzinfo=zone), 'description': '', 'location': '', 'all_day': False},
+        {'id': 'long', 'title': 'Offsite', 'start': monday.replace(hour=8), 'end': monday.replace(hour=18),
+         'description': '', 'location': 'Room 2', 'all_day': False},
+        {'id': 'holiday', 'title': 'Standup', 'start': monday + timedelta(days=1),
+         'end': monday + timedelta(days=2), 'description': '', 'location': '', 'all_day': True}
+    ]
+    table = EventTable.from_events(events, pytz.timezone(config.TIMEZONE))
+    ordered = sorted(events, key=lambda event: event['start'].replace(tzinfo=None))
+    assert table.to_dicts() == ordered
+    assert table[-1]['id'] == 'holiday' and [row['id'] for row in table[1:3]] == ['aware', 'late']
+    assert table[1]['start'].tzinfo is not None and table[0]['start'].tzinfo is None
+    try:
+        table[len(table)]
+        assert False, "index past the end was accepted"
+    except IndexError:
+        pass
+    
+    # Strings are pooled once and shared by every slice of the table
+    assert sorted(table.pool.strings) == sorted({'Review', 'Standup', 'Offsite', 'Quarterly numbers', 'Room 2', ''})
+    part = table.window(monday.replace(hour=13), monday.replace(hour=16))
+    assert part.pool is table.pool and [row['location'] for row in part] == ['Room 2', 'Room 2']
+    pool = StringPool()
+    assert pool.codes(['a', 'b', 'a']).tolist() == [0, 1, 0] and pool.code('b') == 1
+    
+    def window(start_hour, end_hour):
+        return [row['id'] for row in table.window(monday.replace(hour=start_hour), monday.replace(hour=end_hour))]
+    
+    # Half-open: events that only touch the window are outside; the long event reaches every hour it spans
+    assert window(11, 14) == ['long']
+    assert window(9, 10) == ['long']
+    assert window(10, 11) == ['long', 'aware']
+    assert window(15, 16) == ['long']
+    assert window(18, 23) == [] and window(7, 8) == []
+    assert [row['id'] for row in table.window(monday + timedelta(days=1), monday + timedelta(days=1, hours=1))] \
+        == ['holiday']
+    
+    # Overlapping events merge into one busy block
+    starts, ends = merge_epochs(table.starts, table.ends)
+    assert list(zip(starts.tolist(), ends.tolist())) == [
+        (to_epoch(monday.replace(hour=8)), to_epoch(monday.replace(hour=18))),
+        (to_epoch(monday + timedelta(days=1)), to_epoch(monday + timedelta(days=2)))
+    ]
+    
+    slots = [
+        {'start': monday.replace(hour=9), 'end': monday.replace(hour=10, minute=30)},
+        {'start': monday + timedelta(days=5, hours=13), 'end': monday + timedelta(days=5, hours=14)}
+    ]
+    slot_table = SlotTable.from_slots(slots)
+    assert slot_table.to_dicts() == [
+        dict(slot, duration_minutes=int((slot['end'] - slot['start']).total_seconds() // 60), date=slot['start'].date())
+        for slot in slots
+    ]
+    assert slot_table.hours.tolist() == [9, 13] and slot_table.weekdays.tolist() == [0, 5]
+    assert slot_table[1:].to_dicts() == slot_table.to_dicts()[1:]
+    print(f"✅ {len(table)} events and {len(slot_table)} slots round-tripped, {len(table.pool.strings)} pooled strings")
+
+def test_stream_parser():
+    """Stream parser test: objects come out whole however the text is split"""
+    print("\n🧩 Starting stream parser test...")
+    
+    recommendations = [
+        {'datetime': '2026-10-19 10:00', 'reason': 'Says "quiet {morning}" and ends with \\', 'priority': 1},
+        {'datetime': '2026-10-19 14:00', 'reason': 'Closing ] and } inside a string', 'priority': 2}
+    ]
+    document = json.dumps({'request_analysis': 'A "recommendations": [ mention', 'recommendations': recommendations,
+                           'general_advice': 'none'})
+    # An escaped mention inside a string is not taken for the array; fences around the answer are skipped
+    for text in (document, f"```json\n{document}\n```"):
+        for size in (1, 3, 7, len(text)):
+            parser = RecommendationStreamParser()
+            parsed = []
+            for start in range(0, len(text), size):
+                parsed += parser.feed(text[start:start + size])
+            assert parsed == recommendations, (size, parsed)
+            assert parser.text == text
+    
+    # Nothing is emitted before an object closes
+    parser = RecommendationStreamParser()
+    assert parser.feed('{"recommendations": [{"reason": "half') == []
+    assert parser.feed('way"}') == [{'reason': 'halfway'}]
+    print("✅ Escaped quotes, braces in strings, fences and every split size parsed")
+
+def test_asgi_analysis_stream():
+    """ASGI stream test: the UI's /api/analyze/stream yields slots, streamed recommendations and the analysis"""
+    print("\n📡 Starting ASGI analysis stream test...")
+    
+    stub = StubOpenAIServer(LatencyModel(), recommendations=3, chunk_chars=5).start()
+    ai_agent = ScheduleAIAgent(analysis_cache=AnalysisCache(max_entries=8))
+    ai_agent.client = openai.OpenAI(api_key='stub-key', base_url=stub.url + '/v1', max_retries=0)
+    default_agent = web_app._agent
+    web_app._agent = ai_agent
+    
+    async def request(query: bytes):
+        messages = []
+        
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        
+        async def send(message):
+            messages.append(message)
+        
+        scope = {'type': 'http', 'path': '/api/analyze/stream', 'method': 'GET', 'query_string': query, 'headers': []}
+        await asgi_app.app(scope, receive, send)
+        return messages
+    
+    try:
+        messages = asyncio.run(request(b'request=Team+meeting+tomorrow+afternoon&duration=1'))
+        assert messages[0]['status'] == 200
+        assert dict(messages[0]['headers'])[b'content-type'].startswith(b'text/event-stream')
+        body = b''.join(message.get('body', b'') for message in messages[1:]).decode()
+        events = [(frame.split('\n')[0][len('event: '):], json.loads(frame.split('\n')[1][len('data: '):]))
+                  for frame in body.strip().split('\n\n')]
+        names = [name for name, _ in events]
+        assert names == ['slots', 'recommendation', 'recommendation', 'recommendation', 'analysis', 'done'], names
+        streamed = [data for name, data in events if name == 'recommendation']
+        assert streamed == dict(events)['analysis']['recommendations']
+        
+        messages = asyncio.run(request(b'duration=1'))
+        assert json.loads(messages[1]['body']) == {'error': '스케줄 요청이 필요합니다.'}
+    finally:
+        web_app._agent = default_agent
+        stub.stop()
+    print(f"✅ Streamed {len(streamed)} recommendations over {stub.stats()['bytes_sent']} bytes of chunks")
+
+def test_group_availability():
+    """Group test: chunked freebusy with per-calendar errors, and partial slots blocked by one attendee"""
+    print("\n👥 Starting group availability test...")
+    
+    monday = datetime(2026, 10, 19)
+    group = GroupAvailability(monday.date(), monday.date(), ['a', 'b', 'c'])
+    group.add_busy('a', [(monday.replace(hour=10), monday.replace(hour=11))])
+    group.add_busy('b', [(monday.replace(hour=13), monday.replace(hour=15))])
+    group.add_busy('c', [(monday.replace(hour=16, minute=30), monday.replace(hour=16, minute=45))])
+    assert [(slot['start'].strftime('%H:%M'), slot['end'].strftime('%H:%M')) for slot in group.common_slots(60)] == [
+        ('09:00', '10:00'), ('11:00', '13:00'), ('15:00', '16:30'), ('16:45', '18:00')
+    ]
+    
+    # One window per hour of a block only that attendee has, not the whole run the others have free
+    partial = [(slot['start'].strftime('%H:%M'), slot['end'].strftime('%H:%M'), slot['missing_attendee'],
+                slot['conflict_minutes']) for slot in group.partial_slots(60)]
+    assert partial == [
+        ('16:30', '17:30', 'c', 15),
+        ('10:00', '11:00', 'a', 60),
+        ('13:00', '14:00', 'b', 60),
+        ('14:00', '15:00', 'b', 60)
+    ], partial
+    # A block at the end of the day reaches back into common time only as far as it must
+    group.add_busy('a', [(monday.replace(hour=17, minute=45), monday.replace(hour=18))])
+    assert ('17:00', '18:00', 'a', 15) in [(slot['start'].strftime('%H:%M'), slot['end'].strftime('%H:%M'),
+                                           slot['missing_attendee'], slot['conflict_minutes'])
+                                          for slot in group.partial_slots(60)]
+    
+    alone = GroupAvailability(monday.date(), monday.date(), ['a'])
+    alone.add_busy('a', [(monday.replace(hour=10), monday.replace(hour=11))])
+    assert alone.partial_slots(60) == [] and len(alone.common_slots(60)) == 2
+    
+    start_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    calendar_ids = ['primary', 'a@example.com', 'b@example.com', 'gone@example.com', 'c@example.com']
+    with stub_calendar({'FREEBUSY_BATCH_SIZE': 2}) as (stub, calendar_manager):
+        stub.missing_calendars.add('gone@example.com')
+        round_trips = stub.stats()['requests']
+        busy, errors = calendar_manager.get_group_busy(calendar_ids, start_date, start_date + timedelta(days=7))
+        # Three queries of at most two calendars, sent in one batched round trip
+        queries = stub.freebusy_queries
+        assert queries == 3 and stub.stats()['requests'] == round_trips + 1
+        assert errors == {'gone@example.com': 'notFound'}
+        assert sorted(busy) == sorted(set(calendar_ids) - {'gone@example.com'})
+        assert busy['primary'] and busy['primary'] == busy['c@example.com']
+        
+        # A failed round trip reports every calendar of its queries, without dropping the call
+        stub.latency.error_rate = 1.0
+        busy, errors = calendar_manager.get_group_busy(calendar_ids, start_date, start_date + timedelta(days=7))
+        assert busy == {} and sorted(errors) == sorted(calendar_ids)
+    print(f"✅ {len(partial)} partial slots from 3 attendees, freebusy chunked into {queries} queries")
 
 def main():
     """Main test function"""
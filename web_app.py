@@ -1,11 +1,45 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, g, render_template_string, request, jsonify, stream_with_context
 from ai_agent import ScheduleAIAgent
 from calendar_manager import CalendarManager
 from datetime import datetime, timedelta
 import json
+import threading
+import time
+from typing import Optional
+import clients
+import config
+import metrics
+from prefetch import SnapshotPrefetcher
+from push_channels import PushChannelManager
 
 app = Flask(__name__)
 
+# 프로세스 전체에서 공유하는 에이전트 (클라이언트와 이벤트 저장소 재사용)
+_agent = None
+_agent_lock = threading.Lock()
+_push_channels: Optional[PushChannelManager] = None
+
+def get_agent() -> ScheduleAIAgent:
+    global _agent, _push_channels
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                calendar_manager = CalendarManager()
+                calendar_manager.authenticate()
+                agent = ScheduleAIAgent(calendar_manager)
+                # 다음 기간의 일정과 빈 시간을 백그라운드에서 미리 받아 둠
+                if config.PREFETCH_ENABLED:
+                    agent.prefetcher = SnapshotPrefetcher(calendar_manager).start()
+                # 푸시 알림 채널을 열어 두면 변경이 있을 때만 동기화 (폴링 간격은 늘어남)
+                if config.PUSH_WEBHOOK_URL and calendar_manager.service:
+                    _push_channels = PushChannelManager(calendar_manager).start()
+                _agent = agent
+    return _agent
+
+def get_push_channels() -> Optional[PushChannelManager]:
+    get_agent()
+    return _push_channels
+
 # HTML 템플릿
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -194,38 +228,52 @@ HTML_TEMPLATE = """
             resultDiv.style.display = 'block';
             contentDiv.innerHTML = '<div class="loading">AI가 최적의 시간을 분석 중입니다...</div>';
             
-            // API 호출
-            fetch('/api/analyze', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    request: request,
-                    duration: parseFloat(duration)
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                displayResults(data);
-            })
-            .catch(error => {
+            // 스트리밍 API 호출 (Server-Sent Events)
+            const params = new URLSearchParams({request: request, duration: duration});
+            const source = new EventSource(`/api/analyze/stream?${params}`);
+            const state = {slots: null, recommendations: [], analysis: null};
+            
+            source.addEventListener('slots', function(e) {
+                state.slots = JSON.parse(e.data).available_slots;
+                displayResults(state);
+            });
+            source.addEventListener('recommendation', function(e) {
+                state.recommendations.push(JSON.parse(e.data));
+                displayResults(state);
+            });
+            source.addEventListener('analysis', function(e) {
+                state.analysis = JSON.parse(e.data);
+                displayResults(state);
+            });
+            source.addEventListener('failure', function(e) {
+                source.close();
                 contentDiv.innerHTML = '<p style="color: red;">분석 중 오류가 발생했습니다.</p>';
             });
+            source.addEventListener('done', function() {
+                source.close();
+            });
+            source.onerror = function() {
+                source.close();
+                if (!state.analysis) {
+                    contentDiv.innerHTML = '<p style="color: red;">분석 중 오류가 발생했습니다.</p>';
+                }
+            };
         });
         
-        function displayResults(data) {
+        function displayResults(state) {
             const contentDiv = document.getElementById('analysis-content');
+            const analysis = state.analysis || {};
+            const recommendations = state.analysis ? (analysis.recommendations || []) : state.recommendations;
             
             let html = `
                 <h4>📝 요청 분석</h4>
-                <p>${data.analysis.request_analysis}</p>
+                <p>${analysis.request_analysis || 'AI가 요청을 분석 중입니다...'}</p>
                 
                 <h4>⭐ 추천 시간</h4>
             `;
             
-            if (data.analysis.recommendations && data.analysis.recommendations.length > 0) {
-                data.analysis.recommendations.forEach((rec, index) => {
+            if (recommendations.length > 0) {
+                recommendations.forEach((rec, index) => {
                     html += `
                         <div class="recommendation">
                             <h5>🥇 ${index + 1}순위 추천</h5>
@@ -234,16 +282,25 @@ HTML_TEMPLATE = """
                         </div>
                     `;
                 });
-            } else {
+            } else if (state.analysis) {
                 html += '<p>추천할 수 있는 시간이 없습니다.</p>';
+            } else {
+                html += '<div class="loading">추천 시간을 계산 중입니다...</div>';
+            }
+            
+            if (analysis.general_advice) {
+                html += `<h4>💡 일반 조언</h4><p>${analysis.general_advice}</p>`;
             }
             
-            if (data.analysis.general_advice) {
-                html += `<h4>💡 일반 조언</h4><p>${data.analysis.general_advice}</p>`;
+            if (analysis.notes) {
+                html += `<h4>⚠️ 주의사항</h4><p>${analysis.notes}</p>`;
             }
             
-            if (data.analysis.notes) {
-                html += `<h4>⚠️ 주의사항</h4><p>${data.analysis.notes}</p>`;
+            if (state.slots) {
+                html += `<h4>📅 가능한 시간대 (${state.slots.length}개)</h4>`;
+                html += state.slots.slice(0, 10).map(slot =>
+                    `<div class="event-item">${slot.datetime} · ${slot.duration_minutes}분 가능</div>`
+                ).join('');
             }
             
             contentDiv.innerHTML = html;
@@ -255,29 +312,57 @@ HTML_TEMPLATE = """
 
 @app.route('/')
 def index():
+    # 페이지를 여는 순간 에이전트와 프리페치를 시작해 뒤따르는 API 호출이 캐시를 사용
+    get_agent()
     return render_template_string(HTML_TEMPLATE)
 
-@app.route('/api/current-schedule')
-def get_current_schedule():
-    try:
-        calendar_manager = CalendarManager()
-        current_time = datetime.now()
+def get_today_events(calendar_manager: CalendarManager, prefetcher: Optional[SnapshotPrefetcher] = None) -> list:
+    current_time = datetime.now()
+    if prefetcher is not None:
+        # 미리 받아 둔 스냅샷에서 조회 (너무 오래된 경우에만 동기 조회)
+        today = datetime.combine(current_time.date(), datetime.min.time())
+        events = prefetcher.get().events.window(today, today + timedelta(days=1))
+    else:
         week_start = current_time - timedelta(days=current_time.weekday())
         week_end = week_start + timedelta(days=6)
-        
         events = calendar_manager.get_events(week_start, week_end)
-        
-        # 오늘의 이벤트만 필터링
-        today_events = []
-        for event in events:
-            if event['start'].date() == current_time.date():
-                today_events.append({
-                    'title': event['title'],
-                    'start': event['start'].strftime('%H:%M'),
-                    'end': event['end'].strftime('%H:%M'),
-                    'location': event.get('location', '')
-                })
-        
+    
+    # 오늘의 이벤트만 필터링
+    today_events = []
+    for event in events:
+        if event['start'].date() == current_time.date():
+            today_events.append({
+                'title': event['title'],
+                'start': event['start'].strftime('%H:%M'),
+                'end': event['end'].strftime('%H:%M'),
+                'location': event.get('location', '')
+            })
+    
+    return today_events
+
+# 단계별 소요 시간을 Server-Timing 헤더로 노출 (load_test.py가 단계별 지연을 집계)
+@app.before_request
+def start_stage_timer():
+    g.request_started = time.perf_counter()
+    metrics.start_request()
+
+@app.after_request
+def add_server_timing(response):
+    timings = metrics.current_timings()
+    if timings is not None and not response.is_streamed:
+        timings['total'] = (time.perf_counter() - g.request_started) * 1000
+        response.headers['Server-Timing'] = metrics.server_timing_header(timings)
+    annotations = metrics.current_annotations()
+    if annotations:
+        response.headers['X-Request-Stats'] = metrics.format_annotations(annotations)
+    return response
+
+@app.route('/api/current-schedule')
+def get_current_schedule():
+    try:
+        with metrics.stage('calendar'):
+            agent = get_agent()
+            today_events = get_today_events(agent.calendar_manager, agent.prefetcher)
         return jsonify({'events': today_events})
     except Exception as e:
         return jsonify({'error': str(e)})
@@ -292,14 +377,83 @@ def analyze_schedule():
         if not user_request:
             return jsonify({'error': '스케줄 요청이 필요합니다.'})
         
-        ai_agent = ScheduleAIAgent()
+        ai_agent = get_agent()
         analysis = ai_agent.analyze_schedule_request(user_request, duration_hours)
         
         return jsonify(analysis)
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/api/analyze/stream')
+def analyze_schedule_stream():
+    user_request = request.args.get('request', '')
+    duration_hours = request.args.get('duration', 2.0, type=float)
+    
+    if not user_request:
+        return jsonify({'error': '스케줄 요청이 필요합니다.'})
+    
+    ai_agent = get_agent()
+    
+    # Server-Sent Events: 빈 시간대를 먼저 보내고, 추천은 모델 응답이 스트리밍되는 대로 전송
+    def generate():
+        try:
+            for event, data in ai_agent.stream_schedule_analysis(user_request, duration_hours):
+                yield f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: failure\ndata: {app.json.dumps({'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/cache-stats')
+def get_cache_stats():
+    return jsonify(get_agent().analysis_cache.stats())
+
+@app.route('/api/router-stats')
+def get_router_stats():
+    # 티어별(local, cache, 모델, fallback) 응답 비율과 지연 시간
+    return jsonify(get_agent().router.stats())
+
+@app.route('/api/llm-stats')
+def get_llm_stats():
+    # LLM 호출 재시도·헤징 횟수와 서킷 브레이커 상태
+    return jsonify(get_agent().llm.stats())
+
+@app.route('/api/coalescing-stats')
+def get_coalescing_stats():
+    # 동시에 들어온 동일 분석 요청 중 다른 요청의 계산 결과를 공유한 비율
+    return jsonify(get_agent().single_flight.stats())
+
+@app.route('/api/prefetch-stats')
+def get_prefetch_stats():
+    # 프리페치 갱신 지연과 현재 데이터의 경과 시간(staleness)
+    prefetcher = get_agent().prefetcher
+    return jsonify(prefetcher.stats() if prefetcher else {'running': False})
+
+@app.route('/api/calendar/notifications', methods=['POST'])
+def receive_calendar_notification():
+    # Google Calendar 푸시 알림: 해당 캘린더의 증분 동기화만 예약하고 바로 응답
+    push_channels = get_push_channels()
+    if push_channels is None or not push_channels.handle(request.headers):
+        return '', 404
+    return '', 200
+
+@app.route('/api/push-stats')
+def get_push_stats():
+    # 열린 채널의 남은 수명, 받은 알림과 그에 따른 동기화 횟수
+    push_channels = get_push_channels()
+    return jsonify(push_channels.stats() if push_channels else {'running': False})
+
+@app.route('/api/calendar-stats')
+def get_calendar_stats():
+    # 캘린더 API 응답의 디코딩 후 크기와 JSON 파싱 시간
+    return jsonify(clients.calendar_response_stats.stats())
+
 if __name__ == '__main__':
     print("🚀 AI 스케줄 어시스턴트 웹 서버 시작")
     print("📱 브라우저에서 http://localhost:5000 접속")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)